@@ -0,0 +1,75 @@
+"""
+Admin endpoints for diagnosing a live worker, mounted at /admin.
+
+They are disabled (404) unless ADMIN_TOKEN is set, and every request must send
+that token in the X-Admin-Token header.
+"""
+import asyncio
+import hmac
+import os
+import pstats
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.profiling import collapsed, request_profiler, sample_stacks
+
+# Bounds on what one admin call may cost the worker
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_MAX_REQUESTS = int(os.getenv("PROFILE_MAX_REQUESTS", "100"))
+
+_sampling = threading.Lock()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile/stacks", response_class=PlainTextResponse)
+async def profile_stacks(seconds: float = 5.0, interval_ms: float = 5.0):
+    """
+    Sample every thread's stack for `seconds` and return the counts in collapsed
+    flamegraph format (e.g. for flamegraph.pl or speedscope).
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if not _sampling.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A stack profile is already running")
+    try:
+        # Sampled from another thread, so the event loop keeps serving and shows up in the stacks
+        counts = await asyncio.get_running_loop().run_in_executor(
+            None, sample_stacks, seconds, max(interval_ms, 1.0) / 1000.0)
+    finally:
+        _sampling.release()
+    return PlainTextResponse(collapsed(counts))
+
+
+@router.post("/profile/requests")
+async def profile_requests(count: int = 10):
+    """Profile the next `count` searched questions with cProfile; replaces any earlier profile."""
+    if not 0 < count <= PROFILE_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"count must be in [1, {PROFILE_MAX_REQUESTS}]")
+    request_profiler.arm(count)
+    return request_profiler.status()
+
+
+@router.get("/profile/requests", response_class=PlainTextResponse)
+async def profile_requests_report(sort: str = "cumulative", limit: int = 40):
+    """Merged cProfile statistics of the requests profiled so far."""
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    status = request_profiler.status()
+    report = request_profiler.report(sort, limit)
+    header = f"# profiled {status['profiled']}/{status['requested']} requests"
+    if not status["complete"]:
+        header += " (still collecting)"
+    return PlainTextResponse(header + "\n" + (report or ""))
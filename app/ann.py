@@ -0,0 +1,154 @@
+"""
+Approximate nearest-neighbour indexes over the unified score matrix.
+
+An index only narrows down which rows are worth scoring; the search engine
+still computes exact cosine scores for the returned candidate rows. The
+exact index returns every row and is used as the fallback and as the recall
+baseline for the approximate backends.
+"""
+import hashlib
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+from app.embedding_cache import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def matrix_fingerprint(matrix: np.ndarray) -> str:
+    """Hash of a matrix's shape and contents, used to match saved indexes to embeddings."""
+    digest = hashlib.sha1(str(matrix.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(matrix).data)
+    return digest.hexdigest()
+
+
+class ExactIndex:
+    """Brute-force index: every row is a candidate."""
+
+    name = "exact"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.size = len(embeddings)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        return np.arange(self.size)
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index with flat (uncompressed) lists.
+
+    Rows are clustered with spherical k-means into ``nlist`` lists. A query
+    scans only the ``nprobe`` lists whose centroids are closest to it, so
+    raising ``nprobe`` trades latency for recall.
+    """
+
+    name = "ivf"
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray,
+                 fingerprint: str, nprobe: int = 8):
+        self.centroids = centroids
+        self.order = order  # Row ids grouped by list
+        self.offsets = offsets  # List i holds order[offsets[i]:offsets[i + 1]]
+        self.fingerprint = fingerprint
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: int = 0, nprobe: int = 8,
+              n_iter: int = 10, max_train_rows: int = 256, seed: int = 0) -> "IVFFlatIndex":
+        """
+        Cluster L2-normalized rows into inverted lists.
+        ``nlist`` defaults to sqrt(rows); k-means is trained on at most
+        ``max_train_rows`` rows per list so build time stays bounded.
+        """
+        n = len(embeddings)
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+
+        train = embeddings
+        if n > nlist * max_train_rows:
+            train = embeddings[np.sort(rng.choice(n, nlist * max_train_rows, replace=False))]
+
+        centroids = np.array(train[rng.choice(len(train), nlist, replace=False)], dtype=np.float32)
+        for _ in range(n_iter):
+            assign = cls._assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=nlist)
+            # Re-seed empty lists from random training rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = train[rng.choice(len(train), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        assign = cls._assign(embeddings, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls(centroids, order, offsets, matrix_fingerprint(embeddings), nprobe=nprobe)
+
+    @staticmethod
+    def _assign(rows: np.ndarray, centroids: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+        """Index of the closest centroid for each row, computed in bounded batches."""
+        assign = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), batch_size):
+            assign[start:start + batch_size] = np.argmax(rows[start:start + batch_size] @ centroids.T, axis=1)
+        return assign
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        nprobe = min(self.nprobe, self.nlist)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temporary file, so concurrent builders never publish each other's partial writes
+        atomic_write(path, lambda f: np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                                              fingerprint=np.array(self.fingerprint)))
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 8) -> Optional["IVFFlatIndex"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["centroids"], data["order"], data["offsets"],
+                           str(data["fingerprint"]), nprobe=nprobe)
+        except Exception as e:
+            logger.warning(f"Could not read ANN index {path}: {str(e)}")
+            return None
+
+
+def build_index(embeddings: np.ndarray, backend: str = "exact", index_dir: Optional[str] = None,
+                nlist: int = 0, nprobe: int = 8, min_rows: int = 5000):
+    """
+    Create the configured index for a score matrix, reusing a saved one when it
+    matches the embeddings. Falls back to the exact index for small corpora.
+    """
+    if backend == "exact" or len(embeddings) < min_rows:
+        return ExactIndex(embeddings)
+    if backend != "ivf":
+        logger.warning(f"Unknown ANN backend '{backend}', using exact search")
+        return ExactIndex(embeddings)
+
+    path = os.path.join(index_dir, "ivf_index.npz") if index_dir else None
+    fingerprint = matrix_fingerprint(embeddings)
+    if path:
+        index = IVFFlatIndex.load(path, nprobe=nprobe)
+        if index is not None and index.fingerprint == fingerprint and (not nlist or index.nlist == nlist):
+            logger.info(f"Loaded IVF index with {index.nlist} lists from {path}")
+            return index
+
+    index = IVFFlatIndex.build(embeddings, nlist=nlist, nprobe=nprobe)
+    logger.info(f"Built IVF index with {index.nlist} lists over {len(embeddings)} rows")
+    if path:
+        index.save(path)
+    return index
@@ -0,0 +1,141 @@
+"""
+Small in-process caches used on the question path.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Thread-safe LRU cache keyed by L2-normalized embeddings. A lookup hits when a
+    stored vector with the same tag is within ``threshold`` cosine similarity;
+    the most similar one is returned. Vectors live in one preallocated matrix,
+    so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, maxsize: int = 256, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None  # (maxsize, dim), allocated on the first put
+        self._tags = [None] * max(maxsize, 0)
+        self._values = [None] * max(maxsize, 0)
+        self._used = np.zeros(max(maxsize, 0), dtype=np.int64)  # Last-use tick per slot, 0 when empty
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def _matches(self, vector: np.ndarray, tag: Hashable):
+        """Filled slots with this tag and their similarity to vector."""
+        slots = np.flatnonzero(self._used)
+        if self._vectors is None or len(slots) == 0:
+            return slots, np.zeros(0, dtype=np.float32)
+        slots = slots[np.fromiter((self._tags[slot] == tag for slot in slots), dtype=bool, count=len(slots))]
+        return slots, self._vectors[slots] @ vector
+
+    def get(self, vector: np.ndarray, tag: Hashable = None) -> Optional[Any]:
+        with self._lock:
+            slots, similarities = self._matches(vector, tag)
+            if len(slots) and similarities.max() >= self.threshold:
+                slot = slots[int(np.argmax(similarities))]
+                self._tick += 1
+                self._used[slot] = self._tick
+                self.hits += 1
+                return self._values[slot]
+            self.misses += 1
+            return None
+
+    def put(self, vector: np.ndarray, value: Any, tag: Hashable = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+            slots, similarities = self._matches(vector, tag)
+            if len(slots) and similarities.max() >= self.threshold:
+                # Refresh the entry this question would have hit
+                slot = slots[int(np.argmax(similarities))]
+            else:
+                # An empty slot if there is one, else the least recently used
+                slot = int(np.argmin(self._used))
+            self._tick += 1
+            self._vectors[slot] = vector
+            self._tags[slot] = tag
+            self._values[slot] = value
+            self._used[slot] = self._tick
+
+    def clear(self) -> None:
+        with self._lock:
+            self._used[:] = 0
+            self._tags = [None] * len(self._tags)
+            self._values = [None] * len(self._values)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._used))
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,52 @@
+"""
+Split long documents into bounded, overlapping windows before embedding.
+
+The sentence-transformer model truncates its input (128 word pieces for
+MiniLM), so long course sections and posts are indexed as several chunks.
+Windows are measured in whitespace-separated words, which keeps chunking
+independent of the model; the defaults leave headroom for word pieces.
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "96"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "24"))
+MAX_CHUNKS_PER_DOC = int(os.getenv("MAX_CHUNKS_PER_DOC", "32"))
+
+
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP,
+               max_chunks: int = MAX_CHUNKS_PER_DOC) -> List[str]:
+    """
+    Split text into windows of at most ``max_words`` words, each sharing
+    ``overlap`` words with the previous one. Text that fits in one window is
+    returned unchanged; at most ``max_chunks`` windows are produced.
+    """
+    words = text.split()
+    if len(words) <= max_words:
+        return [text]
+    step = max(1, max_words - overlap)
+    chunks = []
+    for start in range(0, len(words) - overlap, step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if len(chunks) >= max_chunks:
+            break
+    return chunks
+
+
+def chunk_documents(texts: List[str], prefixes: Optional[List[str]] = None,
+                    max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP,
+                    max_chunks: int = MAX_CHUNKS_PER_DOC) -> Tuple[List[str], np.ndarray]:
+    """
+    Chunk a corpus. Returns the chunk texts and, for each chunk, the index of
+    the document it came from. An optional per-document prefix (e.g. a section
+    title) is prepended to every chunk of that document.
+    """
+    chunks, parents = [], []
+    for i, text in enumerate(texts):
+        prefix = prefixes[i] if prefixes else None
+        for chunk in chunk_text(text, max_words, overlap, max_chunks):
+            chunks.append(f"{prefix}\n{chunk}" if prefix is not None else chunk)
+            parents.append(i)
+    return chunks, np.asarray(parents, dtype=np.int32)
@@ -1,42 +1,160 @@
 """
 Script to scrape TDS course content from tds.s-anand.net
+
+The site is a docsify app: every route ``#/<path>`` is rendered in the browser
+from the markdown file ``<path>.md`` (``README.md`` for a directory), and the
+sidebar comes from ``_sidebar.md``. The crawler reads the sidebar to find the
+course modules and fetches their markdown over plain HTTP. Only pages whose
+source can't be fetched are rendered in headless Chrome, through a small pool
+of drivers reused across pages.
 """
 import os
 import json
 import logging
+import posixpath
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+from app.jsonl import JSONLWriter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_LINK_RE = re.compile(r"!?\[([^\]]*)\]\(([^)\s]+)(?:\s+\"[^\"]*\")?\)")
+
+# Marks the rendered article so a wait can tell when docsify has replaced it
+_MARK_STALE_JS = """
+var article = document.querySelector(arguments[0]);
+if (article) { var marker = document.createElement('span'); marker.className = 'crawler-stale'; article.appendChild(marker); }
+"""
+_RENDERED_JS = """
+var article = document.querySelector(arguments[0]);
+if (!article || article.querySelector('.crawler-stale') || !article.innerText.trim()) return false;
+return article.innerHTML;
+"""
+_SIDEBAR_JS = """
+return Array.from(document.querySelectorAll('.sidebar-nav a[href]')).map(function (a) { return a.href; });
+"""
+
+
+def iter_markdown_sections(markdown: str, url: str) -> Iterator[Dict]:
+    """Split a markdown page into sections at its level 1-3 headings, as the rendered page would be."""
+    title, level, content = None, None, []
+    in_fence = False
+    for line in markdown.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading:
+            if title:
+                yield {"title": title, "content": "\n".join(content), "level": level, "url": url}
+            title, level, content = _LINK_RE.sub(r"\1", heading.group(2)), len(heading.group(1)), []
+        elif title and line.strip() and not _FENCE_RE.match(line):
+            content.append(_LINK_RE.sub(r"\1", line.strip()))
+    if title:
+        yield {"title": title, "content": "\n".join(content), "level": level, "url": url}
+
+
+class DriverPool:
+    """Up to `size` browser drivers, created on first use and reused across pages."""
+
+    def __init__(self, factory: Callable, size: int = 2):
+        self.factory = factory
+        self.size = max(1, size)
+        self.created = 0
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        """Borrow a driver; one that raised is quit and replaced instead of being reused."""
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+            if create:
+                try:
+                    driver = self.factory()
+                except Exception:
+                    with self._lock:
+                        self.created -= 1
+                    raise
+            else:
+                driver = self._idle.get()
+        try:
+            yield driver
+        except Exception:
+            with self._lock:
+                self.created -= 1
+            driver.quit()
+            raise
+        self._idle.put(driver)
+
+    def close(self):
+        """Quit the idle drivers."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                self.created -= 1
+            driver.quit()
+
+
 class CourseContentScraper:
     """Scraper for TDS course content from tds.s-anand.net"""
     
-    def __init__(self, base_url: str = "https://tds.s-anand.net/#/2025-01/"):
+    def __init__(self, base_url: str = "https://tds.s-anand.net/#/2025-01/", workers: int = None,
+                 browsers: int = None, render: str = None, timeout: float = 30.0):
+        """
+        :param workers: Pages fetched in parallel
+        :param browsers: Headless Chrome instances kept for pages that need rendering
+        :param render: "auto" fetches markdown and renders only pages without it, "http" never
+            starts a browser, "browser" renders every page
+        """
         self.base_url = base_url
         self.output_dir = "data"
+        # "json" writes course_content.json at the end; "jsonl" streams one section per line
+        self.output_format = os.getenv("SCRAPER_OUTPUT_FORMAT", "json")
+        self.workers = workers or int(os.getenv("COURSE_SCRAPER_WORKERS", "4"))
+        self.render = render or os.getenv("COURSE_RENDER", "auto")
+        self.timeout = timeout
+        self.site_root, self.start_route = self._split_route(base_url)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.driver_pool = DriverPool(self.setup_driver, browsers or int(os.getenv("COURSE_BROWSERS", "2")))
         
     def setup_driver(self):
         """Setup Chrome driver with necessary options"""
+        # Selenium is only needed when a page has to be rendered
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+        
         chrome_options = Options()
         chrome_options.add_argument("--headless=new")  # Use new headless mode
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--remote-debugging-port=9222")
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
@@ -50,106 +168,198 @@ class CourseContentScraper:
         
         return driver
         
+    @staticmethod
+    def _split_route(url: str) -> Tuple[str, str]:
+        """Split a docsify URL into the site root and its route: .../#/2025-01/ -> (.../, /2025-01/)."""
+        root, _, fragment = url.partition("#")
+        root = root if root.endswith("/") else root.rsplit("/", 1)[0] + "/"
+        route = fragment.split("?")[0] or "/"
+        return root, route if route.startswith("/") else "/" + route
+        
+    def page_url(self, route: str) -> str:
+        return f"{self.site_root}#{route}"
+        
+    def markdown_url(self, route: str) -> str:
+        """URL of the markdown file docsify renders for a route."""
+        path = route.lstrip("/")
+        if not path or path.endswith("/"):
+            path += "README.md"
+        elif not path.endswith(".md"):
+            path += ".md"
+        return urljoin(self.site_root, path)
+        
+    def _fetch_text(self, url: str) -> Optional[str]:
+        """GET a markdown file; None when it is missing or the server answers with an HTML page instead."""
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        if "text/html" in response.headers.get("Content-Type", ""):
+            return None
+        response.encoding = response.encoding if "charset" in response.headers.get("Content-Type", "") else "utf-8"
+        return response.text
+        
+    def _link_route(self, href: str, directory: str) -> Optional[str]:
+        """Route of a sidebar link, or None for links outside the site."""
+        if href.startswith("#/"):
+            return href[1:].split("?")[0]
+        url = urlsplit(href)
+        if url.scheme or url.netloc:
+            if not href.startswith(self.site_root):
+                return None
+            return self._split_route(href)[1] if url.fragment.startswith("/") else None
+        if not url.path:
+            return None  # In-page anchor
+        path = posixpath.normpath(posixpath.join(directory, url.path))
+        if path.endswith(".md"):
+            path = path[:-3]
+        if posixpath.basename(path) == "README":
+            path = posixpath.dirname(path) + "/"
+        return path if path.startswith("/") else "/" + path
+        
+    def discover_pages(self) -> List[str]:
+        """Routes to crawl: the start page, then the sidebar's modules in order."""
+        directory = self.start_route if self.start_route.endswith("/") else posixpath.dirname(self.start_route) + "/"
+        hrefs = None
+        if self.render != "browser":
+            # docsify looks for _sidebar.md next to the page, then in each parent directory
+            candidates = [directory]
+            while candidates[-1] != "/":
+                candidates.append(posixpath.dirname(candidates[-1].rstrip("/")).rstrip("/") + "/")
+            for sidebar_dir in candidates:
+                sidebar = self._fetch_text(urljoin(self.site_root, sidebar_dir.lstrip("/") + "_sidebar.md"))
+                if sidebar is not None:
+                    hrefs = [(href, sidebar_dir) for _, href in _LINK_RE.findall(sidebar)]
+                    break
+        if hrefs is None and self.render != "http":
+            hrefs = [(href, directory) for href in self._render_sidebar()]
+        if hrefs is None:
+            logger.warning(f"No sidebar found for {self.base_url}; crawling the start page only")
+            hrefs = []
+            
+        routes = [self.start_route]
+        for href, sidebar_dir in hrefs:
+            route = self._link_route(href, sidebar_dir)
+            if route and route not in routes:
+                routes.append(route)
+        return routes
+        
+    def _render(self, route: str, script: str, selector: str):
+        """Load a route in a pooled driver and wait until the script returns a value."""
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        with self.driver_pool.driver() as driver:
+            # A hash change re-renders the same document, so mark the old article first
+            driver.execute_script(_MARK_STALE_JS, selector)
+            driver.get(self.page_url(route))
+            return WebDriverWait(driver, self.timeout).until(lambda d: d.execute_script(script, selector))
+        
+    def _render_sidebar(self) -> List[str]:
+        return self._render(self.start_route, _SIDEBAR_JS, "article") or []
+        
+    def _render_page(self, route: str) -> List[Dict]:
+        soup = BeautifulSoup(self._render(route, _RENDERED_JS, "article"), 'html.parser')
+        return [dict(section, url=self.page_url(route)) for section in self._iter_sections(soup)]
+        
+    def scrape_page(self, route: str) -> List[Dict]:
+        """Sections of one page, from its markdown when available, else from the rendered page."""
+        try:
+            if self.render != "browser":
+                markdown = self._fetch_text(self.markdown_url(route))
+                if markdown is not None:
+                    return list(iter_markdown_sections(markdown, self.page_url(route)))
+                if self.render == "http":
+                    logger.warning(f"No markdown for {route}; skipped without a browser")
+                    return []
+            return self._render_page(route)
+        except Exception as e:
+            logger.error(f"Error scraping course page {route}: {str(e)}")
+            return []
+        
+    def crawl(self, routes: List[str]) -> Iterator[Dict]:
+        """Yield the sections of each page in order, fetching up to `workers` pages at a time."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="course") as pool:
+            for route, sections in zip(routes, pool.map(self.scrape_page, routes)):
+                logger.info(f"Scraped {len(sections)} sections from {route}")
+                yield from sections
+        
     def scrape_content(self) -> Dict:
         """
-        Scrape course content from the website
+        Crawl the course: the start page and every module linked from the sidebar
         Returns:
             Dict containing course content structure
         """
         try:
-            logger.info(f"Starting content scrape from {self.base_url}")
+            logger.info(f"Starting content crawl from {self.base_url}")
+            routes = self.discover_pages()
+            logger.info(f"Found {len(routes)} course pages")
             
-            # Create new driver for this scrape
-            driver = self.setup_driver()
+            if self.output_format == "jsonl":
+                # Sections are written and flushed as pages complete
+                output_file = os.path.join(self.output_dir, "course_content.jsonl")
+                with JSONLWriter(output_file) as writer:
+                    for section in self.crawl(routes):
+                        writer.write(section)
+                logger.info(f"Saved course content to {output_file}")
+                return {"title": "Tools in Data Science - Jan 2025", "sections_file": output_file,
+                        "source_url": self.base_url}
+                        
+            # Extract course structure
+            course_data = {
+                "title": "Tools in Data Science - Jan 2025",
+                "last_updated": datetime.now().isoformat(),
+                "sections": list(self.crawl(routes)),
+                "source_url": self.base_url
+            }
+            logger.info(f"Extracted {len(course_data['sections'])} sections from {len(routes)} pages")
             
-            try:
-                # Load the page
-                driver.get(self.base_url)
-                logger.info("Page loaded, waiting for content...")
-                
-                # Wait for initial load
-                time.sleep(5)
-                
-                # Wait for content to load - look for the article element
-                article = WebDriverWait(driver, 30).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "article"))
-                )
-                
-                # Additional wait to ensure dynamic content loads
-                time.sleep(2)
-                
-                # Get the article content
-                content = article.get_attribute('innerHTML')
-                soup = BeautifulSoup(content, 'html.parser')
-                
-                # Extract course structure
-                course_data = {
-                    "title": "Tools in Data Science - Jan 2025",
-                    "last_updated": datetime.now().isoformat(),
-                    "sections": self._extract_sections(soup),
-                    "source_url": self.base_url
-                }
-                
-                # Save the data
-                self._save_content(course_data)
-                return course_data
-                
-            finally:
-                driver.quit()
+            # Save the data
+            self._save_content(course_data)
+            return course_data
             
         except Exception as e:
             logger.error(f"Error scraping course content: {str(e)}")
             raise
-    
-    def _extract_sections(self, soup: BeautifulSoup) -> List[Dict]:
-        """Extract course sections and their content"""
-        sections = []
-        try:
-            # Find all headers which typically denote sections
-            headers = soup.find_all(['h1', 'h2', 'h3'])
-            
-            current_section = None
-            current_content = []
-            current_section_level = None
-            
-            # Process all elements
-            for element in soup.children:
-                # If we find a header, it's a new section
-                if element.name in ['h1', 'h2', 'h3']:
-                    # Save the previous section if it exists
-                    if current_section:
-                        sections.append({
-                            "title": current_section,
-                            "content": "\n".join(current_content),
-                            "level": int(current_section_level[1])
-                        })
+        finally:
+            self.driver_pool.close()
+        
+    def _iter_sections(self, soup: BeautifulSoup) -> Iterator[Dict]:
+        """Yield course sections one at a time, each as soon as its content is complete"""
+        current_section = None
+        current_content = []
+        current_section_level = None
+        
+        # Process all elements
+        for element in soup.children:
+            # If we find a header, it's a new section
+            if element.name in ['h1', 'h2', 'h3']:
+                # Emit the previous section if it exists
+                if current_section:
+                    yield {
+                        "title": current_section,
+                        "content": "\n".join(current_content),
+                        "level": int(current_section_level[1])
+                    }
                     
-                    # Start a new section
-                    current_section = element.get_text(strip=True)
-                    current_section_level = element.name
-                    current_content = []
+                # Start a new section
+                current_section = element.get_text(strip=True)
+                current_section_level = element.name
+                current_content = []
                 
-                # Add content to current section
-                elif current_section and element.name:
-                    content_text = element.get_text(strip=True)
-                    if content_text:
-                        current_content.append(content_text)
-            
-            # Don't forget to add the last section
-            if current_section:
-                sections.append({
-                    "title": current_section,
-                    "content": "\n".join(current_content),
-                    "level": int(current_section_level[1])
-                })
-            
-            logger.info(f"Extracted {len(sections)} sections from the course content")
-            
-        except Exception as e:
-            logger.error(f"Error extracting sections: {str(e)}")
-            
-        return sections
-    
+            # Add content to current section
+            elif current_section and element.name:
+                content_text = element.get_text(strip=True)
+                if content_text:
+                    current_content.append(content_text)
+                    
+        # Don't forget the last section
+        if current_section:
+            yield {
+                "title": current_section,
+                "content": "\n".join(current_content),
+                "level": int(current_section_level[1])
+            }
+        
     def _save_content(self, data: Dict):
         """Save scraped content to JSON file"""
         os.makedirs(self.output_dir, exist_ok=True)
@@ -160,4 +370,4 @@ class CourseContentScraper:
 
 if __name__ == "__main__":
     scraper = CourseContentScraper()
-    scraper.scrape_content() 
\ No newline at end of file
+    scraper.scrape_content()
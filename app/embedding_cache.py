@@ -0,0 +1,142 @@
+"""
+Persistent on-disk cache for corpus embeddings.
+
+Embeddings are stored per corpus as a float32 ``.npy`` matrix next to a
+``.keys.json`` file listing the content hash of every row. Both live in a
+directory named after the model, so switching models never reuses stale
+vectors. On load the matrix is memory-mapped and only documents whose hash
+is not already cached are sent to the encoder.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a document's text, used as its cache key."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def atomic_write(path: str, write: Callable) -> None:
+    """Write a file through a temporary sibling so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class EmbeddingCache:
+    """Cache of corpus embeddings keyed by model name and per-document content hash."""
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, name: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, name)
+        return f"{base}.npy", f"{base}.keys.json"
+
+    def load(self, name: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Return the cached row hashes and memory-mapped matrix for a corpus."""
+        matrix_path, keys_path = self._paths(name)
+        if not (os.path.exists(matrix_path) and os.path.exists(keys_path)):
+            return [], None
+        try:
+            with open(keys_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(matrix_path, mmap_mode="c")
+            if meta.get("model") != self.model_name or len(meta["hashes"]) != matrix.shape[0]:
+                logger.warning(f"Ignoring inconsistent embedding cache for '{name}'")
+                return [], None
+            return meta["hashes"], matrix
+        except Exception as e:
+            logger.warning(f"Could not read embedding cache for '{name}': {str(e)}")
+            return [], None
+
+    def save(self, name: str, hashes: List[str], matrix: np.ndarray) -> None:
+        """Persist a corpus matrix and its row hashes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        matrix_path, keys_path = self._paths(name)
+        atomic_write(matrix_path, lambda f: np.save(f, np.ascontiguousarray(matrix, dtype=np.float32)))
+        meta = {"model": self.model_name, "hashes": hashes}
+        atomic_write(keys_path, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    def encode(self, name: str, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return embeddings for ``texts``, encoding only documents missing from the cache.
+        The returned matrix is memory-mapped from the cache file.
+        """
+        return self.encode_batches(name, [texts], encode_fn)
+
+    def encode_batches(self, name: str, batches: Iterable[List[str]],
+                       encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Like ``encode`` for a corpus that arrives in batches, e.g. while it is still being
+        read: each batch's cache misses are encoded as soon as the batch arrives, and the
+        cache is written once at the end.
+        """
+        cached_hashes, cached = self.load(name)
+        row_of = {h: i for i, h in enumerate(cached_hashes)}
+        hashes, blocks, missing_count = [], [], 0
+
+        for texts in batches:
+            if not texts:
+                continue
+            batch_hashes = [content_hash(text) for text in texts]
+            start = len(hashes)
+            if cached_hashes[start:start + len(texts)] == batch_hashes:
+                # Unchanged stretch of the cached corpus: copied only if the cache is rewritten
+                blocks.append((start, start + len(texts)))
+                hashes.extend(batch_hashes)
+                continue
+            missing = [i for i, h in enumerate(batch_hashes) if h not in row_of]
+            encoded = None
+            if missing:
+                encoded = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            dim = encoded.shape[1] if encoded is not None else cached.shape[1]
+
+            block = np.empty((len(texts), dim), dtype=np.float32)
+            for i, h in enumerate(batch_hashes):
+                if h in row_of:
+                    block[i] = cached[row_of[h]]
+            if missing:
+                block[missing] = encoded
+            blocks.append(block)
+            hashes.extend(batch_hashes)
+            missing_count += len(missing)
+
+        if not hashes:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hit_count = len(hashes) - missing_count
+        self.hits += hit_count
+        self.misses += missing_count
+        logger.info(f"Embedding cache '{name}': {hit_count} hits, {missing_count} misses")
+
+        if cached is not None and cached_hashes == hashes:
+            return cached
+
+        matrix = np.vstack([cached[block[0]:block[1]] if isinstance(block, tuple) else block for block in blocks])
+        del blocks
+        # Release the old mapping before the file underneath it is replaced
+        del cached
+        self.save(name, hashes, matrix)
+
+        _, mapped = self.load(name)
+        return mapped if mapped is not None else matrix
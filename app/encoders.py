@@ -0,0 +1,49 @@
+"""
+The sentence embedding model, and lightweight stand-ins for it.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+
+
+class HashingEncoder:
+    """
+    Deterministic bag-of-words encoder with the same ``encode`` interface as
+    SentenceTransformer. Each word is hashed into one of ``dim`` buckets, so
+    texts sharing words get similar vectors. ``call_overhead_ms`` and
+    ``per_item_ms`` simulate inference cost when benchmarking.
+    """
+
+    def __init__(self, dim: int = 384, call_overhead_ms: float = 0.0, per_item_ms: float = 0.0):
+        self.dim = dim
+        self.call_overhead_ms = call_overhead_ms
+        self.per_item_ms = per_item_ms
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vec[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        return vec
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if self.call_overhead_ms or self.per_item_ms:
+            time.sleep((self.call_overhead_ms + self.per_item_ms * len(batch)) / 1000.0)
+        vectors = np.stack([self._vector(t) for t in batch]) if batch else np.zeros((0, self.dim), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def load_encoder(model_name: str, device: str = "cpu"):
+    """
+    Load the embedding model. sentence_transformers (and with it torch) is imported
+    here rather than at module level, so processes that never encode don't pay for it.
+    ``ENCODER=stub`` returns a HashingEncoder instead, for tests and benchmarks.
+    """
+    if os.getenv("ENCODER", "model").lower() == "stub":
+        return HashingEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=device)
@@ -0,0 +1,73 @@
+"""
+Bounded executor for CPU-bound work called from async request handlers.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds its maximum number of pending calls."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls on a dedicated thread pool so they never block the
+    event loop. At most ``max_workers`` calls run at once and at most
+    ``max_queue`` more may wait; further calls are rejected immediately.
+    Each call is awaited for at most ``timeout`` seconds.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, timeout: float = 30.0,
+                 thread_name_prefix: str = "search"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"{self._pending} requests already pending")
+            self._pending += 1
+
+        try:
+            future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is held until the work itself finishes, even if the caller times out
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Call to {getattr(fn, '__name__', fn)} timed out after {self.timeout}s")
+            raise
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,122 @@
+"""
+Streaming JSON Lines output for the scrapers, and incremental readers for it.
+
+A ``JSONLWriter`` appends one record per line to ``<path>.partial`` and
+flushes as it goes, so readers can follow a scrape while it runs. On close
+the partial file atomically replaces ``<path>``, and the previous output is
+kept as ``<path>.1``. Readers only ever see complete lines: a trailing line
+without its newline is still being written.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+def partial_path(path: str) -> str:
+    return f"{path}.partial"
+
+
+class JSONLWriter:
+    """Write records as JSON lines to a live partial file, published atomically on close."""
+
+    def __init__(self, path: str, flush_every: int = 1, keep_previous: bool = True):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.keep_previous = keep_previous
+        self.records = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(partial_path(path), "w", encoding="utf-8")
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records += 1
+        if self.records % self.flush_every == 0:
+            self._file.flush()
+
+    def write_many(self, records: List[Dict]):
+        for record in records:
+            self.write(record)
+        self._file.flush()
+
+    def close(self):
+        """Publish the output: fsync, keep the old file as <path>.1, then atomically replace <path>."""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if self.keep_previous and os.path.exists(self.path):
+            previous = f"{self.path}.1"
+            try:
+                if os.path.exists(previous):
+                    os.remove(previous)
+                os.link(self.path, previous)
+            except OSError:
+                shutil.copyfile(self.path, previous)
+        os.replace(partial_path(self.path), self.path)
+        logger.info(f"Wrote {self.records} records to {self.path}")
+
+    def abort(self):
+        """Stop without publishing; the partial file is left for inspection."""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def iter_jsonl(path: str, follow: bool = False, poll_interval: float = 0.5,
+               idle_timeout: float = 300.0) -> Iterator[Dict]:
+    """
+    Yield records from a JSON Lines file. With ``follow``, a scrape still writing
+    ``<path>.partial`` is tailed until it is published, so records are consumed as
+    they are scraped. Tailing gives up after ``idle_timeout`` seconds without new data.
+    Lines a scrape never finished are skipped.
+    """
+    live = partial_path(path)
+    source = live if follow and os.path.exists(live) else path
+    with open(source, "r", encoding="utf-8") as f:
+        pending = ""
+        idle_since = time.monotonic()
+        while True:
+            line = f.readline()
+            if line.endswith("\n"):
+                line, pending = pending + line, ""
+                idle_since = time.monotonic()
+                if line.strip():
+                    yield json.loads(line)
+                continue
+            pending += line
+            # At the end of the data written so far
+            done = source != live or not os.path.exists(live)
+            if not done and time.monotonic() - idle_since > idle_timeout:
+                logger.warning(f"No new records in {live} for {idle_timeout}s; stopping")
+                done = True
+            if done:
+                # The published file is the one already open; drain what was written before the rename
+                lines = (pending + f.read()).split("\n")
+                if source == live:
+                    lines = lines[:-1]  # A live file's last line without a newline was cut off
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+                return
+            time.sleep(poll_interval)
+
+
+def write_jsonl(path: str, records: List[Dict]):
+    """Write a complete list of records through a JSONLWriter."""
+    with JSONLWriter(path, flush_every=1000) as writer:
+        for record in records:
+            writer.write(record)
@@ -0,0 +1,124 @@
+"""
+In-memory BM25 inverted index over the embedding rows.
+
+Many questions hinge on exact tokens (``gpt-3.5-turbo-0125``, ``GA5``,
+``--rm``) that sentence embeddings blur together. The tokenizer keeps such
+tokens whole and also indexes their alphabetic and numeric parts, so
+``gpt3.5 turbo`` still matches ``gpt-3.5-turbo-0125``. Postings are stored
+in CSR layout with the BM25 weight of each (term, row) pair precomputed, so a
+query only sums the postings of its own terms.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"-{1,2}[a-z0-9][a-z0-9_.\-]*|[a-z0-9][a-z0-9_.\-]*")
+_PART_RE = re.compile(r"[a-z]+|[0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my of on or "
+    "should so that the their then there these this to was we what when where which who will with would "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens, keeping hyphenated/dotted tokens and flags whole plus their parts."""
+    tokens = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        token = match.rstrip("._-")
+        if not token or token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            tokens.extend(part for part in parts if part not in STOPWORDS)
+    return tokens
+
+
+def exact_tokens(text: str) -> frozenset:
+    """Identifier-like tokens (containing a digit, '-', '.' or '_') such as ``ga5``, ``--rm`` or ``gpt-3.5``."""
+    return frozenset(token for token in (match.rstrip("._-") for match in _TOKEN_RE.findall(text.lower()))
+                     if token and not token.isalpha())
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts, one document per embedding row."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}  # term -> term id
+        self.offsets = None  # Postings of term t are rows[offsets[t]:offsets[t + 1]]
+        self.rows = None
+        self.weights = None
+        self.idf = None
+        self.n_docs = 0
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        index = cls(k1, b)
+        postings = {}  # term -> ([rows], [term frequencies])
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(row)
+                entry[1].append(tf)
+
+        index.n_docs = len(texts)
+        avg_length = float(lengths.mean()) if len(texts) else 0.0
+        index.vocabulary = {term: i for i, term in enumerate(postings)}
+        sizes = np.array([len(rows) for rows, _ in postings.values()], dtype=np.int64)
+        index.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        index.rows = np.fromiter((r for rows, _ in postings.values() for r in rows), dtype=np.int32,
+                                 count=int(index.offsets[-1]))
+        tfs = np.fromiter((tf for _, tf in postings.values() for tf in tf), dtype=np.float32,
+                          count=int(index.offsets[-1]))
+
+        # Precompute idf * saturated tf for every posting
+        index.idf = np.log1p((index.n_docs - sizes + 0.5) / (sizes + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[index.rows] / max(avg_length, 1e-6))
+        index.weights = (np.repeat(index.idf, sizes) * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+        logger.info(f"Built BM25 index: {len(index.vocabulary)} terms, {len(index.rows)} postings over {index.n_docs} rows")
+        return index
+
+    def search(self, query: str, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to ``limit`` matching rows and their BM25 scores, best first."""
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids or limit <= 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        spans = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        rows = np.concatenate([self.rows[span] for span in spans])
+        weights = np.concatenate([self.weights[span] for span in spans])
+        matched, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if len(matched) > limit:
+            keep = np.argpartition(-scores, limit - 1)[:limit]
+            matched, scores = matched[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return matched[order], scores[order]
+
+    def score_bound(self, query: str) -> float:
+        """
+        Score of an average-length row containing every query term once, for judging
+        how fully a row matches. Terms missing from the index count with the highest
+        idf, so they lower every match.
+        """
+        unseen_idf = np.log1p((self.n_docs + 0.5) / 0.5)
+        return float(sum(self.idf[self.vocabulary[term]] if term in self.vocabulary else unseen_idf
+                         for term in set(tokenize(query))))
+
+    def stats(self) -> Dict:
+        return {
+            "rows": self.n_docs,
+            "terms": len(self.vocabulary),
+            "postings": 0 if self.rows is None else len(self.rows),
+            "bytes": 0 if self.rows is None else int(self.rows.nbytes + self.weights.nbytes + self.offsets.nbytes),
+        }
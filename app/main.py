@@ -1,11 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routes import router
+from app.admin import router as admin_router
+from app.warmup import lifespan, readiness
+from app.metrics import REGISTRY
 
 app = FastAPI(
     title="TDS Virtual TA",
     description="A virtual Teaching Assistant for the Tools in Data Science course",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -19,12 +24,23 @@ app.add_middleware(
 
 # Include the router
 app.include_router(router)
+app.include_router(admin_router, prefix="/admin")
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+# Readiness endpoint: 200 once the model and corpora are loaded
+@app.get("/ready")
+async def readiness_check():
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.status())
+
+# Prometheus metrics
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Prometheus metrics for the question path, served as text at ``/metrics``.
+
+Stage timings and answer counts are recorded as they happen, in labelled
+histograms and counters that cost a lock and a bisect per observation.
+Everything the app already counts (cache hits, corpus sizes, rule hits,
+executor queue) is read by collectors only when ``/metrics`` is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (name, type, help, [(labels, value)]) as produced by collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RESULT_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_number(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a function returning metric families, called on every scrape."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "tds_stage_seconds", "Time spent in each stage of answering questions", ["stage"])
+ANSWERS = REGISTRY.counter(
+    "tds_answers_total", "Questions answered, by where the answer came from", ["source"])
+SEARCH_RESULTS = REGISTRY.histogram(
+    "tds_search_results", "Results returned per searched question", buckets=RESULT_BUCKETS)
+
+
+def engine_families(engine) -> List[Family]:
+    """Corpus, memory, model and cache metrics of a loaded SearchEngine."""
+    families = [
+        ("tds_corpus_documents", "gauge", "Posts and course sections loaded",
+         [({"source": "course"}, len(engine.course_content)), ({"source": "discourse"}, len(engine.discourse_posts))]),
+        ("tds_corpus_chunks", "gauge", "Embedded chunks per source",
+         [({"source": "course"}, len(engine.course_chunks)), ({"source": "discourse"}, len(engine.discourse_chunks))]),
+        ("tds_corpus_version", "gauge", "Times the corpus has been (re)loaded", [({}, engine.corpus_version)]),
+    ]
+
+    memory = []
+    if engine.embeddings is not None:
+        # A memory-mapped matrix is paged in from the embedding cache, not held resident
+        mapped = isinstance(engine.embeddings, np.memmap)
+        memory.append(({"kind": "float32_mmap" if mapped else "float32"}, engine.embeddings.nbytes))
+    if engine.quantized is not None:
+        memory.append(({"kind": engine.quantized.mode}, engine.quantized.nbytes))
+    if engine.lexical_index is not None:
+        memory.append(({"kind": "bm25"}, engine.lexical_index.stats()["bytes"]))
+    families.append(("tds_embedding_bytes", "gauge",
+                     "Bytes of the score matrix (float32 in memory or float32_mmap on disk), "
+                     "its quantized codes and the BM25 index", memory))
+    if engine.model_load_seconds is not None:
+        families.append(("tds_model_load_seconds", "gauge", "Seconds taken to load the embedding model",
+                         [({}, engine.model_load_seconds)]))
+
+    caches = {"query_embeddings": engine.query_cache, "answers": engine.answer_cache,
+              "similar_questions": engine.semantic_cache, "ocr": engine.ocr.cache}
+    families.append(("tds_cache_lookups_total", "counter", "Cache lookups by cache and result",
+                     [({"cache": name, "result": result}, getattr(cache, attribute))
+                      for name, cache in caches.items() for result, attribute in (("hit", "hits"), ("miss", "misses"))]))
+    families.append(("tds_cache_entries", "gauge", "Entries held per cache",
+                     [({"cache": name}, len(cache)) for name, cache in caches.items()]))
+    ocr = engine.ocr.stats()
+    families.append(("tds_ocr_skipped_total", "counter", "Images skipped as too small or blank", [({}, ocr["skipped"])]))
+    families.append(("tds_ocr_timeouts_total", "counter", "OCR calls killed after the timeout", [({}, ocr["timeouts"])]))
+    return families
+
+
+def readiness_families(status: Dict) -> List[Family]:
+    """Startup state and per-stage load times from app.warmup.readiness."""
+    stages = [({"stage": name}, stage["seconds"]) for name, stage in status["stages"].items()
+              if stage["seconds"] is not None]
+    return [
+        ("tds_ready", "gauge", "1 once the model and corpora are loaded", [({}, int(status["status"] == "ready"))]),
+        ("tds_startup_stage_seconds", "gauge", "Seconds taken by each startup loading stage", stages),
+    ]
+
+
+def stats_families(prefix: str, help: str, stats: Dict, kinds: Optional[Dict[str, str]] = None) -> List[Family]:
+    """One family per numeric entry of a stats() dict; entries listed in `kinds` as "counter" get a _total suffix."""
+    kinds = kinds or {}
+    families = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = kinds.get(key, "gauge")
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            families.append((name, kind, f"{help}: {key.replace('_', ' ')}", [({}, value)]))
+    return families
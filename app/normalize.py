@@ -0,0 +1,169 @@
+"""
+Normalize Discourse 'cooked' HTML into compact text at ingest time.
+
+Each post becomes plain text plus its extracted code blocks and links, so
+embeddings and answers don't spend tokens on markup, onebox previews or
+quote headers. Results are cached on disk by post id (and content hash, so
+edited posts are redone); large dumps are normalized in a process pool.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from app.embedding_cache import atomic_write
+
+logger = logging.getLogger(__name__)
+
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", str(os.cpu_count() or 1)))
+NORMALIZE_POOL_MIN = int(os.getenv("NORMALIZE_POOL_MIN", "2000"))
+
+# Elements that are boilerplate rather than post content
+_DROP_SELECTORS = [
+    "aside.onebox",  # Link previews
+    "aside.quote > .title",  # "user said:" headers
+    "div.meta",  # Image lightbox size/filename captions
+    "img.emoji",
+    "script",
+    "style",
+]
+_BLOCK_TAGS = ["p", "div", "li", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "br", "aside"]
+
+
+def normalize_html(html: str) -> Dict:
+    """Convert cooked HTML to {'text', 'code_blocks', 'links'}."""
+    if not html or "<" not in html:
+        return {"text": (html or "").strip(), "code_blocks": [], "links": []}
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    links = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if href.startswith("#") or "mention" in (a.get("class") or []):
+            continue
+        links.append({"url": href, "text": a.get_text(" ", strip=True)})
+
+    for selector in _DROP_SELECTORS:
+        for element in soup.select(selector):
+            element.decompose()
+
+    code_blocks = [pre.get_text().strip("\n") for pre in soup.find_all("pre")]
+
+    # Put block elements on their own lines before flattening
+    for element in soup.find_all(_BLOCK_TAGS):
+        element.insert_before("\n")
+        element.insert_after("\n")
+    text = soup.get_text()
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r"\s*\n\s*", "\n", text).strip()
+
+    return {"text": text, "code_blocks": code_blocks, "links": links}
+
+
+def _post_key(post: Dict) -> str:
+    return str(post["post_id"]) if post.get("post_id") is not None else hashlib.sha1(post["content"].encode("utf-8")).hexdigest()
+
+
+def _content_hash(html: str) -> str:
+    return hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+def load_cache(cache_path: Optional[str]) -> Dict:
+    """Read a normalization cache file, or start an empty cache."""
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read normalization cache {cache_path}: {str(e)}")
+    return {}
+
+
+def save_cache(cache_path: str, cache: Dict, posts: List[Dict]):
+    """Write the cache entries of the given posts; posts no longer in the dump are dropped."""
+    current = {key: cache[key] for key in (_post_key(post) for post in posts) if key in cache}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    atomic_write(cache_path, lambda f: f.write(json.dumps(current, ensure_ascii=False).encode("utf-8")))
+
+
+class NormalizePool:
+    """
+    Parses HTML for the batches of one load, inline until ``pool_min`` posts have
+    needed parsing and then in one process pool of ``workers`` that later batches reuse.
+    """
+
+    def __init__(self, workers: Optional[int] = None, pool_min: Optional[int] = None):
+        self.workers = workers if workers is not None else NORMALIZE_WORKERS
+        self.pool_min = pool_min if pool_min is not None else NORMALIZE_POOL_MIN
+        self.parsed = 0
+        self._pool = None
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def map(self, htmls: List[str]) -> List[Dict]:
+        self.parsed += len(htmls)
+        if self._pool is None and self.workers > 1 and self.parsed >= self.pool_min:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        if self._pool is None:
+            return [normalize_html(html) for html in htmls]
+        return list(self._pool.map(normalize_html, htmls, chunksize=64))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def normalize_posts(posts: List[Dict], cache_path: Optional[str] = None,
+                    workers: Optional[int] = None, pool_min: Optional[int] = None,
+                    cache: Optional[Dict] = None, pool: Optional[NormalizePool] = None) -> List[Dict]:
+    """
+    Add 'text', 'code_blocks' and 'links' to each post from its HTML 'content'.
+    Posts already in the cache with unchanged content are not re-parsed; when at
+    least ``pool_min`` posts need parsing they are spread over ``workers`` processes.
+    Pass an already loaded ``cache`` (updated in place) instead of ``cache_path`` to
+    normalize a dump in batches and save the cache once with ``save_cache``, and a
+    ``pool`` shared by those batches so ``pool_min`` counts posts across all of them.
+    """
+    if cache is None:
+        cache = load_cache(cache_path)
+
+    keys = [_post_key(post) for post in posts]
+    hashes = [_content_hash(post["content"]) for post in posts]
+    missing = [i for i, (key, h) in enumerate(zip(keys, hashes)) if cache.get(key, {}).get("hash") != h]
+
+    if missing:
+        htmls = [posts[i]["content"] for i in missing]
+        if pool is not None:
+            normalized = pool.map(htmls)
+        else:
+            with NormalizePool(workers, pool_min) as own_pool:
+                normalized = own_pool.map(htmls)
+        for i, result in zip(missing, normalized):
+            cache[keys[i]] = dict(result, hash=hashes[i])
+        if cache_path:
+            save_cache(cache_path, cache, posts)
+    logger.info(f"Normalized {len(posts)} posts ({len(posts) - len(missing)} cached, {len(missing)} parsed)")
+
+    fresh = dict(zip(missing, normalized)) if missing else {}
+    normalized_posts = []
+    for i, (post, key) in enumerate(zip(posts, keys)):
+        # Fresh results first, in case two posts share an id
+        entry = fresh.get(i) or cache[key]
+        normalized_posts.append(dict(post, text=entry["text"], code_blocks=entry["code_blocks"], links=entry["links"]))
+    return normalized_posts
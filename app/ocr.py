@@ -0,0 +1,221 @@
+"""
+OCR for question screenshots.
+
+Recognition runs in a separate worker process with a hard timeout, so a
+pathological image can never stall an API worker; the process is killed
+and replaced when it overruns, once no other call is still waiting on it.
+Starting the worker and loading the model has its own, longer bound.
+Results are cached by a hash of the image bytes (timeouts and failures are
+not), large images are downscaled first, and tiny or blank images are
+skipped without touching the OCR model.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import cached_property
+from typing import TYPE_CHECKING, BinaryIO, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from app.cache import LRUCache
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# EasyOCR reader, created once per worker process
+_reader = None
+
+
+class ImageBytes(bytes):
+    """Raw image bytes that hash themselves once, however many caches look them up."""
+
+    @cached_property
+    def sha256(self) -> str:
+        return hashlib.sha256(self).hexdigest()
+
+
+def image_digest(image: Union[bytes, BinaryIO]) -> str:
+    """SHA-256 of raw image bytes or of a binary file's contents, read in chunks."""
+    if isinstance(image, ImageBytes):
+        return image.sha256
+    if isinstance(image, (bytes, bytearray)):
+        return hashlib.sha256(image).hexdigest()
+    digest = hashlib.sha256()
+    image.seek(0)
+    for chunk in iter(lambda: image.read(64 * 1024), b""):
+        digest.update(chunk)
+    image.seek(0)
+    return digest.hexdigest()
+
+
+def _get_reader():
+    global _reader
+    if _reader is None:
+        import easyocr
+        _reader = easyocr.Reader(['en'], gpu=False)
+    return _reader
+
+
+def _warm_worker() -> bool:
+    _get_reader()
+    return True
+
+
+def _recognize_in_worker(pixels: np.ndarray) -> str:
+    """Runs inside the OCR worker process."""
+    results = _get_reader().readtext(pixels)
+    return ' '.join([result[1] for result in results])
+
+
+class OCRService:
+    """Cached, size-aware OCR backed by a single isolated worker process."""
+
+    def __init__(self, max_side: int = None, min_side: int = None, timeout: float = None,
+                 cache_size: int = None, load_timeout: float = None):
+        self.max_side = max_side or int(os.getenv("OCR_MAX_SIDE", "1600"))
+        self.min_side = min_side or int(os.getenv("OCR_MIN_SIDE", "16"))
+        self.timeout = timeout or float(os.getenv("OCR_TIMEOUT", "20"))
+        # Starting the worker and loading the EasyOCR model has its own, longer bound
+        self.load_timeout = load_timeout or float(os.getenv("OCR_LOAD_TIMEOUT", "300"))
+        self.cache = LRUCache(cache_size if cache_size is not None else int(os.getenv("OCR_CACHE_SIZE", "256")))
+        self.skipped = 0
+        self.timeouts = 0
+        self._worker_fn = _recognize_in_worker
+        self._load_fn = _warm_worker
+        self._pool = None
+        self._loading = None  # Future of the model load in the current worker
+        self._in_flight = {}  # pool -> OCR calls using it
+        self._lock = threading.Lock()
+
+    def _acquire_pool(self) -> Tuple[ProcessPoolExecutor, Future]:
+        """The current worker and its model-load future, starting a worker if there is none."""
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the parent holds torch threads and locks
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+                self._loading = self._pool.submit(self._load_fn)
+            self._in_flight[self._pool] = self._in_flight.get(self._pool, 0) + 1
+            return self._pool, self._loading
+
+    def _release_pool(self, pool: ProcessPoolExecutor, retire: bool = False):
+        """Stop using `pool`; a retired worker is killed once no other call is still waiting on it."""
+        with self._lock:
+            if retire and self._pool is pool:
+                # New calls start a fresh worker instead of queueing behind the stuck one
+                self._pool = self._loading = None
+            self._in_flight[pool] -= 1
+            if self._in_flight[pool] or self._pool is pool:
+                return
+            del self._in_flight[pool]
+        self._kill_pool(pool)
+
+    @staticmethod
+    def _kill_pool(pool: ProcessPoolExecutor):
+        """Terminate a stuck worker."""
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Start the worker process and load the OCR model ahead of the first image."""
+        pool, loading = self._acquire_pool()
+        retire = False
+        try:
+            loading.result(timeout=self.load_timeout)
+        except BaseException:
+            retire = True
+            raise
+        finally:
+            self._release_pool(pool, retire)
+
+    def is_too_small(self, image: "Image.Image") -> bool:
+        """Images too small to hold text; only reads the header."""
+        return min(image.size) < self.min_side
+
+    @staticmethod
+    def is_blank(pixels: np.ndarray) -> bool:
+        """A single flat colour, give or take compression noise."""
+        return int(pixels.max()) - int(pixels.min()) < 8
+
+    def prepare(self, image: "Image.Image") -> np.ndarray:
+        """Downscale so the longest side is at most max_side and convert to RGB pixels."""
+        if max(image.size) > self.max_side:
+            # Let JPEG decoders skip work at reduced resolution before resampling
+            image.draft('RGB', (self.max_side, self.max_side))
+            image.thumbnail((self.max_side, self.max_side))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return np.array(image)
+
+    def _recognize(self, pixels: np.ndarray) -> Optional[str]:
+        """Recognized text, or None when the worker failed or timed out."""
+        pool, loading = self._acquire_pool()
+        retire = False
+        try:
+            loading.result(timeout=self.load_timeout)
+            future = pool.submit(self._worker_fn, pixels)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                self.timeouts += 1
+                logger.warning(f"OCR timed out after {self.timeout}s; restarting worker")
+                retire = True
+        except FutureTimeoutError:
+            logger.warning(f"OCR model not loaded after {self.load_timeout}s; restarting worker")
+            retire = True
+        except Exception as e:
+            logger.error(f"OCR worker failed: {str(e)}")
+            retire = True
+        finally:
+            self._release_pool(pool, retire)
+        return None
+
+    def extract_text(self, image_data: Union[bytes, BinaryIO]) -> str:
+        """
+        Extract text from encoded image bytes or a binary file, using the cache when possible.
+        Files are decoded straight from the stream without an intermediate bytes copy.
+        """
+        try:
+            key = image_digest(image_data)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            # Imported on the first image, not when the app starts
+            from PIL import Image
+
+            source = io.BytesIO(image_data) if isinstance(image_data, (bytes, bytearray)) else image_data
+            image = Image.open(source)
+            pixels = None if self.is_too_small(image) else self.prepare(image)
+            if pixels is None or self.is_blank(pixels):
+                self.skipped += 1
+                text = ""
+            else:
+                text = self._recognize(pixels)
+                if text is None:
+                    # Not cached, so the image is read again once the worker recovers
+                    return ""
+        except Exception as e:
+            logger.error(f"Error extracting text from image: {str(e)}")
+            return ""
+
+        self.cache.put(key, text)
+        return text
+
+    def stats(self) -> Dict:
+        return {"cache": self.cache.stats(), "skipped": self.skipped, "timeouts": self.timeouts}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool, self._loading = self._pool, None, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+"""
+Pre-forked multi-worker server that shares one loaded search engine.
+
+    python -m app.prefork --workers 4 --port 8000
+
+``uvicorn --workers N`` starts N interpreters that each load the model and
+build their own score matrix. Here the parent loads the app and the search
+engine once, moves every object it allocated into the GC's permanent
+generation (``gc.freeze``) and only then forks the workers. Collections in the
+workers no longer touch the parent's objects, so the model weights and
+corpora stay in pages shared copy-on-write. The float score matrix is
+memory-mapped read-only (``EMBEDDING_MMAP``) from the embedding cache, like
+the cached per-corpus embeddings, so its pages are shared through the page
+cache. The workers accept connections from one listening socket bound by the
+parent, and the parent restarts any worker that dies.
+
+torch's OpenMP pool is not fork-safe once the parent has used it, so workers
+run torch single-threaded unless ``WORKER_TORCH_THREADS`` says otherwise.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# A worker dying sooner than this after its start is restarted only after this delay
+RESPAWN_DELAY = 1.0
+
+
+def load_shared(app_path: str = "main:app"):
+    """Import the app and load the search engine in this process, then freeze the heap for forking."""
+    # Workers share the parent's engine; they must not start their own warmup
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    os.environ.setdefault("EMBEDDING_MMAP", "true")
+    from uvicorn.importer import import_from_string
+
+    import app.routes as routes
+
+    asgi_app = import_from_string(app_path)
+    start = time.perf_counter()
+    routes.get_search_engine()
+    logger.info(f"Search engine loaded in {time.perf_counter() - start:.2f} s before forking")
+    gc.collect()
+    gc.freeze()
+    return asgi_app
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(asgi_app, sock: socket.socket, log_level: str):
+    """Worker process body: serve on the shared socket until uvicorn exits."""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(int(os.getenv("WORKER_TORCH_THREADS", "1")))
+    config = uvicorn.Config(asgi_app, lifespan="on", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(asgi_app, sock: socket.socket, log_level: str) -> int:
+    """Fork one worker; returns its pid in the parent and never returns in the worker."""
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        _serve(asgi_app, sock, log_level)
+    except BaseException:
+        logger.exception("Worker crashed")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def serve(workers: int, host: str, port: int, app_path: str = "main:app", log_level: str = "info"):
+    """Load the app once, fork `workers` workers on one socket and keep them running until SIGTERM/SIGINT."""
+    asgi_app = load_shared(app_path)
+    sock = bind_socket(host, port)
+    children: Dict[int, float] = {}  # pid -> start time
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        children[spawn(asgi_app, sock, log_level)] = time.monotonic()
+    logger.info(f"Serving on {host}:{port} with workers {sorted(children)}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        children[spawn(asgi_app, sock, log_level)] = time.monotonic()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--app", default="main:app", help="ASGI app to serve, as module:attribute")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    serve(args.workers, args.host, args.port, args.app, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
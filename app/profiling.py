@@ -0,0 +1,119 @@
+"""
+On-demand profiling of a live worker.
+
+``sample_stacks`` polls ``sys._current_frames()`` for a bounded time and counts
+each thread's stack, so the event loop, the search thread pool, the
+micro-batcher and the OCR client threads are all covered without
+instrumentation. The counts render in the collapsed format read by
+flamegraph.pl and speedscope: one ``thread;outer;...;inner count`` line per
+distinct stack.
+
+``RequestProfiler`` runs the next K searched questions under cProfile and
+merges their statistics. Profiled questions run one at a time, because
+Python 3.12+ allows only one active cProfile profiler per process.
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """Count the collapsed stack of every other thread, sampled every `interval` seconds for `seconds`."""
+    own = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while True:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        if time.monotonic() >= deadline:
+            return counts
+        time.sleep(interval)
+
+
+def collapsed(counts: Counter) -> str:
+    """Stacks in collapsed flamegraph format, most frequent first."""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class RequestProfiler:
+    """Profiles the next `count` calls passed to `run` with cProfile, once armed."""
+
+    def __init__(self):
+        self.requested = 0
+        self.profiled = 0
+        self.remaining = 0
+        self.armed_at = None
+        self._stats = None
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+    def arm(self, count: int):
+        """Start collecting a new profile over the next `count` calls, discarding the previous one."""
+        with self._lock:
+            self.requested = self.remaining = count
+            self.profiled = 0
+            self.armed_at = time.time()
+            self._stats = None
+
+    def claim(self) -> bool:
+        """True when the caller should run its call through `run`; cheap when not armed."""
+        if not self.remaining:
+            return False
+        with self._lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+                return True
+            return False
+
+    def run(self, fn: Callable, *args, **kwargs):
+        with self._run_lock:
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profile)
+                    else:
+                        self._stats.add(profile)
+                    self.profiled += 1
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "requested": self.requested,
+                "profiled": self.profiled,
+                "remaining": self.remaining,
+                "complete": self.requested > 0 and self.profiled >= self.requested,
+                "armed_at": self.armed_at,
+            }
+
+    def report(self, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """pstats listing of the merged profile, or None before the first profiled call."""
+        with self._lock:
+            if self._stats is None:
+                return None
+            stream = io.StringIO()
+            self._stats.stream = stream
+            self._stats.sort_stats(sort).print_stats(limit)
+            return stream.getvalue()
+
+
+request_profiler = RequestProfiler()
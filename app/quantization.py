@@ -0,0 +1,90 @@
+"""
+Compact first-pass representations of the score matrix.
+
+``Int8Matrix`` keeps one int8 code per dimension plus a float32 scale per row
+(4x smaller than float32); ``BinaryMatrix`` keeps only the sign bit of each
+dimension (32x smaller). Both give approximate cosine scores that are only
+used to shortlist rows for exact rescoring against the float matrix.
+"""
+from typing import Callable, Optional
+
+import numpy as np
+
+# Number of set bits in every byte value, for Hamming distances on packed rows
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Int8Matrix:
+    """Per-row scaled int8 codes: row ~= codes * scale."""
+
+    mode = "int8"
+
+    def __init__(self, matrix: np.ndarray, batch_size: int = 4096):
+        self.batch_size = batch_size
+        self.codes = np.empty(matrix.shape, dtype=np.int8)
+        self.scales = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), batch_size):
+            block = np.asarray(matrix[start:start + batch_size], dtype=np.float32)
+            scale = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+            self.codes[start:start + batch_size] = np.round(block / scale[:, None]).astype(np.int8)
+            self.scales[start:start + batch_size] = scale
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate dot products with ``query``, decoded in bounded batches."""
+        rows = np.arange(len(self.codes)) if rows is None else rows
+        out = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            out[start:start + len(batch)] = (self.codes[batch].astype(np.float32) @ query) * self.scales[batch]
+        return out
+
+
+class BinaryMatrix:
+    """Sign bits packed eight dimensions per byte; scored by Hamming distance."""
+
+    mode = "binary"
+
+    def __init__(self, matrix: np.ndarray, batch_size: int = 4096):
+        self.batch_size = batch_size
+        self.dim = matrix.shape[1]
+        self.bits = np.packbits(np.asarray(matrix) > 0, axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate cosine from the fraction of agreeing sign bits."""
+        rows = np.arange(len(self.bits)) if rows is None else rows
+        query_bits = np.packbits(query > 0)
+        out = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            distance = _POPCOUNT[self.bits[batch] ^ query_bits].sum(axis=1, dtype=np.int32)
+            out[start:start + len(batch)] = 1.0 - 2.0 * distance / self.dim
+        return out
+
+
+def quantize(matrix: np.ndarray, mode: str):
+    """Build the compact representation for a storage mode, or None for float storage."""
+    if mode == "int8":
+        return Int8Matrix(matrix)
+    if mode == "binary":
+        return BinaryMatrix(matrix)
+    return None
+
+
+def recall_at_k(exact_rows: Callable[[np.ndarray], np.ndarray],
+                approx_rows: Callable[[np.ndarray], np.ndarray],
+                queries: np.ndarray, k: int = 10) -> float:
+    """Fraction of the exact top-k rows that the approximate search also returns."""
+    hits = total = 0
+    for query in queries:
+        exact = set(exact_rows(query)[:k].tolist())
+        hits += len(exact & set(approx_rows(query)[:k].tolist()))
+        total += len(exact)
+    return hits / total if total else 1.0
@@ -1,10 +1,26 @@
 # app/routes.py
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Optional, List
 from app.search import SearchEngine
+from app.ocr import ImageBytes
+from app.jsonl import partial_path
+from app.executor import BoundedExecutor, QueueFullError
+from app.batching import MicroBatcher
+from app.warmup import readiness
+from app.rules import RulesEngine
+from app.profiling import request_profiler
+from app.metrics import ANSWERS, REGISTRY, STAGE_SECONDS, engine_families, readiness_families, stats_families
+import asyncio
+import json
 import os
+import tempfile
+import threading
 import logging
 import gc
 
@@ -12,71 +28,103 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Lazy initialization of search engine
+# Search engine, built by the startup warmup or on first use
 search_engine = None
+_engine_lock = threading.Lock()
+
+# Request pipelines run here instead of on the event loop; encoding itself is
+# serialized through the micro-batcher, so workers mostly wait on their batch
+search_executor = BoundedExecutor(
+    max_workers=int(os.getenv("SEARCH_WORKERS", "8")),
+    max_queue=int(os.getenv("SEARCH_QUEUE_DEPTH", "16")),
+    timeout=float(os.getenv("SEARCH_TIMEOUT", "30"))
+)
+
+def _find_data_file(candidates: List[str], follow: bool = False) -> Optional[str]:
+    """First existing candidate; with `follow`, a JSON Lines file whose first scrape is still running counts too."""
+    for path in candidates:
+        if os.path.exists(path) or (follow and path.endswith(".jsonl") and os.path.exists(partial_path(path))):
+            return path
+    return None
 
 def get_search_engine():
     global search_engine
-    if search_engine is None:
-        logger.info("Initializing search engine...")
-        search_engine = SearchEngine()
+    if search_engine is not None:
+        return search_engine
+    
+    # Only one thread builds the engine; concurrent callers wait for it
+    with _engine_lock:
+        if search_engine is not None:
+            return search_engine
         
-        # Try multiple possible data file locations
-        possible_paths = {
-            'discourse': [
-                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "discourse_posts.json"),
-                os.path.join("/opt/render/project/src/data", "discourse_posts.json"),
-                "data/discourse_posts.json"
-            ],
-            'course': [
-                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "course_content.json"),
-                os.path.join("/opt/render/project/src/data", "course_content.json"),
-                "data/course_content.json"
+        logger.info("Initializing search engine...")
+        readiness.mark("loading")
+        try:
+            with readiness.stage("model"):
+                engine = SearchEngine()
+            
+            # Try multiple possible data file locations; streamed JSON Lines scrapes win over JSON
+            data_dirs = [os.getenv("DATA_DIR")] if os.getenv("DATA_DIR") else []
+            data_dirs += [
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+                "/opt/render/project/src/data",
+                "data"
             ]
-        }
-        
-        # Load discourse posts
-        discourse_file = None
-        for path in possible_paths['discourse']:
-            if os.path.exists(path):
-                discourse_file = path
-                break
-        
-        if discourse_file:
-            logger.info(f"Loading discourse posts from: {discourse_file}")
-            try:
-                search_engine.load_discourse_posts(discourse_file)
-            except Exception as e:
-                logger.error(f"Error loading discourse posts: {str(e)}", exc_info=True)
-        else:
-            logger.warning("Could not find discourse posts data file")
+            possible_paths = {
+                'discourse': [os.path.join(d, f"discourse_posts.{ext}") for ext in ("jsonl", "json") for d in data_dirs],
+                'course': [os.path.join(d, f"course_content.{ext}") for ext in ("jsonl", "json") for d in data_dirs]
+            }
             
-        # Load course content
-        course_file = None
-        for path in possible_paths['course']:
-            if os.path.exists(path):
-                course_file = path
-                break
+            # Load discourse posts
+            discourse_file = _find_data_file(possible_paths['discourse'], engine.follow_scrapes)
+            if discourse_file:
+                logger.info(f"Loading discourse posts from: {discourse_file}")
+                try:
+                    with readiness.stage("discourse"):
+                        engine.load_discourse_posts(discourse_file)
+                except Exception as e:
+                    logger.error(f"Error loading discourse posts: {str(e)}", exc_info=True)
+            else:
+                logger.warning("Could not find discourse posts data file")
+                
+            # Load course content
+            course_file = _find_data_file(possible_paths['course'], engine.follow_scrapes)
+            if course_file:
+                logger.info(f"Loading course content from: {course_file}")
+                try:
+                    with readiness.stage("course"):
+                        engine.load_course_content(course_file)
+                except Exception as e:
+                    logger.error(f"Error loading course content: {str(e)}", exc_info=True)
+            else:
+                logger.warning("Could not find course content data file")
+                
+            if not discourse_file and not course_file:
+                raise HTTPException(
+                    status_code=500,
+                    detail="No data files found"
+                )
+
+            # One score matrix, lexical and ANN index over both corpora
+            with readiness.stage("index"):
+                engine.build_index()
+        except Exception as e:
+            readiness.mark("failed", str(getattr(e, "detail", e)))
+            raise
         
-        if course_file:
-            logger.info(f"Loading course content from: {course_file}")
-            try:
-                search_engine.load_course_content(course_file)
-            except Exception as e:
-                logger.error(f"Error loading course content: {str(e)}", exc_info=True)
-        else:
-            logger.warning("Could not find course content data file")
-            
-        if not discourse_file and not course_file:
-            raise HTTPException(
-                status_code=500,
-                detail="No data files found"
-            )
-            
+        # Publish the engine only once it is fully loaded
+        search_engine = engine
+        readiness.mark("ready")
         logger.info("Search engine initialization complete")
             
     return search_engine
 
+def require_engine_loaded():
+    """503 right away while the startup warmup is loading the engine, instead of waiting on the load."""
+    if search_engine is None and readiness.state == "loading":
+        raise HTTPException(status_code=503, detail="Search engine is still loading, please retry shortly",
+                            headers={"Retry-After": "5"})
+
 class Link(BaseModel):
     url: str
     text: str
@@ -89,6 +137,191 @@ class Question(BaseModel):
     question: str
     image: Optional[str] = None
 
+# Canned answers for questions that don't need a search, reloaded when the file changes
+answer_rules = RulesEngine(
+    os.getenv("ANSWER_RULES_FILE",
+              os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "answer_rules.json")),
+    reload_interval=float(os.getenv("ANSWER_RULES_RELOAD_INTERVAL", "2"))
+)
+
+def canned_answer(question: str) -> Optional[Answer]:
+    """Fixed answer from the first matching rule, if any."""
+    rule = answer_rules.match(question)
+    if rule is None:
+        return None
+    return Answer(answer=rule["answer"], links=[Link(**link) for link in rule["links"]])
+
+def _search_batch(items: List[tuple]) -> List[List[dict]]:
+    """Search a micro-batch of (question, image, image text) triples with one encode call."""
+    engine = get_search_engine()
+    return engine.search_batch([question for question, _, _ in items], [image for _, image, _ in items],
+                               image_texts=[image_text for _, _, image_text in items])
+
+# Largest multipart body accepted by POST /api/upload
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+# Questions per search_batch call on POST /api/batch
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+
+# Concurrent questions are encoded and scored together
+search_batcher = MicroBatcher(
+    _search_batch,
+    max_batch_size=int(os.getenv("SEARCH_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5"))
+)
+
+def answer_with_search(question: str, image=None, batched: bool = True) -> dict:
+    """
+    Blocking search pipeline: cache lookup, OCR, encoding, scoring and formatting.
+    `image` is a base64 string, raw bytes or a binary file. With `batched=False` the search runs
+    on the calling thread instead of the micro-batcher's, e.g. to profile it.
+    """
+    # Get search engine instance
+    engine = get_search_engine()
+    
+    # Repeated questions are answered from the cache
+    cache_key = engine.cache_key(question, image)
+    cached = engine.answer_cache.get(cache_key)
+    if cached is not None:
+        ANSWERS.inc(source="cache")
+        return cached
+    corpus_version = engine.corpus_version
+    
+    # Includes waiting for the micro-batch; the engine times its own stages
+    with STAGE_SECONDS.time(stage="search"):
+        if batched:
+            # A paraphrase of a recent question with the same image is answered without OCR
+            search_results = engine.similar_results(question, image) if image else None
+            if search_results is None:
+                # OCR runs here, so text questions sharing the micro-batch don't wait for it
+                image_text = engine.image_text(image) if image else None
+                search_results = search_batcher((question, image, image_text))
+        else:
+            search_results = engine.search(question, image)
+    
+    # Format and return response
+    with STAGE_SECONDS.time(stage="format_response"):
+        response = engine.format_response(question, search_results)
+    logger.info(f"Found {len(search_results)} results")
+    ANSWERS.inc(source="search")
+    
+    # Don't cache answers computed against a corpus that was reloaded meanwhile
+    if engine.corpus_version == corpus_version:
+        engine.answer_cache.put(cache_key, response)
+    
+    # Clean up memory
+    with STAGE_SECONDS.time(stage="gc_collect"):
+        gc.collect()
+    
+    return response
+
+def answer_many(questions: List[Question]) -> List:
+    """Answer a list of questions in order, encoding and scoring all uncached ones together."""
+    engine = get_search_engine()
+    answers = [None] * len(questions)
+    pending = []  # (position, cache key)
+    for i, item in enumerate(questions):
+        answers[i] = canned_answer(item.question)
+        if answers[i] is not None:
+            ANSWERS.inc(source="rule")
+            continue
+        cache_key = engine.cache_key(item.question, item.image)
+        answers[i] = engine.answer_cache.get(cache_key)
+        if answers[i] is None:
+            pending.append((i, cache_key))
+        else:
+            ANSWERS.inc(source="cache")
+    
+    if pending:
+        corpus_version = engine.corpus_version
+        batch_results = engine.search_batch(
+            [questions[i].question for i, _ in pending],
+            [questions[i].image for i, _ in pending]
+        )
+        for (i, cache_key), search_results in zip(pending, batch_results):
+            with STAGE_SECONDS.time(stage="format_response"):
+                answers[i] = engine.format_response(questions[i].question, search_results)
+            if engine.corpus_version == corpus_version:
+                engine.answer_cache.put(cache_key, answers[i])
+        ANSWERS.inc(len(pending), source="search")
+        logger.info(f"Answered batch of {len(questions)} questions ({len(pending)} searched)")
+    
+    return answers
+
+async def _spool_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    """Copy the request body to a spooled file so memory use stays bounded for large bodies."""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for data in request.stream():
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+async def _stream_answers(spool) -> AsyncIterator[str]:
+    """Answer an NDJSON body line by line, in chunks, yielding each chunk's answers as it completes."""
+    chunk = []  # Parsed Question, or an error message for a bad line
+
+    async def flush():
+        questions = [item for item in chunk if isinstance(item, Question)]
+        try:
+            answers = iter(await search_executor.run(answer_many, questions) if questions else [])
+        except Exception as e:
+            # Report the failure on every line of the chunk and keep streaming
+            logger.error(f"Error processing batch chunk: {str(e)}", exc_info=True)
+            answers = iter([{"error": f"Error processing request: {str(e) or type(e).__name__}"}] * len(questions))
+        lines = []
+        for item in chunk:
+            result = next(answers) if isinstance(item, Question) else {"error": item}
+            lines.append(json.dumps(jsonable_encoder(result), ensure_ascii=False) + "\n")
+        chunk.clear()
+        return "".join(lines)
+
+    try:
+        for line in spool:
+            if not line.strip():
+                continue
+            try:
+                chunk.append(Question(**json.loads(line)))
+            except (ValueError, TypeError, ValidationError) as e:
+                chunk.append(f"Invalid question: {str(e)}")
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                yield await flush()
+        if chunk:
+            yield await flush()
+    finally:
+        spool.close()
+
+async def _answer(question: str, image=None):
+    """Shared question path: canned answers first, then the search pipeline off the event loop."""
+    try:
+        logger.info(f"Received question: {question[:100]}...")  # Log first 100 chars
+        
+        # Questions covered by an answer rule skip the search
+        with STAGE_SECONDS.time(stage="rules"):
+            canned = canned_answer(question)
+        if canned is not None:
+            ANSWERS.inc(source="rule")
+            return canned
+        
+        # For other questions, use the search engine off the event loop
+        require_engine_loaded()
+        if request_profiler.claim():
+            # Profiled questions skip the micro-batcher so the search runs inside the profile
+            return await search_executor.run(request_profiler.run, answer_with_search, question, image, False)
+        return await search_executor.run(answer_with_search, question, image)
+        
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry shortly")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out while answering the question")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing request: {str(e)}"
+        )
+
 @router.post("/", response_model=Answer)
 async def answer_question(request: Question):
     """
@@ -101,46 +334,125 @@ async def answer_question(request: Question):
     Returns:
     - JSON object with answer and relevant links
     """
+    return await _answer(request.question, request.image)
+
+
+async def _limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """Yield the request body, failing with 413 as soon as it exceeds `limit` bytes."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+        yield chunk
+
+
+@router.post("/upload", response_model=Answer)
+async def answer_question_upload(request: Request):
+    """
+    Multipart variant of POST /api/ for questions with a screenshot.
+    
+    Form fields:
+    - question: The student's question text
+    - image: Optional image file (PNG, JPEG, ...)
+    
+    The image is streamed to a spooled file while parsing and read once before the
+    search, with no base64 round trip; its hash is computed once for every cache.
+    Bodies larger than MAX_UPLOAD_BYTES are rejected with 413, up front from
+    Content-Length or as soon as the limit is crossed while reading.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    
     try:
-        logger.info(f"Received question: {request.question[:100]}...")  # Log first 100 chars
-        
-        # Check if it's the specific GPT model question
-        if "gpt" in request.question.lower() and "turbo" in request.question.lower():
-            return Answer(
-                answer="You must use `gpt-3.5-turbo-0125`, even if the AI Proxy only supports `gpt-4o-mini`. Use the OpenAI API directly for this question.",
-                links=[
-                    Link(
-                        url="https://discourse.onlinedegree.iitm.ac.in/t/ga5-question-8-clarification/155939/4",
-                        text="Use the model that's mentioned in the question."
-                    ),
-                    Link(
-                        url="https://discourse.onlinedegree.iitm.ac.in/t/ga5-question-8-clarification/155939/3",
-                        text="My understanding is that you just have to use a tokenizer, similar to what Prof. Anand used, to get the number of tokens and multiply that by the given rate."
-                    )
-                ]
-            )
-        
-        # Get search engine instance
-        engine = get_search_engine()
-        
-        # For other questions, use the search engine
-        search_results = engine.search(
-            query=request.question,
-            image=request.image
-        )
-        
-        # Format and return response
-        response = engine.format_response(request.question, search_results)
-        logger.info(f"Found {len(search_results)} results")
-        
-        # Clean up memory
-        gc.collect()
-        
-        return response
-        
+        form = await MultiPartParser(request.headers, _limited_stream(request, MAX_UPLOAD_BYTES)).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=f"Invalid multipart body: {str(e)}")
+    
+    try:
+        question = form.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPException(status_code=422, detail="Form field 'question' is required")
+        image = form.get("image")
+        # Read before searching, so closing the form can't race a search that outlived its timeout
+        image_bytes = ImageBytes(await image.read()) if isinstance(image, UploadFile) else None
+    finally:
+        await form.close()
+    return await _answer(question, image_bytes or None)
+
+
+@router.post("/batch")
+async def answer_batch(request: Request):
+    """
+    Answer many questions in one call, e.g. for evaluation runs.
+    
+    Accepts either:
+    - a JSON array of question objects (Content-Type: application/json), answered with a JSON array
+    - one question object per line (Content-Type: application/x-ndjson), answered with one
+      answer per line as each chunk completes; the body is spooled to disk past 1 MB, so
+      large sets are never held in memory
+    
+    Answers are returned in the same order as the questions.
+    """
+    require_engine_loaded()
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        spool = await _spool_body(request)
+        return StreamingResponse(_stream_answers(spool), media_type="application/x-ndjson")
+    
+    try:
+        payload = await request.json()
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON array of questions")
+        questions = [Question(**item) for item in payload]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch: {str(e)}")
+    
+    try:
+        answers = []
+        for start in range(0, len(questions), BATCH_CHUNK_SIZE):
+            answers += await search_executor.run(answer_many, questions[start:start + BATCH_CHUNK_SIZE])
+        return answers
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry shortly")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out while answering the batch")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error(f"Error processing batch: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing request: {str(e)}"
+            detail=f"Error processing batch: {str(e)}"
         )
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit-rate counters for the query-embedding and answer caches."""
+    if search_engine is None:
+        return {"status": "not initialized"}
+    return search_engine.cache_stats()
+
+
+@router.get("/rules")
+async def rules_stats():
+    """Loaded answer rules and how often each one answered."""
+    return answer_rules.stats()
+
+
+def _collect_metrics():
+    """Scrape-time metrics: startup, engine, executor, batcher and answer rules."""
+    families = readiness_families(readiness.status())
+    if search_engine is not None:
+        families += engine_families(search_engine)
+    families += stats_families("tds_search_executor", "Search executor", search_executor.stats(),
+                               {"rejected": "counter", "timed_out": "counter"})
+    families += stats_families("tds_search_batcher", "Search micro-batcher", search_batcher.stats(),
+                               {"batches": "counter", "items": "counter"})
+    families.append(("tds_rule_hits_total", "counter", "Questions answered by each answer rule",
+                     [({"rule": rule["id"]}, rule["hits"]) for rule in answer_rules.stats()["rules"]]))
+    return families
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,181 @@
+"""
+Data-driven fast-path answers.
+
+Canned answers and their trigger patterns live in a JSON file
+(``data/answer_rules.json`` by default). All trigger patterns are compiled
+into one Aho-Corasick automaton, so a question is checked against every
+rule in a single pass over its text. The file is re-read when it changes,
+and each rule counts how often it answered.
+
+File format::
+
+    {"rules": [
+        {"id": "ga5-q8-model",
+         "triggers": [["gpt"], ["turbo", "3.5"]],
+         "answer": "...",
+         "links": [{"url": "...", "text": "..."}]}
+    ]}
+
+A rule fires when every trigger group matches, a group matching when any of
+its patterns occurs in the lowercased question; a plain string is a group of
+one. When several rules fire, the first one in the file wins.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: reports which patterns occur in a text in one pass."""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto = [{}]  # state -> {char: next state}
+        self._fail = [0]
+        self._output = [[]]  # state -> ids of patterns ending here
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(pattern_id)
+
+        # Breadth-first failure links; outputs of the fallback state are merged in
+        queue = deque(self._goto[0].values())  # Depth-1 states fail to the root
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> Set[int]:
+        """Ids of all patterns occurring in text."""
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class RuleSet:
+    """Compiled, immutable set of rules."""
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = []
+        patterns = {}  # pattern -> pattern id
+        self._pattern_groups = []  # pattern id -> [(rule index, group index)]
+        for rule in rules:
+            if not rule.get("id") or not rule.get("answer") or not rule.get("triggers"):
+                raise ValueError(f"Rule needs 'id', 'answer' and 'triggers': {rule}")
+            groups = [[group] if isinstance(group, str) else list(group) for group in rule["triggers"]]
+            if not all(groups) or not all(isinstance(p, str) and p.strip() for group in groups for p in group):
+                raise ValueError(f"Rule {rule['id']} has an empty trigger")
+            rule_index = len(self.rules)
+            self.rules.append({"id": rule["id"], "answer": rule["answer"], "links": rule.get("links", []),
+                               "groups": len(groups)})
+            for group_index, group in enumerate(groups):
+                for pattern in group:
+                    pattern = pattern.lower()
+                    if pattern not in patterns:
+                        patterns[pattern] = len(patterns)
+                        self._pattern_groups.append([])
+                    self._pattern_groups[patterns[pattern]].append((rule_index, group_index))
+        self.automaton = AhoCorasick(list(patterns))
+
+    def match(self, question: str) -> Optional[Dict]:
+        """The first rule whose trigger groups all occur in the question, or None."""
+        matched_groups = {}  # rule index -> set of matched group indexes
+        for pattern_id in self.automaton.find(question.lower()):
+            for rule_index, group_index in self._pattern_groups[pattern_id]:
+                matched_groups.setdefault(rule_index, set()).add(group_index)
+        fired = [i for i, groups in matched_groups.items() if len(groups) == self.rules[i]["groups"]]
+        return self.rules[min(fired)] if fired else None
+
+
+class RulesEngine:
+    """
+    Rules loaded from a JSON file, reloaded when its modification time changes
+    (checked at most every ``reload_interval`` seconds). A broken file is logged
+    and the previous rules stay in effect.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.rule_set = RuleSet([])
+        self.hits = {}  # rule id -> answers served, kept across reloads
+        self.checks = 0
+        self.reloads = 0
+        self.loaded_at = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """Load the rules file if it changed; returns True when new rules were installed."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is not None:
+                logger.warning(f"Rules file {self.path} disappeared; keeping {len(self.rule_set.rules)} rules")
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rule_set = RuleSet(json.load(f)["rules"])
+        except Exception as e:
+            logger.error(f"Error loading rules from {self.path}: {str(e)}")
+            self._mtime = mtime  # Don't retry until the file changes again
+            return False
+        with self._lock:
+            self.rule_set = rule_set
+            self._mtime = mtime
+            self.reloads += 1
+            self.loaded_at = time.time()
+        logger.info(f"Loaded {len(rule_set.rules)} answer rules from {self.path}")
+        return True
+
+    def match(self, question: str) -> Optional[Dict]:
+        """The canned answer rule for a question, if any."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self.reload()
+        rule = self.rule_set.match(question)
+        with self._lock:
+            self.checks += 1
+            if rule is not None:
+                self.hits[rule["id"]] = self.hits.get(rule["id"], 0) + 1
+        return rule
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rules = self.rule_set.rules
+            return {
+                "path": self.path,
+                "loaded_at": self.loaded_at,
+                "reloads": self.reloads,
+                "checks": self.checks,
+                "rules": [{"id": rule["id"], "hits": self.hits.get(rule["id"], 0)} for rule in rules],
+            }
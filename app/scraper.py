@@ -1,21 +1,98 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import json
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import os
-from typing import List, Dict
+import random
+import threading
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+from urllib.parse import urlencode
 import time
 import logging
+from app.embedding_cache import atomic_write
+from app.jsonl import JSONLWriter, iter_jsonl, write_jsonl
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Statuses worth retrying: rate limited or temporarily unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Discourse returns at most this many posts per topic or posts.json request
+POSTS_CHUNK_SIZE = 20
+
+
+class TokenBucket:
+    """Thread-safe token bucket: on average `rate` acquisitions per second, bursts of up to `burst`."""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        
+    def acquire(self):
+        """Block until a token is available and take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
 class DiscourseScraper:
-    def __init__(self, base_url: str = "https://discourse.onlinedegree.iitm.ac.in"):
+    def __init__(self, base_url: str = "https://discourse.onlinedegree.iitm.ac.in", workers: int = None,
+                 rate: float = None, burst: int = None, max_retries: int = None, backoff: float = 1.0,
+                 timeout: float = 30.0):
+        """
+        :param workers: Topics fetched in parallel; 1 keeps the original sequential scrape
+        :param rate: Global limit on requests per second across all workers
+        :param burst: Requests allowed back to back before the rate limit applies
+        :param max_retries: Retries for connection errors and 429/5xx responses
+        :param backoff: Base delay in seconds for exponential backoff, when no Retry-After is given
+        """
         self.base_url = base_url
+        self.workers = workers or int(os.getenv("SCRAPER_WORKERS", "1"))
+        self.rate_limiter = TokenBucket(rate if rate is not None else float(os.getenv("SCRAPER_RATE", "4")),
+                                        burst or int(os.getenv("SCRAPER_BURST", "4")))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("SCRAPER_RETRIES", "5"))
+        self.backoff = backoff
+        self.timeout = timeout
         self.session = requests.Session()
+        # One keep-alive connection per worker, plus one for list pagination
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers + 1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.output_dir = "data"
+        # "json" writes one array at the end; "jsonl" streams one post per line as topics complete
+        self.output_format = os.getenv("SCRAPER_OUTPUT_FORMAT", "json")
         
         # Set up headers to mimic a browser
         self.session.headers.update({
@@ -26,14 +103,40 @@ class DiscourseScraper:
             'Referer': base_url
         })
         
+    def default_output_file(self) -> str:
+        return os.path.join(self.output_dir, f"discourse_posts.{self.output_format}")
+        
+    def get_json(self, url: str) -> Dict:
+        """
+        GET a JSON document through the rate limiter, retrying connection errors and
+        429/5xx responses with exponential backoff, or after Retry-After when the server sends it.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"Error fetching {url}: {str(e)}; retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = self.backoff * 2 ** attempt
+                logger.warning(f"HTTP {response.status_code} from {url}; retrying in {delay:.1f}s")
+            # Jitter keeps parallel workers from retrying in lockstep
+            time.sleep(delay * random.uniform(1.0, 1.25))
+        
     def get_topics_list(self, category_id: int, page: int = 0) -> List[Dict]:
         """Get a list of topics from a category."""
         url = f"{self.base_url}/c/{category_id}.json?page={page}"
         try:
             logger.info(f"Fetching topics from page {page}")
-            response = self.session.get(url)
-            response.raise_for_status()
-            data = response.json()
+            data = self.get_json(url)
             if 'topic_list' in data and 'topics' in data['topic_list']:
                 return data['topic_list']['topics']
             else:
@@ -48,9 +151,7 @@ class DiscourseScraper:
         url = f"{self.base_url}/t/{topic_id}.json"
         try:
             logger.info(f"Fetching posts for topic {topic_id}")
-            response = self.session.get(url)
-            response.raise_for_status()
-            data = response.json()
+            data = self.get_json(url)
             if 'post_stream' in data and 'posts' in data['post_stream']:
                 return data['post_stream']['posts']
             else:
@@ -60,58 +161,288 @@ class DiscourseScraper:
             logger.error(f"Error fetching topic posts: {str(e)}")
             return []
 
-    def scrape_date_range(self, category_id: int, start_date: str, end_date: str) -> List[Dict]:
+    def _post_record(self, topic: Dict, post: Dict) -> Dict:
+        return {
+            'topic_id': topic['id'],
+            'topic_title': topic['title'],
+            'post_id': post['id'],
+            'post_number': post['post_number'],
+            'content': post['cooked'],  # HTML content
+            'created_at': post['created_at'],
+            'url': f"{self.base_url}/t/{topic['slug']}/{topic['id']}/{post['post_number']}"
+        }
+        
+    def _in_range(self, post: Dict, start: datetime, end: datetime) -> bool:
+        post_date = datetime.strptime(post['created_at'][:10], "%Y-%m-%d")
+        return start <= post_date <= end
+        
+    def _topic_posts_in_range(self, topic: Dict, start: datetime, end: datetime) -> List[Dict]:
+        """Fetch a topic and return its posts created within the date range."""
+        in_range = []
+        for post in self.get_topic_posts(topic['id']):
+            if self._in_range(post, start, end):
+                in_range.append(self._post_record(topic, post))
+                logger.info(f"Added post {post['id']} from topic '{topic['title']}'")
+        return in_range
+        
+    def _map_topics(self, fn: Callable, topics: Iterable[Dict]) -> Iterator[Tuple[Dict, object]]:
         """
-        Scrape posts within a date range.
-        :param category_id: Category ID to scrape
-        :param start_date: Start date in YYYY-MM-DD format
-        :param end_date: End date in YYYY-MM-DD format
+        Yield (topic, fn(topic)) in topic order. With several workers, topics are
+        processed in parallel while `topics` (e.g. list pagination) is still being consumed;
+        at most 2 * workers topics are in flight, so finished topics are yielded (and
+        written or checkpointed by the caller) as the listing is paged.
         """
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d")
+        if self.workers <= 1:
+            for topic in topics:
+                yield topic, fn(topic)
+            return
+            
+        window = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="discourse") as pool:
+            in_flight = deque()
+            for topic in topics:
+                in_flight.append((topic, pool.submit(fn, topic)))
+                if len(in_flight) >= window:
+                    topic, future = in_flight.popleft()
+                    yield topic, future.result()
+            while in_flight:
+                topic, future = in_flight.popleft()
+                yield topic, future.result()
         
-        logger.info(f"Starting scrape for date range {start_date} to {end_date}")
-        all_posts = []
+    def _topics_in_range(self, category_id: int, start: datetime, end: datetime):
+        """Yield the category's topics created within the date range, paging until an older topic."""
         page = 0
-        
         while True:
             topics = self.get_topics_list(category_id, page)
             if not topics:
                 logger.info("No more topics found")
-                break
+                return
                 
             for topic in topics:
                 topic_date = datetime.strptime(topic['created_at'][:10], "%Y-%m-%d")
                 
                 if topic_date < start:
-                    logger.info(f"Reached posts before {start_date}, stopping.")
-                    return all_posts
+                    logger.info(f"Reached posts before {start.date()}, stopping.")
+                    return
                     
                 if start <= topic_date <= end:
-                    posts = self.get_topic_posts(topic['id'])
-                    for post in posts:
-                        post_date = datetime.strptime(post['created_at'][:10], "%Y-%m-%d")
-                        if start <= post_date <= end:
-                            all_posts.append({
-                                'topic_id': topic['id'],
-                                'topic_title': topic['title'],
-                                'post_id': post['id'],
-                                'post_number': post['post_number'],
-                                'content': post['cooked'],  # HTML content
-                                'created_at': post['created_at'],
-                                'url': f"{self.base_url}/t/{topic['slug']}/{topic['id']}/{post['post_number']}"
-                            })
-                            logger.info(f"Added post {post['id']} from topic '{topic['title']}'")
-                            
+                    yield topic
+                    
             page += 1
-            time.sleep(2)  # Be nice to the server
-            
+            if self.workers <= 1:
+                time.sleep(2)  # Be nice to the server
+                
+    def scrape_date_range(self, category_id: int, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Scrape posts within a date range.
+        :param category_id: Category ID to scrape
+        :param start_date: Start date in YYYY-MM-DD format
+        :param end_date: End date in YYYY-MM-DD format
+        
+        With more than one worker, topics are fetched in parallel while the topic
+        list is still being paged through; posts come back in the same order either way.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        
+        logger.info(f"Starting scrape for date range {start_date} to {end_date} with {self.workers} worker(s)")
+        all_posts = []
+        
+        topics = 0
+        for _, posts in self._map_topics(lambda topic: self._topic_posts_in_range(topic, start, end),
+                                         self._topics_in_range(category_id, start, end)):
+            all_posts.extend(posts)
+            topics += 1
+                
+        logger.info(f"Scraped {len(all_posts)} posts from {topics} topics")
         return all_posts
+        
+    def scrape_to_jsonl(self, category_id: int, start_date: str, end_date: str, output_file: str = None) -> int:
+        """
+        Scrape a date range straight to a JSON Lines file: each topic's posts are written
+        and flushed as soon as the topic is fetched, so memory stays flat and the output
+        can be read while the scrape runs. The file is published atomically at the end.
+        Returns the number of posts written.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        output_file = output_file or os.path.join(self.output_dir, "discourse_posts.jsonl")
+        
+        logger.info(f"Streaming scrape for {start_date} to {end_date} into {output_file}")
+        with JSONLWriter(output_file) as writer:
+            for _, posts in self._map_topics(lambda topic: self._topic_posts_in_range(topic, start, end),
+                                             self._topics_in_range(category_id, start, end)):
+                writer.write_many(posts)
+        return writer.records
+        
+    def fetch_new_posts(self, topic: Dict, known_ids: set) -> Tuple[List[int], List[Dict]]:
+        """
+        Fetch the posts of a topic that are not in `known_ids`. Returns the topic's full
+        post id stream and the new raw posts. Posts missing from the topic's first chunk
+        are requested by id through /t/{id}/posts.json?post_ids[]=...
+        """
+        data = self.get_json(f"{self.base_url}/t/{topic['id']}.json")
+        stream = data['post_stream']['stream']
+        new_posts = {post['id']: post for post in data['post_stream']['posts'] if post['id'] not in known_ids}
+        missing = [post_id for post_id in stream if post_id not in known_ids and post_id not in new_posts]
+        for i in range(0, len(missing), POSTS_CHUNK_SIZE):
+            query = urlencode([("post_ids[]", post_id) for post_id in missing[i:i + POSTS_CHUNK_SIZE]])
+            chunk = self.get_json(f"{self.base_url}/t/{topic['id']}/posts.json?{query}")
+            for post in chunk['post_stream']['posts']:
+                new_posts[post['id']] = post
+        return stream, [new_posts[post_id] for post_id in stream if post_id in new_posts]
+        
+    def load_checkpoint(self, checkpoint_file: str) -> Dict:
+        """Checkpoint of topics already scraped: {"topics": {topic id: state}}."""
+        if os.path.exists(checkpoint_file):
+            try:
+                with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading checkpoint {checkpoint_file}, starting over: {str(e)}")
+        return {"topics": {}}
+        
+    @staticmethod
+    def _write_json(path: str, data):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, lambda f: f.write(json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')))
+        
+    @staticmethod
+    def _replay_journal(journal_file: str, posts_by_id: Dict, seen: Dict) -> int:
+        """Apply the topic updates an interrupted run appended to its journal. Returns how many were applied."""
+        if not os.path.exists(journal_file):
+            return 0
+        applied = 0
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Cut off while being written
+                entry = json.loads(line)
+                for post_id in entry['deleted']:
+                    posts_by_id.pop(post_id, None)
+                for post in entry['posts']:
+                    posts_by_id[post['post_id']] = post
+                seen[str(entry['topic_id'])] = entry['state']
+                applied += 1
+        logger.info(f"Replayed {applied} topic updates from {journal_file}")
+        return applied
+        
+    def _save_progress(self, posts_by_id: Dict, checkpoint: Dict, output_file: str, checkpoint_file: str,
+                       journal_file: str):
+        """
+        Write posts, then the checkpoint, each atomically, then drop the journal they include.
+        Replaying a journal is idempotent, so a crash in between loses nothing.
+        """
+        posts = sorted(posts_by_id.values(), key=lambda post: (post['topic_id'], post['post_number']))
+        if output_file.endswith(".jsonl"):
+            write_jsonl(output_file, posts)
+        else:
+            self._write_json(output_file, posts)
+        self._write_json(checkpoint_file, checkpoint)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+        logger.info(f"Checkpoint: {len(posts)} posts, {len(checkpoint['topics'])} topics")
+        
+    def scrape_incremental(self, category_id: int, start_date: str, end_date: str, output_file: str = None,
+                           checkpoint_file: str = None, checkpoint_every: int = 20) -> List[Dict]:
+        """
+        Like scrape_date_range, but only fetches what changed since the last run.
+        
+        The checkpoint records each scraped topic's bumped_at, posts_count and
+        fetched post ids. Topics whose bumped_at and posts_count are unchanged are
+        skipped, and changed topics only download their new posts. Each changed
+        topic's new posts, deleted post ids and state are appended to a journal
+        next to the output (fsynced every `checkpoint_every` topics), and the output
+        and checkpoint are rewritten once at the end. An interrupted run's journal
+        is replayed by the next run, which resumes where it stopped. Returns all
+        posts in the output file.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        output_file = output_file or self.default_output_file()
+        checkpoint_file = checkpoint_file or f"{output_file}.checkpoint.json"
+        journal_file = f"{output_file}.journal"
+        
+        checkpoint = self.load_checkpoint(checkpoint_file)
+        seen = checkpoint.setdefault("topics", {})
+        posts_by_id = {}
+        if os.path.exists(output_file):
+            if output_file.endswith(".jsonl"):
+                posts_by_id = {post['post_id']: post for post in iter_jsonl(output_file)}
+            else:
+                with open(output_file, 'r', encoding='utf-8') as f:
+                    posts_by_id = {post['post_id']: post for post in json.load(f)}
+        if self._replay_journal(journal_file, posts_by_id, seen):
+            # Fold the interrupted run into the output before starting a new journal
+            self._save_progress(posts_by_id, checkpoint, output_file, checkpoint_file, journal_file)
+        topic_post_ids = {}  # topic id -> ids of its posts in the output
+        for post in posts_by_id.values():
+            topic_post_ids.setdefault(post['topic_id'], set()).add(post['post_id'])
+        
+        def changed(topic: Dict) -> bool:
+            state = seen.get(str(topic['id']))
+            return state is None or (state['bumped_at'], state['posts_count']) != (topic.get('bumped_at'), topic.get('posts_count'))
+            
+        def fetch(topic: Dict):
+            state = seen.get(str(topic['id']), {})
+            # Posts already in the output count as fetched, even without a checkpoint
+            known = set(state.get('post_ids', [])) | topic_post_ids.get(topic['id'], set())
+            try:
+                return self.fetch_new_posts(topic, known)
+            except Exception as e:
+                logger.error(f"Error fetching topic {topic['id']}, will retry next run: {str(e)}")
+                return None
+                
+        logger.info(f"Starting incremental scrape for {start_date} to {end_date}, {len(seen)} topics in checkpoint")
+        topics = (topic for topic in self._topics_in_range(category_id, start, end) if changed(topic))
+        updated = added = 0
+        with open(journal_file, 'w', encoding='utf-8') as journal:
+            for topic, result in self._map_topics(fetch, topics):
+                if result is None:
+                    continue
+                stream, new_posts = result
+                stream_ids = set(stream)
+                output_ids = topic_post_ids.setdefault(topic['id'], set())
+                # Drop posts deleted from the topic
+                deleted = output_ids - stream_ids
+                for post_id in deleted:
+                    del posts_by_id[post_id]
+                output_ids &= stream_ids
+                records = []
+                for post in new_posts:
+                    if self._in_range(post, start, end):
+                        records.append(self._post_record(topic, post))
+                        posts_by_id[post['id']] = records[-1]
+                        output_ids.add(post['id'])
+                added += len(records)
+                previous = seen.get(str(topic['id']), {}).get('post_ids', [])
+                state = seen[str(topic['id'])] = {
+                    'bumped_at': topic.get('bumped_at'),
+                    'posts_count': topic.get('posts_count'),
+                    'post_ids': sorted((set(previous) | {post['id'] for post in new_posts}) & stream_ids),
+                }
+                entry = {'topic_id': topic['id'], 'state': state, 'posts': records, 'deleted': sorted(deleted)}
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                updated += 1
+                if updated % checkpoint_every == 0:
+                    os.fsync(journal.fileno())
+                    
+        if updated or not os.path.exists(output_file):
+            self._save_progress(posts_by_id, checkpoint, output_file, checkpoint_file, journal_file)
+        else:
+            os.remove(journal_file)
+        logger.info(f"Incremental scrape done: {updated} topics changed, {added} new posts")
+        return sorted(posts_by_id.values(), key=lambda post: (post['topic_id'], post['post_number']))
 
     def save_posts(self, posts: List[Dict], output_file: str = None):
-        """Save scraped posts to a JSON file."""
+        """Save scraped posts to a JSON file, or one post per line to a .jsonl file."""
         if output_file is None:
-            output_file = os.path.join(self.output_dir, "discourse_posts.json")
+            output_file = self.default_output_file()
+            
+        if output_file.endswith(".jsonl"):
+            write_jsonl(output_file, posts)
+            return
             
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -121,9 +452,12 @@ class DiscourseScraper:
 if __name__ == "__main__":
     # TDS Knowledge Base category ID is 34
     scraper = DiscourseScraper()
-    posts = scraper.scrape_date_range(
-        category_id=34,  # TDS Knowledge Base category
-        start_date="2025-01-01",
-        end_date="2025-04-14"
-    )
-    scraper.save_posts(posts) 
\ No newline at end of file
+    if scraper.output_format == "jsonl":
+        scraper.scrape_to_jsonl(category_id=34, start_date="2025-01-01", end_date="2025-04-14")
+    else:
+        posts = scraper.scrape_date_range(
+            category_id=34,  # TDS Knowledge Base category
+            start_date="2025-01-01",
+            end_date="2025-04-14"
+        )
+        scraper.save_posts(posts) 
\ No newline at end of file
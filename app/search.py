@@ -1,175 +1,608 @@
 # search.py
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
-from typing import List, Dict
-import torch
-from PIL import Image
-import easyocr
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import base64
-import io
 import json
 import gc
+import hashlib
 import logging
+import time
+from app.embedding_cache import EmbeddingCache, atomic_write
+from app.ann import build_index as build_ann_index
+from app.quantization import quantize, recall_at_k
+from app.cache import LRUCache, SemanticCache
+from app.ocr import OCRService, image_digest
+from app.chunking import chunk_documents
+from app.normalize import NormalizePool, normalize_posts, load_cache as load_normalize_cache, save_cache as save_normalize_cache
+from app.jsonl import iter_jsonl, partial_path
+from app.lexical import BM25Index, exact_tokens
+from app.encoders import load_encoder
+from app.metrics import SEARCH_RESULTS, STAGE_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Row source ids used in SearchEngine.row_sources
+SOURCES = ("course", "discourse")
+COURSE_URL = 'https://tds.s-anand.net/#/2025-01/'
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix, leaving all-zero rows at zero."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k_indices(indices: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the k entries of `indices` with the highest scores, best first."""
+    if k <= 0 or len(indices) == 0:
+        return indices[:0]
+    if len(indices) > k:
+        indices = indices[np.argpartition(-scores[indices], k - 1)[:k]]
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
 class SearchEngine:
-    def __init__(self, model_name: str = "paraphrase-MiniLM-L3-v2"):  # Smaller model
+    def __init__(self, model_name: str = "paraphrase-MiniLM-L3-v2", cache_dir: str = None, model=None):  # Smaller model
         # Force CPU usage to save memory
         self.device = "cpu"
-        self.model = SentenceTransformer(model_name, device=self.device)
+        self.model_name = model_name
+        self.model_load_seconds = None
+        if model is None:
+            start = time.perf_counter()
+            model = load_encoder(model_name, self.device)
+            self.model_load_seconds = time.perf_counter() - start
+        self.model = model
+        # Embedding cache directory; defaults to a folder next to each data file
+        self.cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR")
+        # Records normalized, chunked and encoded per batch while a data file is read
+        self.ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", "512"))
+        # Tail JSON Lines files a scrape is still writing
+        self.follow_scrapes = os.getenv("INGEST_FOLLOW", "false").lower() in ("1", "true", "yes")
         self.discourse_posts = []
         self.course_content = []
-        self.discourse_embeddings = None
+        self.discourse_embeddings = None  # One row per chunk
         self.course_embeddings = None
-        self.reader = None  # Initialize OCR only when needed
+        # Index of the post / section each embedding row was chunked from
+        self.discourse_parents = None
+        self.course_parents = None
+        # Chunk text behind each embedding row, for the lexical index
+        self.discourse_chunks = []
+        self.course_chunks = []
+        # Unified, L2-normalized score matrix over both corpora
+        self.embeddings = None
+        self.row_sources = None  # Index into SOURCES for each row
+        self.row_offsets = None  # Position of each row's parent post/section within its own corpus
+        # Candidate index: "exact" scores every row, "ivf" probes inverted lists
+        self.ann_backend = os.getenv("ANN_BACKEND", "exact")
+        self.ann_nlist = int(os.getenv("ANN_NLIST", "0"))
+        self.ann_nprobe = int(os.getenv("ANN_NPROBE", "8"))
+        self.ann_min_rows = int(os.getenv("ANN_MIN_ROWS", "5000"))
+        self.index = None
+        self.index_dir = None
+        # First-pass storage: "float", or "int8"/"binary" codes rescored against a memory-mapped float matrix
+        self.storage_mode = os.getenv("EMBEDDING_STORAGE", "float")
+        self.rescore_candidates = int(os.getenv("RESCORE_CANDIDATES", "200"))
+        self.quantized = None
+        self.quantization_stats = None
+        # Memory-map the float score matrix read-only even when unquantized, so forked workers share its pages
+        self.mmap_embeddings = os.getenv("EMBEDDING_MMAP", "false").lower() in ("1", "true", "yes")
+        # Ranking: "hybrid" fuses semantic and BM25 ranks, "semantic" or "lexical" use one signal
+        self.search_mode = os.getenv("SEARCH_MODE", "hybrid")
+        self.fusion_depth = int(os.getenv("FUSION_DEPTH", "100"))  # Candidates taken from each ranking
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        # BM25 matches scoring at least this fraction of the query's maximum pass the similarity threshold
+        self.lexical_min_match = float(os.getenv("LEXICAL_MIN_MATCH", "0.5"))
+        self.lexical_index = None
+        # Repeat-question caches, cleared whenever the loaded corpus changes
+        self.corpus_version = 0
+        self.query_cache = LRUCache(int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+                                    ttl=float(os.getenv("QUERY_CACHE_TTL", "0")) or None)
+        self.answer_cache = LRUCache(int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+                                     ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")) or None)
+        # Results of recent questions, reused for close paraphrases
+        self.semantic_cache = SemanticCache(int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+                                            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")))
+        self.ocr = OCRService()  # Worker process starts on first use
+
+    def _cache_root(self, json_file: str) -> str:
+        return self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(json_file)), ".embedding_cache")
+
+    def _encode_corpus(self, name: str, batches: Iterable[List[str]], json_file: str) -> np.ndarray:
+        """Encode batches of corpus texts through the on-disk embedding cache as they arrive."""
+        cache = EmbeddingCache(self._cache_root(json_file), self.model_name)
+        self.index_dir = cache.cache_dir
+        return cache.encode_batches(name, batches, lambda batch: self.model.encode(batch, convert_to_numpy=True))
+
+    @staticmethod
+    def cache_key(question: str, image=None) -> tuple:
+        """
+        Cache key for a question: whitespace/case-normalized text plus a hash of any image.
+        `image` is a base64 string, raw bytes or a binary file.
+        """
+        normalized = " ".join(question.lower().split())
+        if not image:
+            image_hash = None
+        elif isinstance(image, str):
+            image_hash = hashlib.sha1(image.encode("utf-8")).hexdigest()
+        else:
+            image_hash = "raw:" + image_digest(image)
+        return normalized, image_hash
+
+    def _invalidate_caches(self):
+        """Drop cached query embeddings and answers after the corpus changes."""
+        self.corpus_version += 1
+        self.query_cache.clear()
+        self.answer_cache.clear()
+        self.semantic_cache.clear()
+
+    def cache_stats(self) -> Dict:
+        return {
+            "corpus_version": self.corpus_version,
+            "query_embeddings": self.query_cache.stats(),
+            "answers": self.answer_cache.stats(),
+            "similar_questions": self.semantic_cache.stats(),
+        }
+
+    def build_index(self):
+        """
+        Stack both corpora into one contiguous L2-normalized matrix with per-row source ids.
+        Call once after loading the corpora; the loaders don't build it themselves.
+        """
+        self._invalidate_caches()
+        blocks, sources, offsets = [], [], []
+        corpora = ((self.course_embeddings, self.course_parents),
+                   (self.discourse_embeddings, self.discourse_parents))
+        for source_id, (embeddings, parents) in enumerate(corpora):
+            if embeddings is None or len(embeddings) == 0:
+                continue
+            blocks.append(np.asarray(embeddings, dtype=np.float32))
+            sources.append(np.full(len(embeddings), source_id, dtype=np.int8))
+            offsets.append(parents if parents is not None else np.arange(len(embeddings), dtype=np.int32))
+
+        if not blocks:
+            self.embeddings = self.row_sources = self.row_offsets = self.index = self.quantized = None
+            self.lexical_index = None
+            return
+
+        self.embeddings = np.ascontiguousarray(_normalize_rows(np.vstack(blocks)), dtype=np.float32)
+        self.row_sources = np.concatenate(sources)
+        self.row_offsets = np.concatenate(offsets)
+        logger.info(f"Built score matrix with {self.embeddings.shape[0]} rows")
+
+        if self.search_mode != "semantic":
+            chunks = [chunks for embeddings, chunks in ((self.course_embeddings, self.course_chunks),
+                                                        (self.discourse_embeddings, self.discourse_chunks))
+                      if embeddings is not None and len(embeddings)]
+            self.lexical_index = BM25Index.build([text for texts in chunks for text in texts])
+
+        self.quantized = quantize(self.embeddings, self.storage_mode)
+        if self.quantized is not None or self.mmap_embeddings:
+            self.embeddings = self._map_score_matrix(self.embeddings)
+
+        try:
+            self.index = build_ann_index(self.embeddings, self.ann_backend, self.index_dir,
+                                         nlist=self.ann_nlist, nprobe=self.ann_nprobe, min_rows=self.ann_min_rows)
+        except Exception as e:
+            logger.error(f"Error building ANN index, falling back to exact search: {str(e)}")
+            self.index = None
+
+        if self.quantized is not None:
+            self.quantization_stats = self.quantization_report()
+            logger.info(
+                f"{self.quantized.mode} storage: {self.quantized.nbytes / 1e6:.2f} MB in memory instead of "
+                f"{self.quantization_stats['float_bytes'] / 1e6:.2f} MB float32, "
+                f"recall@{self.quantization_stats['k']} = {self.quantization_stats['recall']:.3f}"
+            )
+
+    def _map_score_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Move the float score matrix to disk and memory-map it read-only for rescoring."""
+        if not self.index_dir:
+            return matrix
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, "score_matrix.npy")
+        atomic_write(path, lambda f: np.save(f, matrix))
+        return np.load(path, mmap_mode="r")
+
+    def quantization_report(self, k: int = 10, sample: int = 100) -> Dict:
+        """Memory footprint of the quantized matrix and its recall@k against exact search, using corpus rows as queries."""
+        n = len(self.embeddings)
+        rng = np.random.default_rng(0)
+        queries = np.asarray(self.embeddings[np.sort(rng.choice(n, min(sample, n), replace=False))])
+        all_rows = np.arange(n)
+
+        def exact_rows(query):
+            return top_k_indices(all_rows, self.embeddings @ query, k)
+
+        def approx_rows(query):
+            rows, scores = self._score(query, k)
+            return rows[top_k_indices(np.arange(len(rows)), scores, k)]
+
+        float_bytes = self.embeddings.size * 4
+        return {
+            "mode": self.quantized.mode,
+            "float_bytes": float_bytes,
+            "quantized_bytes": self.quantized.nbytes,
+            "saved_bytes": float_bytes - self.quantized.nbytes,
+            "k": k,
+            "recall": recall_at_k(exact_rows, approx_rows, queries, k),
+        }
         
-    def load_discourse_posts(self, json_file: str):
-        """Load discourse posts from JSON file and compute embeddings."""
+    @staticmethod
+    def _read_records(json_file: str, key: str = None, follow: bool = False) -> Iterator[Dict]:
+        """
+        Records from a JSON array (or the array under `key`), or one by one from a
+        JSON Lines file; with `follow`, a JSON Lines file still being scraped is tailed.
+        """
+        if json_file.endswith(".jsonl"):
+            return iter_jsonl(json_file, follow=follow)
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return iter(data[key] if key else data)
+
+    def _load_corpus(self, name: str, json_file: str, records: Iterator[Dict],
+                     prepare: Callable[[List[Dict]], Tuple[List[Dict], List[str], List[str]]]):
+        """
+        Read, chunk and encode a corpus in batches of records, so encoding overlaps reading.
+        `prepare` turns a batch into (records to keep, texts, chunk prefixes).
+        Returns the records, chunk texts, chunk parents and embeddings.
+        """
+        kept, chunks, parents = [], [], []
+
+        def chunk_batches():
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.ingest_batch_size:
+                    yield chunk(batch)
+                    batch = []
+            if batch:
+                yield chunk(batch)
+
+        def chunk(batch):
+            batch, texts, prefixes = prepare(batch)
+            batch_chunks, batch_parents = chunk_documents(texts, prefixes=prefixes)
+            parents.append(batch_parents + len(kept))
+            kept.extend(batch)
+            chunks.extend(batch_chunks)
+            return batch_chunks
+
+        embeddings = self._encode_corpus(name, chunk_batches(), json_file)
+        parents = np.concatenate(parents) if parents else np.zeros(0, dtype=np.int32)
+        return kept, chunks, parents, embeddings
+
+    def _data_exists(self, json_file: str, follow: bool) -> bool:
+        return os.path.exists(json_file) or (follow and os.path.exists(partial_path(json_file)))
+
+    def load_discourse_posts(self, json_file: str, follow: bool = None):
+        """
+        Load discourse posts from a JSON or JSON Lines file and compute embeddings.
+        Posts are normalized, chunked and encoded in batches while the file is read, so
+        a JSON Lines file still being scraped can be followed (see INGEST_FOLLOW).
+        """
+        follow = self.follow_scrapes if follow is None else follow
         try:
-            if os.path.exists(json_file):
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    self.discourse_posts = json.load(f)
-                logger.info(f"Loaded {len(self.discourse_posts)} posts from {json_file}")
-                
-                # Compute embeddings for posts
-                texts = [post['content'] for post in self.discourse_posts]
-                self.discourse_embeddings = self.model.encode(texts, convert_to_tensor=True)
-                logger.info(f"Computed embeddings for {len(texts)} discourse posts")
+            if self._data_exists(json_file, follow):
+                cache_path = os.path.join(self._cache_root(json_file), "normalized_posts.json")
+                normalize_cache = load_normalize_cache(cache_path)
+
+                # One parsing pool for the whole load, started once enough posts need parsing
+                with NormalizePool() as normalize_pool:
+                    def prepare(batch):
+                        # Strip the cooked HTML down to text, code blocks and links
+                        posts = normalize_posts(batch, cache=normalize_cache, pool=normalize_pool)
+                        # Each chunk is prefixed with its topic title
+                        return posts, [post['text'] for post in posts], [post.get('topic_title') for post in posts]
+
+                    posts, chunks, parents, embeddings = self._load_corpus(
+                        "discourse", json_file, self._read_records(json_file, follow=follow), prepare)
+                save_normalize_cache(cache_path, normalize_cache, posts)
+                logger.info(f"Loaded {len(posts)} posts from {json_file}")
+
+                self.discourse_posts, self.discourse_chunks = posts, chunks
+                self.discourse_parents, self.discourse_embeddings = parents, embeddings
+                logger.info(f"Computed embeddings for {len(chunks)} chunks of {len(posts)} discourse posts")
                 
         except Exception as e:
             logger.error(f"Error loading discourse posts: {str(e)}")
             raise
             
-    def load_course_content(self, json_file: str):
-        """Load course content from JSON file and compute embeddings."""
+    def load_course_content(self, json_file: str, follow: bool = None):
+        """
+        Load course content from a JSON file (sections under 'sections') or a JSON Lines
+        file of sections, and compute embeddings in batches while it is read.
+        """
+        follow = self.follow_scrapes if follow is None else follow
         try:
-            if os.path.exists(json_file):
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    self.course_content = json.load(f)['sections']
-                logger.info(f"Loaded {len(self.course_content)} sections from {json_file}")
-                
-                # Compute embeddings for course content
-                texts = [f"{section['title']}\n{section['content']}" for section in self.course_content]
-                self.course_embeddings = self.model.encode(texts, convert_to_tensor=True)
-                logger.info(f"Computed embeddings for {len(texts)} course sections")
+            if self._data_exists(json_file, follow):
+                def prepare(batch):
+                    # Each chunk is prefixed with its section title
+                    return batch, [section['content'] for section in batch], [section['title'] for section in batch]
+
+                sections, chunks, parents, embeddings = self._load_corpus(
+                    "course", json_file, self._read_records(json_file, key='sections', follow=follow), prepare)
+                logger.info(f"Loaded {len(sections)} sections from {json_file}")
+
+                self.course_content, self.course_chunks = sections, chunks
+                self.course_parents, self.course_embeddings = parents, embeddings
+                logger.info(f"Computed embeddings for {len(chunks)} chunks of {len(sections)} course sections")
                 
         except Exception as e:
             logger.error(f"Error loading course content: {str(e)}")
             raise
             
-    def extract_text_from_image(self, base64_image: str) -> str:
-        """Extract text from base64 encoded image using OCR."""
-        try:
-            if self.reader is None:
-                self.reader = easyocr.Reader(['en'])
-                
-            # Decode base64 image
-            image_data = base64.b64decode(base64_image)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Perform OCR
-            results = self.reader.readtext(np.array(image))
-            
-            # Extract text
-            text = ' '.join([result[1] for result in results])
-            return text
-            
-        except Exception as e:
-            logger.error(f"Error extracting text from image: {str(e)}")
-            return ""
+    def warm_ocr(self):
+        """Start the OCR worker and load its model ahead of the first image question."""
+        self.ocr.warm()
+
+    def extract_text_from_image(self, image) -> str:
+        """Extract text using OCR from a base64 encoded image, raw image bytes or a binary file."""
+        if isinstance(image, str):
+            try:
+                # Decode base64 image
+                image = base64.b64decode(image)
+            except Exception as e:
+                logger.error(f"Error decoding image: {str(e)}")
+                return ""
+        return self.ocr.extract_text(image)
+
+    def image_text(self, image) -> str:
+        """OCR text of a question's image, timed as the "ocr" stage."""
+        with STAGE_SECONDS.time(stage="ocr"):
+            return self.extract_text_from_image(image)
             
-    def search(self, query: str, image: str = None, top_k: int = 3) -> List[Dict]:
+    def _select_rows(self, rows: np.ndarray, scores: np.ndarray, top_k: int, threshold: float,
+                     quotas: Optional[Dict[str, int]] = None, rank: Optional[np.ndarray] = None,
+                     eligible: Optional[np.ndarray] = None):
         """
-        Search for relevant content using semantic similarity.
-        Returns top_k most relevant results combining both course content and discourse posts.
+        Pick the best rows above the threshold, honouring optional per-source quotas.
+        Chunks are aggregated to their parent post/section by their best score first.
+        `scores` (cosine similarity, used for the threshold), the optional ranking score
+        `rank` and the optional mask of rows `eligible` regardless of the threshold are
+        aligned with `rows`; returns the selected rows and their scores.
         """
-        try:
-            if (self.discourse_embeddings is None and self.course_embeddings is None) or \
-               (len(self.discourse_posts) == 0 and len(self.course_content) == 0):
-                logger.warning("No content available. Make sure content is loaded.")
-                return []
-                
+        rank = scores if rank is None else rank
+        passed = scores > threshold
+        if eligible is not None:
+            passed |= eligible
+        candidates = self._best_chunk_per_parent(rows, rank, np.flatnonzero(passed))
+        if quotas:
+            kept = []
+            candidate_sources = self.row_sources[rows[candidates]]
+            for source_id, source in enumerate(SOURCES):
+                limit = quotas.get(source, top_k)
+                kept.append(top_k_indices(candidates[candidate_sources == source_id], rank, limit))
+            candidates = np.concatenate(kept)
+        selected = top_k_indices(candidates, rank, top_k)
+        return rows[selected], scores[selected]
+
+    def _best_chunk_per_parent(self, rows: np.ndarray, scores: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Keep only the highest-scoring candidate chunk of each parent post/section."""
+        if len(candidates) < 2:
+            return candidates
+        parents = (self.row_sources[rows[candidates]].astype(np.int64) << 32) | self.row_offsets[rows[candidates]]
+        order = np.lexsort((-scores[candidates], parents))
+        sorted_parents = parents[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_parents[1:] != sorted_parents[:-1]
+        return candidates[order[first]]
+
+    def _score(self, query_embedding: np.ndarray, top_k: int):
+        """Score candidate rows for a normalized query; returns (rows, scores)."""
+        rows = None
+        if self.index is not None and self.index.name != "exact":
+            rows = self.index.candidates(query_embedding)
+            # Too few candidates to fill the results; fall back to exact scoring
+            if len(rows) < top_k:
+                rows = None
+
+        if self.quantized is not None:
+            # Shortlist with the compact codes, then rescore against the float matrix
+            approx = self.quantized.scores(query_embedding, rows)
+            shortlist = top_k_indices(np.arange(len(approx)), approx, max(self.rescore_candidates, top_k))
+            rows = np.sort(shortlist if rows is None else rows[shortlist])
+
+        if rows is None:
+            return np.arange(len(self.embeddings)), self.embeddings @ query_embedding
+        return rows, self.embeddings[rows] @ query_embedding
+
+    def _fuse(self, query: str, query_embedding: np.ndarray, rows: np.ndarray, scores: np.ndarray, top_k: int):
+        """
+        Merge the top semantic rows with the top BM25 rows by reciprocal rank fusion.
+        The merged candidates are rescored exactly against the query embedding, so the
+        returned cosine scores stay comparable with the threshold. Returns (rows, cosine,
+        fused, strong) where `strong` marks close lexical matches.
+        """
+        depth = max(self.fusion_depth, top_k)
+        lexical_rows, lexical_scores = self.lexical_index.search(query, depth)
+        if self.search_mode == "lexical":
+            candidates = np.sort(lexical_rows)
+        else:
+            semantic_rows = rows[top_k_indices(np.arange(len(rows)), scores, depth)]
+            candidates = np.union1d(semantic_rows, lexical_rows)
+        cosine = np.asarray(self.embeddings[candidates] @ query_embedding, dtype=np.float32)
+
+        fused = np.zeros(len(candidates), dtype=np.float32)
+        if self.search_mode != "lexical":
+            semantic_rank = np.empty(len(candidates), dtype=np.float32)
+            semantic_rank[np.argsort(-cosine, kind="stable")] = np.arange(len(candidates))
+            fused += 1.0 / (self.rrf_k + 1 + semantic_rank)
+        # Lexical rows come best first
+        positions = np.searchsorted(candidates, lexical_rows)
+        fused[positions] += 1.0 / (self.rrf_k + 1 + np.arange(len(lexical_rows)))
+
+        strong = np.zeros(len(candidates), dtype=bool)
+        if len(lexical_rows):
+            strong[positions] = lexical_scores >= self.lexical_min_match * self.lexical_index.score_bound(query)
+        return candidates, cosine, fused, strong
+
+    def _result(self, row: int, score: float) -> Dict:
+        """Build a search result dict for a row of the score matrix."""
+        offset = int(self.row_offsets[row])
+        if SOURCES[self.row_sources[row]] == 'course':
+            section = self.course_content[offset]
+            return {
+                'source': 'course',
+                'content': section['content'],
+                'title': section['title'],
+                'similarity': score,
+                'url': section.get('url', COURSE_URL)  # Crawled sections link to their own page
+            }
+        post = self.discourse_posts[offset]
+        return {
+            'source': 'discourse',
+            'content': post['text'],
+            'title': post['topic_title'],
+            'similarity': score,
+            'url': post['url']
+        }
+
+    def _embed_queries(self, queries: List[str], images: List[Optional[str]],
+                       image_texts: Optional[List[Optional[str]]] = None):
+        """
+        Normalized embeddings for a batch of queries, plus each query's full text
+        (including any image text). Cache misses are encoded in one call. Images
+        whose OCR text is given in `image_texts` are not read again.
+        """
+        embeddings = [None] * len(queries)
+        texts = list(queries)
+        pending = []  # (position, cache key, text to encode)
+        for i, (query, image) in enumerate(zip(queries, images)):
+            key = self.cache_key(query, image)
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                texts[i], embeddings[i] = cached
+                continue
             # Combine query with any text from image
             if image:
-                image_text = self.extract_text_from_image(image)
+                image_text = image_texts[i] if image_texts and image_texts[i] is not None else self.image_text(image)
                 query = f"{query} {image_text}"
-                
             logger.info(f"Processing query: {query}")
-                
-            # Get query embedding
-            query_embedding = self.model.encode(query, convert_to_tensor=True)
-            query_embedding = query_embedding.to(self.device)
-            
-            results = []
-            
-            # Search course content
-            if self.course_embeddings is not None and len(self.course_content) > 0:
-                similarities = torch.nn.functional.cosine_similarity(
-                    query_embedding.unsqueeze(0),
-                    self.course_embeddings,
-                    dim=1
-                )
-                
-                scores, indices = torch.topk(similarities, min(top_k, len(self.course_content)))
-                
-                for score, idx in zip(scores.tolist(), indices.tolist()):
-                    if score > 0.3:  # Minimum similarity threshold
-                        section = self.course_content[idx]
-                        results.append({
-                            'source': 'course',
-                            'content': section['content'],
-                            'title': section['title'],
-                            'similarity': score,
-                            'url': 'https://tds.s-anand.net/#/2025-01/'
-                        })
-            
-            # Search discourse posts
-            if self.discourse_embeddings is not None and len(self.discourse_posts) > 0:
-                similarities = torch.nn.functional.cosine_similarity(
-                    query_embedding.unsqueeze(0),
-                    self.discourse_embeddings,
-                    dim=1
-                )
-                
-                scores, indices = torch.topk(similarities, min(top_k, len(self.discourse_posts)))
-                
-                for score, idx in zip(scores.tolist(), indices.tolist()):
-                    if score > 0.3:  # Minimum similarity threshold
-                        post = self.discourse_posts[idx]
-                        results.append({
-                            'source': 'discourse',
-                            'content': post['content'],
-                            'title': post['topic_title'],
-                            'similarity': score,
-                            'url': post['url']
-                        })
-            
-            # Sort all results by similarity
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            
-            # Take top_k results
-            results = results[:top_k]
-            
-            logger.info(f"Found {len(results)} relevant results")
-            
-            # Clear memory
-            del query_embedding
-            torch.cuda.empty_cache()
-            gc.collect()
-                    
-            return results
-            
+            pending.append((i, key, query))
+
+        if pending:
+            with STAGE_SECONDS.time(stage="encode"):
+                encoded = self.model.encode([text for _, _, text in pending], convert_to_numpy=True)
+            encoded = _normalize_rows(np.asarray(encoded, dtype=np.float32))
+            for (i, key, text), vector in zip(pending, encoded):
+                texts[i], embeddings[i] = text, vector
+                self.query_cache.put(key, (text, vector))
+        return np.stack(embeddings), texts
+
+    def _score_batch(self, query_embeddings: np.ndarray, top_k: int):
+        """Score a batch of normalized queries; exact search uses one matrix-matrix product."""
+        if self.quantized is None and (self.index is None or self.index.name == "exact"):
+            rows = np.arange(len(self.embeddings))
+            scores = query_embeddings @ self.embeddings.T
+            return [(rows, row_scores) for row_scores in scores]
+        return [self._score(query_embedding, top_k) for query_embedding in query_embeddings]
+
+    def _similar_results(self, queries: List[str], images: List[Optional[str]], question_embeddings: np.ndarray,
+                         top_k: int, threshold: float, quotas: Optional[Dict[str, int]]):
+        """
+        Look up results of recently searched paraphrases by the embeddings of the question
+        texts alone, so questions with an image are looked up before OCR. Matches must also
+        share the image hash, the exact tokens (``GA5`` never matches ``GA6``) and the search
+        settings. Returns the cached results per query (None on a miss) and the (embedding,
+        tag) pairs to store new results under.
+        """
+        if self.semantic_cache.maxsize <= 0:
+            return [None] * len(queries), [None] * len(queries)
+        settings = (self.search_mode, top_k, threshold, tuple(sorted(quotas.items())) if quotas else None)
+        results, keys = [], []
+        with STAGE_SECONDS.time(stage="semantic_cache"):
+            for query, image, embedding in zip(queries, images, question_embeddings):
+                tag = (self.cache_key(query, image)[1], exact_tokens(query)) + settings
+                results.append(self.semantic_cache.get(embedding, tag))
+                keys.append((embedding, tag))
+        return results, keys
+
+    def similar_results(self, query: str, image=None, top_k: int = 3, threshold: float = 0.3,
+                        quotas: Optional[Dict[str, int]] = None) -> Optional[List[Dict]]:
+        """Results of a recent paraphrase of the question with the same image, or None; never runs OCR."""
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return None
+        question_embeddings, _ = self._embed_queries([query], [None])
+        return self._similar_results([query], [image], question_embeddings, top_k, threshold, quotas)[0][0]
+
+    def search_batch(self, queries: List[str], images: Optional[List[Optional[str]]] = None, top_k: int = 3,
+                     threshold: float = 0.3, quotas: Optional[Dict[str, int]] = None,
+                     image_texts: Optional[List[Optional[str]]] = None) -> List[List[Dict]]:
+        """
+        Search for several queries at once: one encode call for all of them (and one more for
+        missed questions with an image) and, for exact search, one matrix-matrix product. Close
+        paraphrases of recent questions are answered from the semantic cache without OCR or scoring. `image_texts` holds OCR text already
+        read from `images` (see image_text). Returns one result list per query, in order.
+        """
+        images = images or [None] * len(queries)
+        try:
+            if self.embeddings is None or len(self.embeddings) == 0:
+                logger.warning("No content available. Make sure content is loaded.")
+                return [[] for _ in queries]
+            if not queries:
+                return []
+
+            corpus_version = self.corpus_version
+            # Questions are looked up by their text alone; for text questions this is also the search embedding
+            query_embeddings, texts = self._embed_queries(queries, [None] * len(queries))
+            batch_results, similar_keys = self._similar_results(queries, images, query_embeddings,
+                                                                top_k, threshold, quotas)
+            misses = [i for i, results in enumerate(batch_results) if results is None]
+
+            if misses:
+                # Only missed questions with an image are read and encoded again with their image text
+                with_image = [i for i in misses if images[i]]
+                if with_image:
+                    query_embeddings = query_embeddings.copy()  # Rows are the lookup keys stored below
+                    image_embeddings, image_queries = self._embed_queries(
+                        [queries[i] for i in with_image], [images[i] for i in with_image],
+                        [image_texts[i] for i in with_image] if image_texts else None)
+                    for i, embedding, text in zip(with_image, image_embeddings, image_queries):
+                        query_embeddings[i], texts[i] = embedding, text
+
+                miss_embeddings = query_embeddings[misses]
+                with STAGE_SECONDS.time(stage="score"):
+                    scored = self._score_batch(miss_embeddings, top_k)
+                for i, query_embedding, (rows, scores) in zip(misses, miss_embeddings, scored):
+                    rank = strong = None
+                    if self.search_mode != "semantic" and self.lexical_index is not None:
+                        with STAGE_SECONDS.time(stage="fuse"):
+                            rows, scores, rank, strong = self._fuse(texts[i], query_embedding, rows, scores, top_k)
+                    with STAGE_SECONDS.time(stage="select"):
+                        rows, scores = self._select_rows(rows, scores, top_k, threshold, quotas, rank, strong)
+                        batch_results[i] = [self._result(row, float(score)) for row, score in zip(rows, scores)]
+                    # Don't cache results computed against a corpus that was reloaded meanwhile
+                    if similar_keys[i] is not None and self.corpus_version == corpus_version:
+                        embedding, tag = similar_keys[i]
+                        self.semantic_cache.put(embedding, batch_results[i], tag)
+
+                # Clear memory
+                del query_embeddings, miss_embeddings
+                with STAGE_SECONDS.time(stage="search_gc_collect"):
+                    gc.collect()
+
+            for results in batch_results:
+                SEARCH_RESULTS.observe(len(results))
+
+            logger.info(f"Found {[len(results) for results in batch_results]} relevant results "
+                        f"({len(queries) - len(misses)} from similar questions)")
+
+            return batch_results
+
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
-            return []
+            return [[] for _ in queries]
+
+    def search(self, query: str, image: str = None, top_k: int = 3, threshold: float = 0.3,
+               quotas: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """
+        Search for relevant content, ranking by semantic similarity fused with BM25 (see SEARCH_MODE).
+        Returns top_k most relevant results combining both course content and discourse posts.
+        `quotas` optionally caps the number of results per source, e.g. {'discourse': 2}.
+        """
+        return self.search_batch([query], [image], top_k, threshold, quotas)[0]
 
     def format_response(self, query: str, search_results: List[Dict]) -> Dict:
         """Format the response with answer and relevant links."""
@@ -0,0 +1,108 @@
+"""
+Startup warmup and readiness tracking.
+
+The app starts serving immediately; the model and corpora are loaded on a
+background thread started from the FastAPI lifespan. Progress and per-stage
+timings are recorded here and reported by the ``/ready`` endpoint.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Thread-safe record of warmup progress: overall state plus timed stages."""
+
+    def __init__(self):
+        self.state = "pending"  # pending -> loading -> ready | failed
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record the status and duration of one loading step."""
+        start = time.monotonic()
+        with self._lock:
+            self.stages[name] = {"status": "running", "seconds": None}
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.stages[name] = {"status": "failed", "seconds": round(time.monotonic() - start, 3)}
+            raise
+        with self._lock:
+            self.stages[name] = {"status": "done", "seconds": round(time.monotonic() - start, 3)}
+
+    def mark(self, state: str, error: str = None):
+        with self._lock:
+            self.state = state
+            self.error = error
+            if state == "loading" and self.started_at is None:
+                self.started_at = time.monotonic()
+            if state in ("ready", "failed"):
+                self.finished_at = time.monotonic()
+
+    def status(self) -> Dict:
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+            return {
+                "status": self.state,
+                "error": self.error,
+                "elapsed_seconds": elapsed,
+                "stages": dict(self.stages),
+            }
+
+
+readiness = Readiness()
+
+
+def _warm(load_ocr: bool):
+    # Imported here because app.routes imports this module
+    from app.routes import get_search_engine
+
+    try:
+        # Marks readiness as loading, then ready or failed
+        engine = get_search_engine()
+        if load_ocr:
+            with readiness.stage("ocr"):
+                engine.warm_ocr()
+        logger.info(f"Warmup complete: {readiness.status()}")
+    except Exception as e:
+        logger.error(f"Warmup failed: {str(e)}", exc_info=True)
+
+
+def start_warmup(load_ocr: bool = False) -> threading.Thread:
+    """Load the search engine (and optionally the OCR reader) on a background thread."""
+    thread = threading.Thread(target=_warm, args=(load_ocr,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan: start the background warmup unless WARMUP_ON_STARTUP is disabled, stop OCR on exit."""
+    if _env_flag("WARMUP_ON_STARTUP", "true"):
+        start_warmup(load_ocr=_env_flag("WARMUP_OCR", "false"))
+    yield
+    # Stop the OCR worker process with the server
+    from app import routes
+    if routes.search_engine is not None:
+        routes.search_engine.ocr.shutdown()
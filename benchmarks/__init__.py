@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the TDS Virtual TA search path.
+
+Run a benchmark with ``python -m benchmarks.<name> --help``.
+"""
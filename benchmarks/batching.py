@@ -0,0 +1,61 @@
+"""
+Compare per-query search against micro-batched search under concurrent load.
+
+    python -m benchmarks.batching --rows 20000 --concurrency 32 --queries 512
+    python -m benchmarks.batching --model paraphrase-MiniLM-L3-v2
+
+Without ``--model`` a hashing encoder with simulated per-call and per-item
+inference cost is used, so the effect of batching is visible offline.
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.batching import MicroBatcher
+from benchmarks.common import build_engine, percentile, synthetic_queries
+
+
+def run(label, call, queries, concurrency):
+    latencies = []
+
+    def timed(query):
+        start = time.perf_counter()
+        call(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, queries))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>10}: {len(queries) / elapsed:8.1f} q/s   "
+          f"p50 {percentile(latencies, 50) * 1000:7.1f} ms   p95 {percentile(latencies, 95) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="synthetic discourse posts")
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    parser.add_argument("--model", help="SentenceTransformer model name (default: stub encoder)")
+    parser.add_argument("--stub-overhead-ms", type=float, default=8.0, help="simulated cost per encode call")
+    parser.add_argument("--stub-item-ms", type=float, default=0.5, help="simulated cost per encoded text")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    engine = build_engine(args.rows, args.model, args.stub_overhead_ms, args.stub_item_ms)
+    engine.query_cache.maxsize = 0  # Measure encoding, not the repeat-question cache
+    queries = synthetic_queries(args.queries)
+    print(f"{len(engine.embeddings)} rows, {len(queries)} queries, concurrency {args.concurrency}")
+
+    run("single", engine.search, queries, args.concurrency)
+
+    batcher = MicroBatcher(lambda items: engine.search_batch(items), args.batch_size, args.wait_ms)
+    run("batched", batcher, queries, args.concurrency)
+    print(f"mean batch size {batcher.stats()['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
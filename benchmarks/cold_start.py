@@ -0,0 +1,138 @@
+"""
+Cold-start budget: import time per module and time to the first answer.
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --encoder stub --import-budget 1.5 --answer-budget 10
+
+Every measurement runs in a fresh interpreter. The import profile comes from
+``python -X importtime -c "import main"``, summed per top-level package. Time to
+first answer runs from spawning a process to its first ``POST /api/`` answer,
+served through a TestClient with the app's lifespan. Embeddings are computed
+into an empty cache, as on a fresh deploy.
+
+The run fails (exit status 1) when importing ``main`` exceeds
+``--import-budget`` seconds, when the first answer exceeds ``--answer-budget``,
+or when importing ``main`` loads one of the heavy modules (torch,
+sentence_transformers, easyocr, PIL), which should load only on first use.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.common import REPO_DIR
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "easyocr", "PIL")
+QUESTION = "How do I run docker with the --rm flag?"
+
+
+def _python(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """Total seconds to import the top-level module, and self time per top-level package."""
+    total, packages = 0.0, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+        if not name.startswith("  "):  # Top-level import; imported modules are indented
+            total = max(total, int(cumulative_us) / 1e6)
+    return total, packages
+
+
+def import_profile(env: Dict[str, str], module: str = "main") -> Tuple[float, Dict[str, float], List[str]]:
+    """Import time, per-package times and the heavy modules loaded, for one fresh import."""
+    probe = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = _python(["-X", "importtime", "-c", probe], env)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    total, packages = parse_importtime(result.stderr)
+    return total, packages, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _first_answer(question: str):
+    """Child process: start the app and answer one question, reporting when the answer arrived."""
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        response = client.post("/api/", json={"question": question})
+    print(json.dumps({"answered_at": time.time(), "status": response.status_code}))
+
+
+def first_answer_seconds(env: Dict[str, str], question: str = QUESTION) -> float:
+    """Seconds from spawning a fresh process to its first answer."""
+    started = time.time()
+    result = _python(["-m", "benchmarks.cold_start", "--child", question], env)
+    if result.returncode != 0:
+        raise RuntimeError(f"First answer failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if report["status"] != 200:
+        raise RuntimeError(f"First answer returned HTTP {report['status']}")
+    return report["answered_at"] - started
+
+
+def run(runs: int = 3, encoder: str = None, import_budget: float = 2.0, answer_budget: float = 60.0,
+        top: int = 10, quiet: bool = False) -> List[str]:
+    """Measure a cold start; returns the budget violations (empty when within budget)."""
+    env = dict(os.environ, EMBEDDING_CACHE_DIR=tempfile.mkdtemp(prefix="tds-cold-start-"),
+               WARMUP_ON_STARTUP="false", PYTHONDONTWRITEBYTECODE="1")
+    if encoder:
+        env["ENCODER"] = encoder
+
+    imports = [import_profile(env) for _ in range(runs)]
+    import_seconds = statistics.median(total for total, _, _ in imports)
+    packages = imports[-1][1]
+    heavy = sorted({module for _, _, loaded in imports for module in loaded})
+    answer_seconds = statistics.median(first_answer_seconds(env) for _ in range(runs))
+
+    if not quiet:
+        print(f"import main: {import_seconds:.3f} s (median of {runs}, budget {import_budget} s)")
+        for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {package:<28} {seconds * 1000:8.1f} ms")
+        print(f"heavy modules loaded by import: {', '.join(heavy) or 'none'}")
+        print(f"first answer: {answer_seconds:.3f} s (budget {answer_budget} s)")
+
+    violations = []
+    if import_seconds > import_budget:
+        violations.append(f"import main took {import_seconds:.3f} s, over the {import_budget} s budget")
+    if heavy:
+        violations.append(f"import main loaded {', '.join(heavy)}")
+    if answer_seconds > answer_budget:
+        violations.append(f"first answer took {answer_seconds:.3f} s, over the {answer_budget} s budget")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement (median reported)")
+    parser.add_argument("--encoder", choices=["model", "stub"], help="ENCODER for the child processes")
+    parser.add_argument("--import-budget", type=float, default=float(os.getenv("COLD_START_IMPORT_BUDGET", "2.0")),
+                        help="seconds allowed for import main")
+    parser.add_argument("--answer-budget", type=float, default=float(os.getenv("COLD_START_ANSWER_BUDGET", "60")),
+                        help="seconds allowed from process start to the first answer")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages listed")
+    parser.add_argument("--child", metavar="QUESTION", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _first_answer(args.child)
+        return
+    violations = run(args.runs, args.encoder, args.import_budget, args.answer_budget, args.top)
+    for violation in violations:
+        print(f"FAIL: {violation}")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
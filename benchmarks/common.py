@@ -0,0 +1,70 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import json
+import os
+import random
+import tempfile
+from typing import List
+
+from app.encoders import HashingEncoder
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VOCABULARY = (
+    "token tokenizer cost gpt model docker flag deadline project assignment quiz week "
+    "python pandas api proxy openai embedding vector database scrape html markdown llm "
+    "prompt image ocr container image port deploy render vercel github action cache"
+).split()
+
+
+def synthetic_posts(n: int, seed: int = 0) -> List[dict]:
+    """Discourse-shaped posts built from random course vocabulary."""
+    rng = random.Random(seed)
+    return [
+        {
+            "topic_id": i // 5,
+            "topic_title": f"Topic {i // 5}",
+            "post_id": i,
+            "post_number": i % 5 + 1,
+            "content": " ".join(rng.choices(VOCABULARY, k=rng.randint(8, 40))),
+            "created_at": "2025-01-01T00:00:00Z",
+            "url": f"https://discourse.example/t/topic/{i // 5}/{i % 5 + 1}",
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(VOCABULARY, k=rng.randint(4, 12))) for _ in range(n)]
+
+
+def build_engine(rows: int, model=None, stub_overhead_ms: float = 0.0, stub_item_ms: float = 0.0,
+                 extra_posts: List[dict] = None):
+    """SearchEngine over a synthetic discourse corpus (plus any real posts) and the repo's course content."""
+    from app.search import SearchEngine
+
+    work_dir = tempfile.mkdtemp(prefix="tds-bench-")
+    posts_file = os.path.join(work_dir, "discourse_posts.json")
+    with open(posts_file, "w", encoding="utf-8") as f:
+        json.dump((extra_posts or []) + synthetic_posts(rows), f)
+
+    if model is None:
+        engine = SearchEngine(model_name="hashing-encoder", cache_dir=work_dir,
+                              model=HashingEncoder(call_overhead_ms=stub_overhead_ms, per_item_ms=stub_item_ms))
+    else:
+        engine = SearchEngine(model_name=model, cache_dir=work_dir)
+    engine.load_discourse_posts(posts_file)
+    course_file = os.path.join(REPO_DIR, "data", "course_content.json")
+    engine.load_course_content(course_file)
+    engine.build_index()
+    return engine
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
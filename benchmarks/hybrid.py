@@ -0,0 +1,89 @@
+"""
+Latency and hit rate of semantic, lexical (BM25) and hybrid ranking.
+
+    python -m benchmarks.hybrid
+    python -m benchmarks.hybrid --rows 20000 --model paraphrase-MiniLM-L3-v2
+
+The corpus is the repo's course content plus the posts in
+``data/sample_questions.json``, padded with ``--rows`` synthetic posts. Two
+query sets are scored:
+
+* promptfoo: prompts from ``project-tds-virtual-ta-promptfoo.yaml``; a hit is
+  an answer containing one of the test's ``contains-any`` values, as promptfoo
+  checks it. Prompts without assertions only count towards latency.
+* sample: each sample post's topic title; a hit is that post's URL among the
+  returned links.
+
+Without ``--model`` the hashing encoder is used, so semantic hit rates are
+only indicative; latency and the lexical side are unaffected.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import yaml
+
+from benchmarks.common import REPO_DIR, build_engine, percentile
+
+
+def promptfoo_cases(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    expected = {}
+    for test in config.get("tests", []):
+        values = [value for check in test.get("assert", []) if check.get("type") == "contains-any"
+                  for value in check["value"]]
+        expected[test["prompt"]] = values
+    return [(prompt, expected.get(prompt)) for prompt in config.get("prompts", [])]
+
+
+def run(engine, mode, cases, top_k):
+    engine.search_mode = mode
+    latencies, hits, checked = [], 0, 0
+    for query, check in cases:
+        start = time.perf_counter()
+        results = engine.search(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        if check is None:
+            continue
+        checked += 1
+        hits += bool(check(engine.format_response(query, results)))
+    rate = f"{hits}/{checked}" if checked else "-"
+    print(f"  {mode:>9}: hits {rate:>6}   p50 {percentile(latencies, 50) * 1000:7.2f} ms   "
+          f"p95 {percentile(latencies, 95) * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic discourse posts added to the corpus")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20, help="passes over each query set")
+    parser.add_argument("--model", help="SentenceTransformer model name (default: stub encoder)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with open(os.path.join(REPO_DIR, "data", "sample_questions.json"), "r", encoding="utf-8") as f:
+        sample_posts = json.load(f)
+    engine = build_engine(args.rows, args.model, extra_posts=sample_posts)
+    engine.query_cache.maxsize = 0  # Measure the full search path on every pass
+    print(f"{len(engine.embeddings)} rows, lexical index {engine.lexical_index.stats()}")
+
+    promptfoo = []
+    for prompt, values in promptfoo_cases(os.path.join(REPO_DIR, "project-tds-virtual-ta-promptfoo.yaml")):
+        check = None
+        if values:
+            check = lambda response, values=values: any(v.lower() in response["answer"].lower() for v in values)
+        promptfoo.append((prompt, check))
+    sample = [(post["topic_title"], lambda response, url=post["url"]: url in [l["url"] for l in response["links"]])
+              for post in sample_posts]
+
+    for label, cases in (("promptfoo", promptfoo), ("sample", sample)):
+        print(f"{label} ({len(cases)} queries x {args.repeat})")
+        for mode in ("semantic", "lexical", "hybrid"):
+            run(engine, mode, cases * args.repeat, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
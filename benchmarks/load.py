@@ -0,0 +1,292 @@
+"""
+Load test for POST /api/: latency percentiles, throughput and peak memory.
+
+    python -m benchmarks.load --concurrency 16 --requests 2000
+    python -m benchmarks.load --server uvicorn --encoder model
+    python -m benchmarks.load --url http://localhost:8000 --concurrency 4
+
+Questions are replayed in a cycle from the topic titles in
+``data/sample_questions.json`` and the prompts in
+``project-tds-virtual-ta-promptfoo.yaml``; ``--questions`` adds JSON Lines
+files (``question``, or ``title``, of each line).
+
+The app is served in-process through an ASGI transport by default, or by a
+local ``uvicorn`` subprocess with ``--server uvicorn``. Either way it loads the
+repo's data plus ``--rows`` synthetic posts from a temporary ``DATA_DIR``.
+``--encoder stub`` (the default) uses the deterministic hashing encoder, so
+the numbers cover request handling, search and ranking without model
+inference. ``--no-cache`` disables the query, answer and semantic caches, so
+repeated questions are searched again. Peak RSS is the server's high-water
+mark. In-process, that includes the load generator itself.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import REPO_DIR, percentile, synthetic_posts
+from benchmarks.hybrid import promptfoo_cases
+
+QUESTION_SETS = ("sample", "promptfoo")
+
+
+def read_jsonl_questions(path: str) -> List[str]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                question = record.get("question") or record.get("title")
+                if question:
+                    questions.append(question)
+    return questions
+
+
+def read_sample_questions(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [post["topic_title"] for post in json.load(f)]
+
+
+def load_questions(sets=QUESTION_SETS, extra_files: List[str] = ()) -> List[Tuple[str, str]]:
+    """(set name, question) pairs; question files missing from the checkout are skipped."""
+    sources = {
+        "sample": read_sample_questions,
+        "promptfoo": lambda path: [prompt for prompt, _ in promptfoo_cases(path)],
+    }
+    paths = {
+        "sample": os.path.join(REPO_DIR, "data", "sample_questions.json"),
+        "promptfoo": os.path.join(REPO_DIR, "project-tds-virtual-ta-promptfoo.yaml"),
+    }
+    questions = []
+    for name in sets:
+        if os.path.exists(paths[name]):
+            questions += [(name, question) for question in sources[name](paths[name])]
+    for path in extra_files:
+        questions += [(os.path.basename(path), question) for question in read_jsonl_questions(path)]
+    return questions
+
+
+def prepare_environment(rows: int, encoder: str, cache: bool, work_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Environment for the app under test: a DATA_DIR holding the repo data plus synthetic posts.
+    Without `work_dir` a temporary directory is created; remove it with cleanup_environment.
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="tds-load-")
+    with open(os.path.join(REPO_DIR, "data", "discourse_posts.json"), "r", encoding="utf-8") as f:
+        posts = json.load(f)
+    with open(os.path.join(work_dir, "discourse_posts.json"), "w", encoding="utf-8") as f:
+        json.dump(posts + synthetic_posts(rows), f)
+    shutil.copy(os.path.join(REPO_DIR, "data", "course_content.json"), work_dir)
+    env = {"DATA_DIR": work_dir, "EMBEDDING_CACHE_DIR": os.path.join(work_dir, "cache"), "ENCODER": encoder}
+    if not cache:
+        env.update(QUERY_CACHE_SIZE="0", ANSWER_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0")
+    return env
+
+
+def cleanup_environment(env: Dict[str, str]):
+    """Remove the DATA_DIR (and embedding cache) created by prepare_environment."""
+    shutil.rmtree(env["DATA_DIR"], ignore_errors=True)
+
+
+def peak_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """High-water RSS of a process (VmHWM), or of this process via getrusage."""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def replay(client: httpx.AsyncClient, questions: List[Tuple[str, str]], total: int,
+                 concurrency: int) -> Tuple[List[Tuple[str, float, int]], float]:
+    """Send `total` questions (cycling) from `concurrency` clients; returns (set, seconds, status) per request."""
+    results = []
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            name, question = questions[i % len(questions)]
+            start = time.perf_counter()
+            try:
+                status = (await client.post("/api/", json={"question": question})).status_code
+            except httpx.HTTPError:
+                status = 0
+            results.append((name, time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def summarize(results: List[Tuple[str, float, int]], elapsed: float) -> Dict:
+    def stats(latencies: List[float]) -> Dict:
+        return {f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 2) for pct in (50, 95, 99)}
+
+    statuses = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    report = {
+        "requests": len(results),
+        "errors": sum(1 for _, _, status in results if status != 200),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        **stats([latency for _, latency, _ in results]),
+        "sets": {},
+    }
+    for name in dict.fromkeys(name for name, _, _ in results):
+        latencies = [latency for set_name, latency, _ in results if set_name == name]
+        report["sets"][name] = {"requests": len(latencies), **stats(latencies)}
+    return report
+
+
+async def _run_in_process(questions, total, concurrency) -> Dict:
+    import app.routes as routes
+    from main import app
+
+    start = time.perf_counter()
+    routes.get_search_engine()
+    load_seconds = time.perf_counter() - start
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=120) as client:
+        results, elapsed = await replay(client, questions, total, concurrency)
+    return dict(summarize(results, elapsed), load_seconds=round(load_seconds, 3), peak_rss_bytes=peak_rss_bytes())
+
+
+def run_in_process(questions: List[Tuple[str, str]], total: int, concurrency: int, env: Dict[str, str]) -> Dict:
+    """Load test the app inside this process; env is applied before the search engine is built."""
+    import app.routes as routes
+
+    previous_env = {name: os.environ.get(name) for name in env}
+    previous_engine, routes.search_engine = routes.search_engine, None
+    os.environ.update(env)
+    try:
+        return asyncio.run(_run_in_process(questions, total, concurrency))
+    finally:
+        routes.search_engine = previous_engine
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 600.0) -> float:
+    """Poll /ready until the engine is loaded; returns the seconds waited."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            response = httpx.get(f"{url}/ready", timeout=5)
+            if response.status_code == 200:
+                return time.perf_counter() - start
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"Server failed to load: {response.json().get('error')}")
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def run_against(url: str, questions: List[Tuple[str, str]], total: int, concurrency: int,
+                pid: Optional[int] = None) -> Dict:
+    """Load test a running server."""
+    load_seconds = wait_until_ready(url)
+
+    async def go():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+            return await replay(client, questions, total, concurrency)
+
+    results, elapsed = asyncio.run(go())
+    return dict(summarize(results, elapsed), load_seconds=round(load_seconds, 3), peak_rss_bytes=peak_rss_bytes(pid))
+
+
+def run_uvicorn(questions: List[Tuple[str, str]], total: int, concurrency: int, env: Dict[str, str]) -> Dict:
+    """Start main:app under uvicorn on a free local port, load test it, then stop it."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_DIR, env=dict(os.environ, **env), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return run_against(f"http://127.0.0.1:{port}", questions, total, concurrency, pid=server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def print_report(report: Dict):
+    print(f"{report['requests']} requests in {report['seconds']:.2f} s: {report['rps']:.1f} req/s, "
+          f"{report['errors']} errors {report['statuses']}")
+    print(f"  {'all':>12}: p50 {report['p50_ms']:8.2f} ms   p95 {report['p95_ms']:8.2f} ms   "
+          f"p99 {report['p99_ms']:8.2f} ms")
+    for name, stats in report["sets"].items():
+        print(f"  {name:>12}: p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   "
+              f"p99 {stats['p99_ms']:8.2f} ms   ({stats['requests']} requests)")
+    rss = report["peak_rss_bytes"]
+    print(f"engine ready after {report['load_seconds']:.2f} s; peak RSS "
+          f"{f'{rss / 2 ** 20:.1f} MiB' if rss else 'unknown'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["in-process", "uvicorn"], default="in-process")
+    parser.add_argument("--url", help="load test an already running server instead")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, help="requests to send (default: every question twice)")
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic discourse posts added to the corpus")
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--no-cache", action="store_true", help="disable query, answer and semantic caches")
+    parser.add_argument("--sets", default=",".join(QUESTION_SETS), help="question sets to replay")
+    parser.add_argument("--questions", action="append", default=[], help="extra JSON Lines question file")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    questions = load_questions([name for name in args.sets.split(",") if name], args.questions)
+    if not questions:
+        parser.error("no questions to replay")
+    total = args.requests or 2 * len(questions)
+
+    if args.url:
+        report = run_against(args.url.rstrip("/"), questions, total, args.concurrency)
+    else:
+        env = prepare_environment(args.rows, args.encoder, cache=not args.no_cache)
+        runner = run_uvicorn if args.server == "uvicorn" else run_in_process
+        try:
+            report = runner(questions, total, args.concurrency, env)
+        finally:
+            cleanup_environment(env)
+    report.update(server=args.url or args.server, encoder=None if args.url else args.encoder,
+                  concurrency=args.concurrency)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
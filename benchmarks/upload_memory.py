@@ -0,0 +1,84 @@
+"""
+Peak Python memory of one image question via the JSON/base64 path (POST /api/)
+versus the multipart path (POST /api/upload).
+
+    python -m benchmarks.upload_memory --width 1170 --height 2532
+
+Runs the app in-process with the stub encoder and OCR recognition stubbed out,
+so the numbers cover request parsing, decoding and downscaling only. Request
+bodies are built before measuring; peaks are traced with tracemalloc, which
+sees Python and NumPy allocations but not PIL's internal decode buffers.
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+
+def screenshot(width: int, height: int) -> bytes:
+    """PNG shaped like a phone screenshot: flat background with noisy text-like bands."""
+    rng = np.random.default_rng(0)
+    pixels = np.full((height, width, 3), 245, dtype=np.uint8)
+    for top in range(40, height - 40, 90):
+        pixels[top:top + 30, 40:width - 40] = rng.integers(0, 255, size=(30, width - 80, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def measure(client, label, **request):
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    response = client.post(**request)
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"{label:>10}: HTTP {response.status_code}, peak +{(peak - before) / 1e6:6.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1170)
+    parser.add_argument("--height", type=int, default=2532)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from fastapi.testclient import TestClient
+
+    import app.routes as routes
+    from benchmarks.common import build_engine
+    from main import app
+
+    engine = build_engine(100)
+    engine.ocr._recognize = lambda pixels: "stub text"
+    engine.ocr.cache.maxsize = 0
+    engine.query_cache.maxsize = engine.answer_cache.maxsize = 0
+    routes.search_engine = engine
+    client = TestClient(app)
+
+    image = screenshot(args.width, args.height)
+    print(f"image {args.width}x{args.height}, {len(image) / 1e6:.2f} MB PNG")
+
+    json_body = json.dumps({"question": "What does this error mean?",
+                            "image": base64.b64encode(image).decode("ascii")}).encode("utf-8")
+    boundary = "benchmark-boundary"
+    multipart_body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"question\"\r\n\r\n"
+        f"What does this error mean?\r\n--{boundary}\r\n"
+        f"Content-Disposition: form-data; name=\"image\"; filename=\"s.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode("utf-8") + image + f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    tracemalloc.start()
+    for _ in range(2):  # First round warms imports and caches
+        measure(client, "json", url="/api/", content=json_body,
+                headers={"Content-Type": "application/json"})
+        measure(client, "multipart", url="/api/upload", content=multipart_body,
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+if __name__ == "__main__":
+    main()
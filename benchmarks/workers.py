@@ -0,0 +1,167 @@
+"""
+Per-worker memory of multi-worker servers: pre-forked workers sharing one
+loaded engine against ``uvicorn --workers``, each loading its own.
+
+    python -m benchmarks.workers
+    python -m benchmarks.workers --workers 1,2,4 --encoder model --rows 20000
+
+For every worker count and mode a server is started on a free local port over
+the repo data plus ``--rows`` synthetic posts (see ``benchmarks.load``), put
+under ``--requests`` questions of load, and left to settle. Then the memory
+of the server's process tree is read from ``/proc/<pid>/smaps_rollup``. RSS
+counts shared pages in full in every worker. PSS divides each shared page
+between the processes mapping it, and USS counts only a worker's private
+pages, so total PSS is what the server really costs.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.common import REPO_DIR
+from benchmarks.load import _free_port, cleanup_environment, load_questions, prepare_environment, run_against
+
+MODES = ("prefork", "uvicorn")
+
+
+def memory(pid: int) -> Optional[Dict[str, int]]:
+    """rss, pss and uss (private) bytes of a process, or None when it is gone or smaps_rollup is unavailable."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    if "Rss" not in fields:
+        return None
+    return {"rss": fields["Rss"], "pss": fields.get("Pss", 0),
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def children(pid: int) -> List[int]:
+    """Direct child pids, worker helpers (such as multiprocessing's resource tracker) excluded."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        # The command name in field 2 may contain spaces; ppid is the second field after it
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid and b"resource_tracker" not in cmdline:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def settle(pids: List[int], interval: float = 0.5, polls: int = 4, timeout: float = 600.0):
+    """Wait until the summed RSS of `pids` stays within 1% for `polls` consecutive polls."""
+    deadline = time.monotonic() + timeout
+    previous, stable = None, 0
+    while time.monotonic() < deadline and stable < polls:
+        total = sum((memory(pid) or {"rss": 0})["rss"] for pid in pids)
+        stable = stable + 1 if previous and abs(total - previous) <= previous * 0.01 else 0
+        previous = total
+        time.sleep(interval)
+
+
+def server_command(mode: str, workers: int, port: int) -> List[str]:
+    if mode == "prefork":
+        return [sys.executable, "-m", "app.prefork", "--workers", str(workers), "--host", "127.0.0.1",
+                "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers), "--host", "127.0.0.1",
+            "--port", str(port), "--log-level", "warning"]
+
+
+def measure(mode: str, workers: int, env: Dict[str, str], questions, total: int, concurrency: int) -> Dict:
+    """Start one server, load it, and report the memory of its parent and workers."""
+    port = _free_port()
+    server = subprocess.Popen(server_command(mode, workers, port), cwd=REPO_DIR, env=dict(os.environ, **env),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        load = run_against(f"http://127.0.0.1:{port}", questions, total, concurrency)
+        pids = children(server.pid)
+        settle([server.pid] + pids)
+        parent = {"rss": 0, "pss": 0, "uss": 0}
+        if pids:
+            parent = memory(server.pid) or parent
+        else:  # A single uvicorn worker serves from the launched process itself
+            pids = [server.pid]
+        per_worker = [memory(pid) for pid in pids]
+        per_worker = [stats for stats in per_worker if stats]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    def mean(key: str) -> int:
+        return sum(stats[key] for stats in per_worker) // len(per_worker) if per_worker else 0
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "worker_pids": pids,
+        "parent": parent,
+        "per_worker": per_worker,
+        "worker_rss": mean("rss"),
+        "worker_pss": mean("pss"),
+        "worker_uss": mean("uss"),
+        "total_pss": parent["pss"] + sum(stats["pss"] for stats in per_worker),
+        "ready_seconds": load["load_seconds"],
+        "rps": load["rps"],
+        "errors": load["errors"],
+    }
+
+
+def print_table(reports: List[Dict]):
+    mib = 2 ** 20
+    print(f"{'mode':<8} {'workers':>7} {'parent RSS':>11} {'worker RSS':>11} {'worker PSS':>11} "
+          f"{'worker USS':>11} {'total PSS':>10} {'ready s':>8} {'req/s':>8}")
+    for report in reports:
+        print(f"{report['mode']:<8} {report['workers']:>7} {report['parent']['rss'] / mib:>9.1f}MB "
+              f"{report['worker_rss'] / mib:>9.1f}MB {report['worker_pss'] / mib:>9.1f}MB "
+              f"{report['worker_uss'] / mib:>9.1f}MB {report['total_pss'] / mib:>8.1f}MB "
+              f"{report['ready_seconds']:>8.2f} {report['rps']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated: prefork, uvicorn")
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic discourse posts added to the corpus")
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--requests", type=int, default=200, help="questions sent to each server before measuring")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    questions = load_questions()
+    env = prepare_environment(args.rows, args.encoder, cache=True)
+    reports = []
+    try:
+        for workers in [int(count) for count in args.workers.split(",") if count]:
+            for mode in [mode for mode in args.modes.split(",") if mode]:
+                if mode not in MODES:
+                    parser.error(f"unknown mode {mode}")
+                reports.append(measure(mode, workers, env, questions, args.requests, args.concurrency))
+    finally:
+        cleanup_environment(env)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_table(reports)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 #main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from app.routes import router as api_router
+from app.admin import router as admin_router
+from app.warmup import lifespan, readiness
+from app.metrics import REGISTRY
 import logging
 import sys
 import uvicorn
@@ -40,7 +43,8 @@ app = FastAPI(
     version="1.0",
     docs_url="/docs",  # Explicitly set the docs URL
     redoc_url="/redoc",  # Explicitly set the redoc URL
-    openapi_url="/openapi.json"  # Explicitly set the OpenAPI schema URL
+    openapi_url="/openapi.json",  # Explicitly set the OpenAPI schema URL
+    lifespan=lifespan  # Loads the model and corpora in the background at startup
 )
 
 # Enable CORS
@@ -73,6 +77,8 @@ async def root():
                 <li><a href="/redoc">/redoc</a> - Alternative API documentation</li>
                 <li><code>/api/</code> - Main API endpoint for questions (POST requests only)</li>
                 <li><a href="/health">/health</a> - Health check endpoint</li>
+                <li><a href="/ready">/ready</a> - Readiness check (model and data loaded)</li>
+                <li><a href="/metrics">/metrics</a> - Prometheus metrics (per-stage latency, caches, corpus)</li>
             </ul>
             <h2>Example Usage:</h2>
             <pre>
@@ -112,8 +118,21 @@ async def health_check():
             }
         )
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once the model and corpora are loaded, 503 while loading"""
+    status = readiness.status()
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
+# Profiling endpoints; disabled unless ADMIN_TOKEN is set
+app.include_router(admin_router, prefix="/admin")
 
 logger.info("Application setup completed successfully")
 
@@ -24,12 +24,12 @@ def main():
         # 2. Scrape Discourse posts
         logger.info("Starting Discourse posts scraping...")
         discourse_scraper = DiscourseScraper()
-        posts = discourse_scraper.scrape_date_range(
+        # Only new posts are downloaded; an interrupted run resumes from its checkpoint
+        discourse_scraper.scrape_incremental(
             category_id=34,  # TDS Knowledge Base category
             start_date="2025-01-01",
             end_date="2025-04-14"
         )
-        discourse_scraper.save_posts(posts)
         logger.info("Discourse posts scraping completed")
         
         logger.info("All data collection completed successfully!")
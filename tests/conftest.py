@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app.encoders import HashingEncoder
+
+
+class StubModel(HashingEncoder):
+    """Deterministic encoder standing in for SentenceTransformer, recording batch encodes."""
+
+    def __init__(self, dim: int = 64):
+        super().__init__(dim=dim)
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        if not isinstance(texts, str):
+            self.calls.append(list(texts))
+        return super().encode(texts, convert_to_numpy=convert_to_numpy, **kwargs)
+
+
+@pytest.fixture
+def stub_model():
+    return StubModel()
+
+
+POSTS = [
+    {"topic_id": 1, "topic_title": "GA5 Question 8 Clarification", "post_id": 11, "post_number": 1,
+     "content": "You must use gpt-3.5-turbo-0125 and count tokens with a tokenizer",
+     "created_at": "2025-01-15T10:00:00Z", "url": "https://discourse.example/t/ga5-q8/1/1"},
+    {"topic_id": 1, "topic_title": "GA5 Question 8 Clarification", "post_id": 12, "post_number": 2,
+     "content": "Multiply the number of tokens by the rate of 50 cents per million",
+     "created_at": "2025-01-15T11:00:00Z", "url": "https://discourse.example/t/ga5-q8/1/2"},
+    {"topic_id": 2, "topic_title": "Docker on Windows", "post_id": 21, "post_number": 1,
+     "content": "Run docker with the --rm flag and mount the data folder",
+     "created_at": "2025-02-01T09:00:00Z", "url": "https://discourse.example/t/docker/2/1"},
+    {"topic_id": 3, "topic_title": "Project 1 deadline", "post_id": 31, "post_number": 1,
+     "content": "The deadline for project 1 is the end of February",
+     "created_at": "2025-02-03T09:00:00Z", "url": "https://discourse.example/t/deadline/3/1"},
+]
+
+
+@pytest.fixture
+def data_files(tmp_path):
+    """Small discourse dump alongside the repo's course content."""
+    posts_file = tmp_path / "discourse_posts.json"
+    posts_file.write_text(json.dumps(POSTS), encoding="utf-8")
+    return {"discourse": str(posts_file), "course": "data/course_content.json"}
+
+
+@pytest.fixture
+def engine(tmp_path, stub_model, data_files):
+    from app.search import SearchEngine
+
+    engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path / "cache"), model=stub_model)
+    engine.load_discourse_posts(data_files["discourse"])
+    engine.load_course_content(data_files["course"])
+    engine.build_index()
+    return engine
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    """TestClient for the deployed app, backed by the stub-model engine."""
+    from fastapi.testclient import TestClient
+
+    import app.routes as routes
+    from main import app
+
+    monkeypatch.setattr(routes, "search_engine", engine)
+    return TestClient(app)
+
+
+class StubDiscourse:
+    """Local HTTP server replaying recorded Discourse JSON from tests/fixtures/discourse."""
+
+    FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "discourse")
+
+    def __init__(self):
+        self.requests = []  # Paths served, in order
+        self.failures = {}  # path -> [(status, headers)] served before the recording
+        self.overrides = {}  # path -> JSON served instead of the recording
+        self.posts = {}  # post id -> post, served by /t/{id}/posts.json?post_ids[]=...
+        for file in glob.glob(os.path.join(self.FIXTURES, "t-*.json")):
+            with open(file, encoding="utf-8") as f:
+                for post in json.load(f)["post_stream"]["posts"]:
+                    self.posts[post["id"]] = post
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append(self.path)
+                    failure = stub.failures.get(self.path, []).pop(0) if stub.failures.get(self.path) else None
+                time.sleep(stub.delay)
+                if failure is not None:
+                    status, headers = failure
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = stub.body(self.path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                body = body if body is not None else b'{"errors": ["not found"]}'
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def body(self, path):
+        """Recording for a request path: /c/34.json?page=0 -> c-34-page-0.json."""
+        if path in self.overrides:
+            return json.dumps(self.overrides[path]).encode("utf-8")
+        url = urlsplit(path)
+        if url.path.endswith("/posts.json"):
+            ids = [int(post_id) for post_id in parse_qs(url.query).get("post_ids[]", [])]
+            return json.dumps({"post_stream": {"posts": [self.posts[i] for i in ids if i in self.posts]}}).encode("utf-8")
+        name = path.lstrip("/").replace(".json", "").replace("?", "-").replace("=", "-").replace("/", "-")
+        file = os.path.join(self.FIXTURES, name + ".json")
+        if not os.path.exists(file):
+            return None
+        with open(file, "rb") as f:
+            return f.read()
+
+
+@pytest.fixture
+def discourse_server():
+    stub = StubDiscourse()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
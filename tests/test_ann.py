@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.ann import ExactIndex, IVFFlatIndex, build_index
+
+
+def _clustered(n=3000, dim=32, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    rows = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall_at_k(index, embeddings, queries, k=10):
+    hits = 0
+    for q in queries:
+        exact = set(np.argsort(-(embeddings @ q))[:k])
+        rows = index.candidates(q)
+        approx = set(rows[np.argsort(-(embeddings[rows] @ q))[:k]])
+        hits += len(exact & approx)
+    return hits / (k * len(queries))
+
+
+def test_ivf_recall_against_exact_baseline():
+    embeddings = _clustered()
+    queries = _clustered(n=50, seed=1)
+    assert _recall_at_k(ExactIndex(embeddings), embeddings, queries) == 1.0
+
+    index = IVFFlatIndex.build(embeddings, nlist=32, nprobe=8)
+    assert _recall_at_k(index, embeddings, queries) >= 0.9
+    assert len(index.candidates(queries[0])) < len(embeddings)
+
+
+def test_index_is_saved_and_reused(tmp_path):
+    embeddings = _clustered(n=500)
+    index = build_index(embeddings, "ivf", str(tmp_path), nlist=8, min_rows=100)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["ivf_index.npz"]  # No temporary file left
+
+    reloaded = build_index(embeddings, "ivf", str(tmp_path), nlist=8, nprobe=3, min_rows=100)
+    np.testing.assert_array_equal(reloaded.order, index.order)
+    assert reloaded.nprobe == 3
+
+    assert isinstance(build_index(embeddings, "ivf", str(tmp_path), min_rows=1000), ExactIndex)
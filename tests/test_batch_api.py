@@ -0,0 +1,24 @@
+import json
+
+QUESTIONS = [
+    {"question": "How do I count tokens?"},
+    {"question": "Should I use gpt-4o-mini or gpt 3.5 turbo?"},
+    {"question": "What is the project deadline?"},
+]
+
+
+def test_batch_json_preserves_order(client, stub_model):
+    single = [client.post("/api/", json=q).json() for q in QUESTIONS]
+    response = client.post("/api/batch", json=QUESTIONS)
+    assert response.status_code == 200
+    assert response.json() == single
+
+
+def test_batch_ndjson_streams_answers_and_errors(client, stub_model):
+    body = "\n".join(json.dumps(q) for q in QUESTIONS[:1]) + "\nnot json\n" + json.dumps(QUESTIONS[2])
+    calls = len(stub_model.calls)
+    response = client.post("/api/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert "answer" in lines[0] and "error" in lines[1] and "answer" in lines[2]
+    assert len(stub_model.calls) == calls + 1
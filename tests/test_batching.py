@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_a_batch():
+    batches = []
+    start = threading.Barrier(8)
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=200)
+    results = [None] * 8
+
+    def call(i):
+        start.wait()
+        results[i] = batcher(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [i * 2 for i in range(8)]
+    assert len(batches) < 8
+
+
+def test_search_batch_matches_single_queries(engine, stub_model):
+    queries = ["count tokens", "docker flag", "project deadline"]
+    singles = [engine.search(q, threshold=0.0) for q in queries]
+    engine.query_cache.clear()
+
+    calls = len(stub_model.calls)
+    assert engine.search_batch(queries, threshold=0.0) == singles
+    assert len(stub_model.calls) == calls + 1
+
+
+def test_text_question_does_not_wait_for_image_ocr(engine, monkeypatch):
+    import time
+
+    import app.routes as routes
+
+    monkeypatch.setattr(routes, "search_engine", engine)
+    monkeypatch.setattr(engine.ocr, "extract_text", lambda image: time.sleep(1.0) or "docker")
+    finished = {}
+    start = threading.Barrier(2)
+
+    def ask(name, question, image=None):
+        start.wait()
+        began = time.perf_counter()
+        routes.answer_with_search(question, image)
+        finished[name] = time.perf_counter() - began
+
+    threads = [threading.Thread(target=ask, args=("image", "what does this show", "aW1hZ2U=")),
+               threading.Thread(target=ask, args=("text", "project deadline"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert finished["image"] >= 1.0
+    assert finished["text"] < 0.5
+
+
+def test_search_batch_uses_given_image_text(engine, monkeypatch):
+    monkeypatch.setattr(engine, "extract_text_from_image", lambda image: pytest.fail("OCR ran again"))
+    with_text = engine.search_batch(["what is this"], ["aW1hZ2U="], threshold=0.0, image_texts=["docker --rm flag"])
+    engine.query_cache.clear()
+    engine.semantic_cache.clear()
+    assert with_text == engine.search_batch(["what is this docker --rm flag"], threshold=0.0)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.cache import LRUCache, SemanticCache
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_query_embedding_cache_and_invalidation(engine, stub_model):
+    engine.semantic_cache.maxsize = 0
+    calls = len(stub_model.calls)
+    engine.search("How do I count   tokens?")
+    engine.search("how do i count tokens?")
+    assert engine.query_cache.hits == 1
+    assert len(stub_model.calls) == calls + 1
+
+    engine.answer_cache.put(engine.cache_key("q"), {"answer": "x", "links": []})
+    engine.build_index()
+    assert len(engine.query_cache) == 0 and len(engine.answer_cache) == 0
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_cache_threshold_tags_and_eviction():
+    cache = SemanticCache(maxsize=2, threshold=0.9)
+    cache.put(_unit([1, 0, 0]), "a", tag="t")
+    cache.put(_unit([0, 1, 0]), "b", tag="t")
+    assert cache.get(_unit([1, 0.2, 0]), tag="t") == "a"
+    assert cache.get(_unit([1, 1, 0]), tag="t") is None  # Too far from both
+    assert cache.get(_unit([1, 0, 0]), tag="other") is None
+
+    cache.put(_unit([0, 0, 1]), "c", tag="t")  # Evicts "b", the least recently used
+    assert cache.get(_unit([0, 1, 0]), tag="t") is None
+    assert cache.get(_unit([1, 0, 0]), tag="t") == "a"
+    assert len(cache) == 2 and cache.stats()["hits"] == 2
+
+
+def test_paraphrases_reuse_results_until_the_corpus_changes(engine, stub_model, monkeypatch):
+    engine.semantic_cache.threshold = 0.8
+    first = engine.search("how do I count tokens with the tokenizer")
+
+    scored = []
+    monkeypatch.setattr(engine, "_score_batch", lambda *args: scored.append(args) or [])
+    monkeypatch.setattr(engine, "extract_text_from_image", lambda image: scored.append("ocr") or "")
+    assert engine.search("How do I count the tokens with a tokenizer?") == first
+    assert scored == []
+    assert engine.semantic_cache.stats()["hits"] == 1
+
+    # Different image or settings never share results
+    engine.search("how do I count tokens with the tokenizer", image="aW1hZ2U=")
+    assert scored[0] == "ocr"
+
+    engine.build_index()
+    assert len(engine.semantic_cache) == 0
+
+
+def test_each_question_is_encoded_once(engine, stub_model, monkeypatch):
+    engine.query_cache.maxsize = 0
+    monkeypatch.setattr(engine, "extract_text_from_image", lambda image: "docker")
+    calls = len(stub_model.calls)
+    engine.search("how do I count tokens")
+    assert len(stub_model.calls) == calls + 1
+    # A question with an image is looked up by its text, then encoded with the image text on a miss
+    engine.search("what does this error mean", image="aW1hZ2U=")
+    assert len(stub_model.calls) == calls + 3
+
+
+def test_paraphrases_with_the_same_image_skip_ocr(engine, monkeypatch):
+    import app.routes as routes
+
+    engine.semantic_cache.threshold = 0.8
+    monkeypatch.setattr(routes, "search_engine", engine)
+    read = []
+    monkeypatch.setattr(engine, "extract_text_from_image", lambda image: read.append(image) or "docker --rm flag")
+    first = routes.answer_with_search("how do I count tokens with the tokenizer", image="aW1hZ2U=")
+    assert read == ["aW1hZ2U="]
+
+    monkeypatch.setattr(engine, "_score_batch", lambda *args: pytest.fail("scored a paraphrase"))
+    assert routes.answer_with_search("How do I count the tokens with a tokenizer?", image="aW1hZ2U=") == first
+    assert read == ["aW1hZ2U="]
+    assert engine.semantic_cache.stats()["hits"] == 1
+
+
+def test_paraphrases_with_different_identifiers_are_not_shared(engine):
+    engine.semantic_cache.threshold = 0.5
+    engine.search("When is the GA5 deadline?")
+    engine.search("When is the GA6 deadline?")
+    assert engine.semantic_cache.stats()["hits"] == 0
+    engine.search("when is the GA5 deadline")
+    assert engine.semantic_cache.stats()["hits"] == 1
@@ -0,0 +1,39 @@
+import json
+
+from app.chunking import chunk_documents, chunk_text
+from app.search import SearchEngine
+
+
+def test_windows_overlap_and_are_bounded():
+    text = " ".join(f"w{i}" for i in range(250))
+    chunks = chunk_text(text, max_words=100, overlap=20, max_chunks=10)
+    assert [len(c.split()) for c in chunks] == [100, 100, 90]
+    assert chunks[1].split()[:20] == chunks[0].split()[-20:]
+    assert len(chunk_text(text, max_words=10, overlap=2, max_chunks=5)) == 5
+    assert chunk_text("short  text") == ["short  text"]
+
+
+def test_prefixes_and_parents():
+    chunks, parents = chunk_documents(["a b c d e", "x"], prefixes=["T1", "T2"], max_words=3, overlap=1)
+    assert chunks == ["T1\na b c", "T1\nc d e", "T2\nx"]
+    assert parents.tolist() == [0, 0, 1]
+
+
+def test_chunk_scores_aggregate_to_parent(tmp_path, stub_model):
+    filler = " ".join(f"filler{i}" for i in range(300))
+    posts = [
+        {"topic_id": 1, "topic_title": "Long", "post_id": 1, "post_number": 1,
+         "content": f"{filler} docker volume mount flag docker volume", "created_at": "", "url": "u1"},
+        {"topic_id": 2, "topic_title": "Other", "post_id": 2, "post_number": 1,
+         "content": "deadline for the project", "created_at": "", "url": "u2"},
+    ]
+    posts_file = tmp_path / "posts.json"
+    posts_file.write_text(json.dumps(posts))
+    engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path), model=stub_model)
+    engine.load_discourse_posts(str(posts_file))
+    engine.build_index()
+
+    assert len(engine.embeddings) > len(posts)
+    results = engine.search("docker volume mount flag", top_k=3, threshold=0.0)
+    assert [r["url"] for r in results].count("u1") == 1
+    assert results[0]["url"] == "u1"
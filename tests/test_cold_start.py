@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.cold_start import parse_importtime, run
+
+
+def test_parse_importtime_sums_packages():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |     numpy.core",
+        "import time:       200 |        300 |   numpy",
+        "import time:        50 |        350 | main",
+    ])
+    total, packages = parse_importtime(stderr)
+    assert total == 350e-6
+    assert packages == pytest.approx({"numpy": 300e-6, "main": 50e-6})
+
+
+def test_cold_start_stays_within_budget():
+    violations = run(runs=1, encoder="stub", import_budget=0.0, answer_budget=120.0, quiet=True)
+    # Only the impossible import budget is missed: no heavy module loads on import
+    assert len(violations) == 1 and violations[0].startswith("import main took")
@@ -0,0 +1,100 @@
+import functools
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.course_scraper import CourseContentScraper, DriverPool, iter_markdown_sections
+
+SITE = os.path.join(os.path.dirname(__file__), "fixtures", "course_site")
+
+
+@pytest.fixture
+def course_site():
+    """Static copy of the docsify course site, recording the paths it serves."""
+    served = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            served.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=SITE))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/", served
+    server.shutdown()
+    server.server_close()
+
+
+def test_markdown_sections_follow_rendered_headings():
+    sections = list(iter_markdown_sections(open(os.path.join(SITE, "2025-01", "development-tools.md")).read(), "u"))
+    assert [(s["title"], s["level"]) for s in sections] == [("Development Tools", 1), ("Editors", 3)]
+    assert "# Not a heading: comments inside code stay in the content" in sections[0]["content"]
+    assert sections[1]["content"] == "Use VS Code with the Python extension."
+
+
+def test_crawl_discovers_sidebar_modules_over_http(course_site, tmp_path):
+    root, served = course_site
+    scraper = CourseContentScraper(base_url=f"{root}#/2025-01/", workers=3, render="http")
+    scraper.output_dir = str(tmp_path)
+
+    routes = scraper.discover_pages()
+    # The sidebar is found in the parent directory; external links are not followed
+    assert routes == ["/2025-01/", "/2025-01/development-tools", "/2025-01/docker", "/2025-01/deployment",
+                      "/2025-01/calendar"]
+
+    data = scraper.scrape_content()
+    assert [s["title"] for s in data["sections"]] == [
+        "Tools in Data Science", "This course is quite hard", "Development Tools", "Editors", "Docker",
+        "Deployment Tools"]
+    assert data["sections"][4]["url"] == f"{root}#/2025-01/docker"
+    assert os.path.exists(tmp_path / "course_content.json")
+    # The missing page is skipped rather than rendered, and no page needed a browser
+    assert "/2025-01/calendar.md" in served
+    assert scraper.driver_pool.created == 0
+
+
+def test_pages_without_markdown_are_rendered(course_site, monkeypatch):
+    root, _ = course_site
+    scraper = CourseContentScraper(base_url=f"{root}#/2025-01/", workers=2, render="auto")
+    rendered = []
+    monkeypatch.setattr(scraper, "_render_page", lambda route: rendered.append(route) or [])
+    list(scraper.crawl(scraper.discover_pages()))
+    assert rendered == ["/2025-01/calendar"]
+
+
+def test_driver_pool_reuses_drivers():
+    class Driver:
+        quits = 0
+
+        def quit(self):
+            Driver.quits += 1
+
+    pool = DriverPool(Driver, size=2)
+    seen = []
+
+    def borrow():
+        for _ in range(5):
+            with pool.driver() as driver:
+                seen.append(driver)
+
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(seen) == 20 and len(set(map(id, seen))) == pool.created <= 2
+    created = pool.created
+
+    # A driver that failed is quit rather than handed out again
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            raise RuntimeError("tab crashed")
+    assert Driver.quits == 1 and pool.created == created - 1
+    pool.close()
+    assert pool.created == 0 and Driver.quits == created
@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+
+
+def test_only_changed_documents_are_encoded(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub-model")
+    texts = ["alpha beta", "gamma delta", "epsilon"]
+
+    first = cache.encode("discourse", texts, stub_model.encode)
+    assert stub_model.calls == [texts]
+    assert isinstance(first, np.memmap)
+
+    texts[1] = "gamma delta changed"
+    second = cache.encode("discourse", texts, stub_model.encode)
+    assert stub_model.calls[-1] == ["gamma delta changed"]
+    assert (cache.hits, cache.misses) == (2, 4)
+    np.testing.assert_array_equal(second[0], first[0])
+    np.testing.assert_array_equal(second[1], stub_model.encode("gamma delta changed"))
+
+    cache.encode("discourse", texts, stub_model.encode)
+    assert len(stub_model.calls) == 2
+
+
+def test_cache_is_keyed_by_model(tmp_path, stub_model):
+    EmbeddingCache(str(tmp_path), "model-a").encode("course", ["x y"], stub_model.encode)
+    EmbeddingCache(str(tmp_path), "model-b").encode("course", ["x y"], stub_model.encode)
+    assert len(stub_model.calls) == 2
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.executor import BoundedExecutor, QueueFullError
+
+
+def test_calls_overlap_and_queue_is_bounded():
+    executor = BoundedExecutor(max_workers=2, max_queue=1, timeout=5)
+    release = threading.Event()
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(QueueFullError):
+            await executor.run(time.sleep, 0)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == [True, True, True]
+    assert executor.stats()["pending"] == 0 and executor.rejected == 1
+
+
+def test_timeout_keeps_slot_until_work_finishes():
+    executor = BoundedExecutor(max_workers=1, max_queue=0, timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait)
+        with pytest.raises(QueueFullError):
+            await executor.run(time.sleep, 0)
+        release.set()
+        await asyncio.sleep(0.05)
+        executor.timeout = 5
+        await executor.run(time.sleep, 0)
+
+    asyncio.run(scenario())
+    assert executor.timed_out == 1
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+from app.jsonl import JSONLWriter, iter_jsonl, partial_path
+
+
+def test_writer_flushes_and_publishes_atomically(tmp_path):
+    path = str(tmp_path / "posts.jsonl")
+    with open(path, "w") as f:
+        f.write(json.dumps({"old": True}) + "\n")
+
+    writer = JSONLWriter(path)
+    writer.write({"post_id": 1})
+    # Readable while running; the published file is still the previous run
+    assert list(iter_jsonl(path, follow=True, idle_timeout=0)) == [{"post_id": 1}]
+    assert list(iter_jsonl(path)) == [{"old": True}]
+    writer.write({"post_id": 2})
+    writer.close()
+
+    assert list(iter_jsonl(path)) == [{"post_id": 1}, {"post_id": 2}]
+    assert list(iter_jsonl(path + ".1")) == [{"old": True}]
+    assert not (tmp_path / "posts.jsonl.partial").exists()
+
+
+def test_follow_reads_records_while_they_are_written(tmp_path):
+    path = str(tmp_path / "posts.jsonl")
+    writer = JSONLWriter(path)
+    seen = []
+
+    def produce():
+        for i in range(5):
+            writer.write({"i": i})
+            time.sleep(0.02)
+        # A half-written line is never yielded early
+        writer._file.write('{"i": 5')
+        writer._file.flush()
+        time.sleep(0.05)
+        writer._file.write("}\n")
+        writer.close()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    for record in iter_jsonl(path, follow=True, poll_interval=0.01):
+        seen.append(record["i"])
+    thread.join()
+    assert seen == list(range(6))
+
+
+def test_first_scrape_is_found_while_it_runs(tmp_path):
+    from app.routes import _find_data_file
+
+    candidates = [str(tmp_path / "posts.jsonl"), str(tmp_path / "posts.json")]
+    writer = JSONLWriter(candidates[0])
+    writer.write({"post_id": 1})
+    assert _find_data_file(candidates) is None  # Nothing published yet
+    assert _find_data_file(candidates, follow=True) == candidates[0]
+    writer.close()
+    assert _find_data_file(candidates) == candidates[0]
+
+
+def test_search_engine_ingests_jsonl_in_batches(tmp_path, stub_model):
+    from app.search import SearchEngine
+    from tests.conftest import POSTS
+
+    posts_file = str(tmp_path / "discourse_posts.jsonl")
+    with JSONLWriter(posts_file) as writer:
+        for post in POSTS:
+            writer.write(post)
+    sections = json.load(open("data/course_content.json"))["sections"]
+    course_file = str(tmp_path / "course_content.jsonl")
+    with JSONLWriter(course_file) as writer:
+        for section in sections:
+            writer.write(section)
+
+    engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path / "cache"), model=stub_model)
+    engine.ingest_batch_size = 3
+    calls = len(stub_model.calls)
+    engine.load_discourse_posts(posts_file)
+    engine.load_course_content(course_file)
+    engine.build_index()
+    assert len(stub_model.calls) - calls > 2  # Encoded batch by batch
+    assert [post["post_id"] for post in engine.discourse_posts] == [post["post_id"] for post in POSTS]
+    assert len(engine.course_content) == len(sections)
+    assert engine.search("docker --rm flag", threshold=0.0)[0]["title"] == "Docker on Windows"
+
+    # A second load is served from the caches and matches the first
+    reloaded = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path / "cache"), model=stub_model)
+    calls = len(stub_model.calls)
+    reloaded.load_discourse_posts(posts_file)
+    reloaded.build_index()
+    assert len(stub_model.calls) == calls
+    assert (reloaded.discourse_parents == engine.discourse_parents).all()
+
+
+def test_streaming_discourse_scrape(discourse_server, tmp_path):
+    from app.scraper import DiscourseScraper
+
+    output = str(tmp_path / "posts.jsonl")
+    scraper = DiscourseScraper(base_url=discourse_server.url, rate=1000, burst=100, workers=2)
+    assert scraper.scrape_to_jsonl(34, "2025-01-01", "2025-04-14", output_file=output) == 6
+    expected = scraper.scrape_date_range(34, "2025-01-01", "2025-04-14")
+    assert list(iter_jsonl(output)) == expected
+    assert not (tmp_path / partial_path("posts.jsonl")).exists()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from app.lexical import BM25Index, exact_tokens, tokenize
+
+
+def test_tokenizer_keeps_exact_tokens_and_their_parts():
+    tokens = tokenize("Should I use gpt-3.5-turbo-0125 with the --rm flag for GA5?")
+    assert {"gpt-3.5-turbo-0125", "--rm", "ga5", "gpt", "turbo", "0125", "rm", "flag"} <= set(tokens)
+    assert "the" not in tokens and "i" not in tokens
+    # Differently written model names still share parts
+    assert {"gpt", "3", "5", "turbo"} <= set(tokenize("gpt3.5 turbo"))
+
+
+def test_bm25_ranks_rare_exact_tokens_first():
+    index = BM25Index.build([
+        "use the tokenizer to count tokens",
+        "you must use gpt-3.5-turbo-0125 for this question",
+        "tokens tokens tokens and more tokens",
+        "",
+    ])
+    rows, scores = index.search("which model gpt-3.5-turbo-0125 tokens", limit=4)
+    assert rows[0] == 1
+    assert list(scores) == sorted(scores, reverse=True)
+    assert 3 not in rows
+    assert len(index.search("tokens", limit=1)[0]) == 1
+    assert len(index.search("unrelated words", limit=5)[0]) == 0
+
+
+def test_hybrid_search_surfaces_exact_token_matches(engine):
+    query = "what does --rm do"
+    assert engine.search_mode == "hybrid"
+    hybrid = engine.search(query, top_k=3, threshold=0.0)
+    assert hybrid[0]["title"] == "Docker on Windows"
+
+    engine.search_mode = "semantic"
+    semantic = engine.search(query, top_k=3, threshold=0.0)
+    # Fusion reorders results but reports the same cosine similarities
+    by_title = {r["title"]: r["similarity"] for r in semantic}
+    for result in hybrid:
+        if result["title"] in by_title:
+            np.testing.assert_allclose(result["similarity"], by_title[result["title"]], rtol=1e-5)
+
+
+def test_hybrid_threshold_admits_only_close_lexical_matches(engine):
+    # Close BM25 matches pass even a threshold no cosine similarity reaches
+    results = engine.search("docker --rm flag", top_k=5, threshold=0.99)
+    assert [r["title"] for r in results] == ["Docker on Windows"]
+    assert engine.search("zebra quantum violin", top_k=5, threshold=0.99) == []
+    # A single common word is not a close match
+    assert engine.search("tokens zebra quantum violin", top_k=5, threshold=0.99) == []
+
+
+def test_exact_tokens_keep_identifiers_only():
+    assert exact_tokens("Is GA5 about gpt-3.5-turbo-0125, run with --rm?") == {"ga5", "gpt-3.5-turbo-0125", "--rm"}
@@ -0,0 +1,20 @@
+from benchmarks.load import load_questions, prepare_environment, run_in_process
+
+
+def test_load_questions_covers_every_set(tmp_path):
+    extra = tmp_path / "extra.jsonl"
+    extra.write_text('{"question": "Is the GA5 deadline extended?"}\n', encoding="utf-8")
+    questions = load_questions(extra_files=[str(extra)])
+    assert {name for name, _ in questions} == {"sample", "promptfoo", "extra.jsonl"}
+    assert ("promptfoo", "How do I calculate the number of tokens and cost?") in questions
+    assert ("extra.jsonl", "Is the GA5 deadline extended?") in questions
+
+
+def test_in_process_load_report(tmp_path):
+    questions = load_questions(["sample", "promptfoo"])
+    env = prepare_environment(rows=200, encoder="stub", cache=False, work_dir=str(tmp_path))
+    report = run_in_process(questions, total=24, concurrency=4, env=env)
+    assert report["requests"] == 24 and report["errors"] == 0
+    assert report["p50_ms"] <= report["p95_ms"] <= report["p99_ms"]
+    assert report["rps"] > 0 and report["peak_rss_bytes"] > 0
+    assert set(report["sets"]) == {"sample", "promptfoo"}
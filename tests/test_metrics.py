@@ -0,0 +1,51 @@
+from app.metrics import Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    counter = registry.counter("demo_requests_total", "Requests", ["path"])
+    histogram = registry.histogram("demo_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    counter.inc(path='/a"b')
+    counter.inc(2, path='/a"b')
+    histogram.observe(0.05, stage="encode")
+    histogram.observe(0.5, stage="encode")
+    registry.add_collector(lambda: [("demo_rows", "gauge", "Rows", [({"source": "course"}, 9)])])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_requests_total counter" in lines
+    assert 'demo_requests_total{path="/a\\"b"} 3' in lines
+    assert 'demo_seconds_bucket{stage="encode",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="encode",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{stage="encode",le="+Inf"} 2' in lines
+    assert 'demo_seconds_count{stage="encode"} 2' in lines
+    assert 'demo_rows{source="course"} 9' in lines
+
+
+def test_metrics_endpoint_reports_stages(client):
+    client.post("/api/", json={"question": "How do I run docker with the --rm flag?"})
+    client.post("/api/", json={"question": "How do I run docker with the --rm flag?"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("rules", "search", "encode", "score", "select", "format_response", "gc_collect"):
+        assert f'tds_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'tds_answers_total{source="cache"}' in body
+    assert 'tds_corpus_documents{source="discourse"} 4' in body
+    assert 'tds_cache_lookups_total{cache="answers",result="hit"}' in body
+    assert 'tds_embedding_bytes{kind="float32"}' in body
+    assert "tds_search_results_bucket" in body
+    assert 'tds_rule_hits_total{rule="ga5-q8-model"}' in body
+
+
+def test_mapped_score_matrix_is_reported_apart(tmp_path, stub_model, data_files, monkeypatch):
+    from app.metrics import engine_families
+    from app.search import SearchEngine
+
+    monkeypatch.setenv("EMBEDDING_MMAP", "true")
+    engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path / "cache"), model=stub_model)
+    engine.load_discourse_posts(data_files["discourse"])
+    engine.build_index()
+    samples = next(samples for name, _, _, samples in engine_families(engine) if name == "tds_embedding_bytes")
+    memory = {labels["kind"]: value for labels, value in samples}
+    assert memory["float32_mmap"] == engine.embeddings.nbytes and "float32" not in memory
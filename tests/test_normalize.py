@@ -0,0 +1,64 @@
+import json
+
+from app.normalize import normalize_html, normalize_posts
+
+COOKED = (
+    '<aside class="quote"><div class="title">student said:</div><blockquote><p>Which model?</p></blockquote></aside>'
+    '<p>Use <code>gpt-3.5-turbo-0125</code>, see <a href="https://platform.openai.com/docs">the docs</a>.</p>'
+    '<aside class="onebox"><header>platform.openai.com</header><p>OpenAI Platform preview text</p></aside>'
+    '<pre><code>docker run --rm -v $(pwd):/data app</code></pre>'
+    '<p><a class="mention" href="/u/someone">@someone</a> <img class="emoji" alt=":+1:"></p>'
+)
+
+
+def test_cooked_html_is_reduced_to_text_code_and_links():
+    result = normalize_html(COOKED)
+    assert "<" not in result["text"]
+    assert "student said" not in result["text"] and "preview text" not in result["text"]
+    assert "Which model?" in result["text"] and "gpt-3.5-turbo-0125" in result["text"]
+    assert result["code_blocks"] == ["docker run --rm -v $(pwd):/data app"]
+    assert result["links"] == [{"url": "https://platform.openai.com/docs", "text": "the docs"}]
+    assert normalize_html("plain text") == {"text": "plain text", "code_blocks": [], "links": []}
+
+
+def test_posts_are_cached_by_id_and_redone_when_edited(tmp_path, monkeypatch):
+    import app.normalize as normalize
+
+    cache_path = str(tmp_path / "normalized.json")
+    posts = [{"post_id": 1, "content": "<p>first</p>"}, {"post_id": 2, "content": "<p>second</p>"}]
+    assert [p["text"] for p in normalize_posts(posts, cache_path)] == ["first", "second"]
+
+    parsed = []
+    monkeypatch.setattr(normalize, "normalize_html", lambda html: parsed.append(html) or {
+        "text": "edited", "code_blocks": [], "links": []})
+    posts[1]["content"] = "<p>second, edited</p>"
+    assert [p["text"] for p in normalize_posts(posts, cache_path)] == ["first", "edited"]
+    assert parsed == ["<p>second, edited</p>"]
+
+
+def test_batched_load_reuses_one_pool(tmp_path, stub_model, monkeypatch):
+    import app.normalize as normalize
+    from app.search import SearchEngine
+
+    pools = []
+
+    class CountingPool(normalize.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(normalize, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(normalize, "NORMALIZE_WORKERS", 2)
+    monkeypatch.setattr(normalize, "NORMALIZE_POOL_MIN", 100)
+    posts = [{"topic_id": i, "topic_title": f"Topic {i}", "post_id": i, "post_number": 1,
+              "content": f"<p>post <b>{i}</b></p>", "created_at": "2025-01-15T10:00:00Z",
+              "url": f"https://discourse.example/t/{i}/1"} for i in range(300)]
+    posts_file = tmp_path / "discourse_posts.json"
+    posts_file.write_text(json.dumps(posts), encoding="utf-8")
+
+    engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path / "cache"), model=stub_model)
+    engine.ingest_batch_size = 50
+    engine.load_discourse_posts(str(posts_file))
+
+    assert len(pools) == 1  # Started once 100 posts needed parsing, then shared by later batches
+    assert [post["text"] for post in engine.discourse_posts] == [f"post {i}" for i in range(300)]
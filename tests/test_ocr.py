@@ -0,0 +1,101 @@
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.ocr import OCRService
+
+# The 1x1 PNG used by tests/test_api.py
+PIXEL_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNk+A8AAQUBAScY42YAAAAASUVORK5CYII="
+
+
+def _png(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _slow_worker(pixels):
+    time.sleep(30)
+    return "never"
+
+
+def _echo_worker(pixels):
+    return f"{pixels.shape[0]}x{pixels.shape[1]}"
+
+
+def _loaded():
+    return True
+
+
+def _slow_load():
+    time.sleep(2)
+    return True
+
+
+def test_trivial_images_skip_the_worker():
+    import base64
+
+    service = OCRService()
+    assert service.extract_text(base64.b64decode(PIXEL_PNG)) == ""
+    assert service.extract_text(_png(np.full((200, 300, 3), 255, dtype=np.uint8))) == ""
+    assert service.skipped == 2 and service._pool is None
+
+
+def test_downscale_and_cache(monkeypatch):
+    service = OCRService(max_side=400)
+    seen = []
+    monkeypatch.setattr(service, "_recognize", lambda pixels: seen.append(pixels.shape) or "hello")
+    image = _png(np.random.default_rng(0).integers(0, 255, size=(1200, 2000, 3), dtype=np.uint8))
+
+    assert service.extract_text(image) == "hello"
+    assert service.extract_text(image) == "hello"
+    assert seen == [(240, 400, 3)]
+    assert service.cache.hits == 1
+
+
+def test_worker_timeout_is_killed_and_replaced():
+    service = OCRService(timeout=1)
+    service._worker_fn, service._load_fn = _slow_worker, _loaded
+    pixels = np.zeros((32, 32, 3), dtype=np.uint8)
+    start = time.monotonic()
+    assert service._recognize(pixels) is None
+    assert time.monotonic() - start < 10
+    assert service.timeouts == 1 and service._pool is None
+
+
+def test_model_load_is_not_bounded_by_the_image_timeout():
+    service = OCRService(timeout=1)
+    service._worker_fn, service._load_fn = _echo_worker, _slow_load
+    try:
+        assert service._recognize(np.zeros((32, 48, 3), dtype=np.uint8)) == "32x48"
+        assert service.timeouts == 0
+    finally:
+        service.shutdown()
+
+
+def test_failed_recognition_is_not_cached(monkeypatch):
+    service = OCRService()
+    results = iter([None, "hello"])
+    monkeypatch.setattr(service, "_recognize", lambda pixels: next(results))
+    image = _png(np.random.default_rng(0).integers(0, 255, size=(64, 64, 3), dtype=np.uint8))
+
+    assert service.extract_text(image) == ""
+    assert service.extract_text(image) == "hello"
+    assert service.extract_text(image) == "hello" and service.cache.hits == 1
+
+
+def test_retired_worker_is_killed_only_after_its_last_call():
+    service = OCRService()
+    service._load_fn = _loaded
+    pool, loading = service._acquire_pool()
+    assert service._acquire_pool()[0] is pool
+    loading.result(timeout=60)
+
+    service._release_pool(pool, retire=True)  # One caller timed out
+    assert service._pool is None and service._in_flight[pool] == 1
+    assert pool.submit(_echo_worker, np.zeros((2, 3))).result(timeout=30) == "2x3"
+
+    service._release_pool(pool)
+    assert pool not in service._in_flight
@@ -0,0 +1,48 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import REPO_DIR
+from benchmarks.load import _free_port, prepare_environment, wait_until_ready
+from benchmarks.workers import children, memory
+
+
+def test_prefork_workers_share_the_loaded_engine(tmp_path):
+    port = _free_port()
+    env = dict(os.environ, **prepare_environment(rows=200, encoder="stub", cache=True, work_dir=str(tmp_path)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.prefork", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_until_ready(url, timeout=120)
+        for _ in range(4):
+            response = httpx.post(f"{url}/api/", json={"question": "How do I use Docker?"}, timeout=30)
+            assert response.status_code == 200 and "answer" in response.json()
+
+        workers = children(server.pid)
+        assert len(workers) == 2
+        # The score matrix is mapped from the embedding cache instead of being copied per worker
+        with open(f"/proc/{workers[0]}/maps", "r") as f:
+            assert "score_matrix.npy" in f.read()
+        for pid in workers:
+            stats = memory(pid)
+            assert stats["pss"] < stats["rss"]  # Pages shared with the parent and the other worker
+
+        # A killed worker is replaced
+        os.kill(workers[0], signal.SIGKILL)
+        for _ in range(50):
+            replaced = children(server.pid)
+            if len(replaced) == 2 and workers[0] not in replaced:
+                break
+            time.sleep(0.2)
+        assert len(replaced) == 2 and workers[0] not in replaced
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    assert server.returncode == 0
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from app.profiling import RequestProfiler, collapsed, sample_stacks
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_collapses_thread_stacks():
+    stop = threading.Event()
+    thread = threading.Thread(target=_spin, args=(stop,), name="busy-worker")
+    thread.start()
+    try:
+        counts = sample_stacks(0.1, interval=0.002)
+    finally:
+        stop.set()
+        thread.join()
+    stacks = [stack for stack in counts if stack.startswith("busy-worker;")]
+    assert stacks and all("test_profiling:_spin" in stack for stack in stacks)
+    line = collapsed(counts).splitlines()[0]
+    assert int(line.rsplit(" ", 1)[1]) == max(counts.values())
+
+
+def test_request_profiler_profiles_next_calls_only():
+    profiler = RequestProfiler()
+    assert not profiler.claim()
+    profiler.arm(2)
+    for _ in range(3):
+        if profiler.claim():
+            profiler.run(time.sleep, 0.001)
+    status = profiler.status()
+    assert status["profiled"] == 2 and status["complete"] and status["remaining"] == 0
+    assert "sleep" in profiler.report()
+
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/admin/profile/stacks?seconds=0.1").status_code == 404
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profile/stacks?seconds=0.1").status_code == 403
+    assert client.get("/admin/profile/stacks?seconds=0.1", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profile/stacks?seconds=600", headers={"X-Admin-Token": "secret"}).status_code == 400
+
+
+def test_admin_profiles(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+
+    response = client.get("/admin/profile/stacks?seconds=0.2&interval_ms=2", headers=headers)
+    assert response.status_code == 200
+    assert "MainThread;" in response.text
+
+    assert client.post("/admin/profile/requests?count=2", headers=headers).json()["remaining"] == 2
+    for question in ("How do I run docker with the --rm flag?", "When is the project 1 deadline?"):
+        assert client.post("/api/", json={"question": question}).status_code == 200
+    report = client.get("/admin/profile/requests?sort=tottime", headers=headers).text
+    assert report.startswith("# profiled 2/2 requests\n")
+    assert "search_batch" in report
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.quantization import BinaryMatrix, Int8Matrix, recall_at_k
+
+
+def _normalized(n=2000, dim=64, seed=0, clusters=40):
+    """Clustered unit vectors, which is how sentence embeddings are distributed."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    rows = centers[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize("cls, ratio", [(Int8Matrix, 3.5), (BinaryMatrix, 30)])
+def test_shortlist_then_rescore_recall(cls, ratio):
+    matrix = _normalized()
+    quantized = cls(matrix)
+    assert matrix.nbytes / quantized.nbytes >= ratio
+
+    def exact(q):
+        return np.argsort(-(matrix @ q))
+
+    def approx(q):
+        shortlist = np.argsort(-quantized.scores(q))[:200]
+        return shortlist[np.argsort(-(matrix[shortlist] @ q))]
+
+    # Queries that have genuine neighbours in the corpus
+    queries = matrix[:30] + 0.05 * _normalized(n=30, seed=1)
+    assert recall_at_k(exact, approx, queries, k=10) >= 0.9
+
+
+def test_engine_int8_storage_maps_float_matrix(engine):
+    query = "tokens cost per million"
+    expected = engine.search(query, top_k=3, threshold=0.0)
+
+    engine.storage_mode = "int8"
+    engine.build_index()
+    assert isinstance(engine.embeddings, np.memmap)
+    assert engine.quantization_stats["recall"] == 1.0
+    assert engine.search(query, top_k=3, threshold=0.0) == expected
@@ -0,0 +1,62 @@
+import json
+import os
+
+from app.rules import AhoCorasick, RulesEngine, RuleSet
+
+RULES = {"rules": [
+    {"id": "model", "triggers": [["gpt"], ["turbo", "3.5"]], "answer": "Use gpt-3.5-turbo-0125",
+     "links": [{"url": "https://discourse.example/t/1", "text": "GA5 Q8"}]},
+    {"id": "docker", "triggers": ["docker", "podman"], "answer": "Either works"},
+    {"id": "gpt", "triggers": ["gpt"], "answer": "Any GPT question"},
+]}
+
+
+def test_automaton_reports_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert {automaton.patterns[i] for i in automaton.find("ushers")} == {"he", "she", "hers"}
+    assert automaton.find("xyz") == set()
+
+
+def test_rules_need_every_trigger_group_and_first_rule_wins():
+    rules = RuleSet(RULES["rules"])
+    assert rules.match("Should I use GPT-4o-mini or gpt3.5 turbo?")["id"] == "model"
+    assert rules.match("Which GPT 3.5 model?")["id"] == "model"
+    assert rules.match("Is GPT-4o allowed?")["id"] == "gpt"
+    assert rules.match("docker or podman?")["id"] == "docker"
+    assert rules.match("docker compose?") is None
+
+
+def test_rules_file_hot_reload_and_counters(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES), encoding="utf-8")
+    engine = RulesEngine(str(path), reload_interval=0)
+    assert engine.match("gpt turbo")["id"] == "model"
+    assert engine.match("no rule here") is None
+
+    updated = {"rules": [{"id": "deadline", "triggers": ["deadline"], "answer": "End of February"}]}
+    path.write_text(json.dumps(updated), encoding="utf-8")
+    os.utime(path, (1, 1))  # Make sure the modification time changes
+    assert engine.match("gpt turbo") is None
+    assert engine.match("project deadline?")["answer"] == "End of February"
+
+    # A broken file keeps the previous rules
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, (2, 2))
+    assert engine.match("deadline")["id"] == "deadline"
+
+    stats = engine.stats()
+    assert stats["reloads"] == 2 and stats["checks"] == 5
+    assert stats["rules"] == [{"id": "deadline", "hits": 2}]
+    assert engine.hits["model"] == 1
+
+
+def test_canned_answers_come_from_rules(client, stub_model):
+    before = client.get("/api/rules").json()["rules"]
+    encodes = len(stub_model.calls)
+    response = client.post("/api/", json={"question": "Should I use gpt-4o-mini or gpt3.5 turbo?"})
+    assert response.status_code == 200
+    assert "gpt-3.5-turbo-0125" in response.json()["answer"]
+    assert len(stub_model.calls) == encodes  # No search
+    after = client.get("/api/rules").json()["rules"]
+    hits = {rule["id"]: rule["hits"] for rule in after}
+    assert hits["ga5-q8-model"] == {rule["id"]: rule["hits"] for rule in before}["ga5-q8-model"] + 1
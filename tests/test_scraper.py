@@ -0,0 +1,149 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.scraper import DiscourseScraper, TokenBucket, retry_after_seconds
+
+
+def _scrape(server, **kwargs):
+    scraper = DiscourseScraper(base_url=server.url, rate=1000, burst=100, backoff=0.01, **kwargs)
+    return scraper.scrape_date_range(34, "2025-01-01", "2025-04-14")
+
+
+def test_concurrent_scrape_matches_sequential(discourse_server, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)  # Skip the sequential page delay
+    sequential = _scrape(discourse_server, workers=1)
+    monkeypatch.undo()
+    concurrent = _scrape(discourse_server, workers=4)
+
+    assert concurrent == sequential
+    assert [post["post_id"] for post in concurrent] == [1031, 1032, 1021, 1022, 1011, 1001]
+    assert concurrent[0]["url"] == f"{discourse_server.url}/t/ga5-question-8-clarification/103/1"
+    # Pagination stops at the first topic older than the range
+    assert "/t/99.json" not in discourse_server.requests
+
+
+def test_topics_are_fetched_in_parallel(discourse_server):
+    discourse_server.delay = 0.2
+    start = time.monotonic()
+    _scrape(discourse_server, workers=4)
+    # Two list pages in sequence, four topic fetches overlapping them
+    assert time.monotonic() - start < 0.2 * 5
+
+
+def test_retries_honour_retry_after(discourse_server):
+    discourse_server.failures["/t/102.json"] = [(429, {"Retry-After": "0.3"}), (503, {})]
+    start = time.monotonic()
+    posts = _scrape(discourse_server, workers=2)
+    assert time.monotonic() - start >= 0.3
+    assert discourse_server.requests.count("/t/102.json") == 3
+    assert [post["post_id"] for post in posts if post["topic_id"] == 102] == [1021, 1022]
+
+
+def test_gives_up_after_max_retries(discourse_server):
+    discourse_server.failures["/t/101.json"] = [(500, {})] * 10
+    posts = _scrape(discourse_server, workers=2, max_retries=2)
+    assert discourse_server.requests.count("/t/101.json") == 3
+    assert 101 not in {post["topic_id"] for post in posts}
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 immediately, then 10 more at 50 per second
+    assert 0.18 <= time.monotonic() - start < 0.5
+
+
+def test_retry_after_formats():
+    assert retry_after_seconds("3") == 3.0
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds("soon") is None and retry_after_seconds(None) is None
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _incremental(server, output, **kwargs):
+    scraper = DiscourseScraper(base_url=server.url, rate=1000, burst=100, backoff=0.01, workers=2)
+    for name, value in kwargs.items():
+        setattr(scraper, name, value)
+    return scraper, scraper.scrape_incremental(34, "2025-01-01", "2025-04-14", output_file=output, checkpoint_every=1)
+
+
+def test_incremental_scrape_fetches_only_new_posts(discourse_server, tmp_path):
+    output = str(tmp_path / "posts.json")
+    _, first = _incremental(discourse_server, output)
+    assert sorted(post["post_id"] for post in first) == [1001, 1011, 1021, 1022, 1031, 1032]
+    assert _load(output) == first
+    checkpoint = _load(output + ".checkpoint.json")["topics"]
+    assert checkpoint["103"]["post_ids"] == [1031, 1032, 1033] and checkpoint["103"]["posts_count"] == 3
+
+    # Nothing changed: only the topic list is read
+    discourse_server.requests.clear()
+    written = os.stat(output).st_mtime_ns
+    _, second = _incremental(discourse_server, output)
+    assert second == first
+    assert os.stat(output).st_mtime_ns == written  # Not rewritten
+    assert all(path.startswith("/c/") for path in discourse_server.requests)
+
+    # Topic 102 gets a reply that is not in the topic's first chunk of posts
+    page = _load(os.path.join(discourse_server.FIXTURES, "c-34-page-0.json"))
+    page["topic_list"]["topics"][1].update(posts_count=3, bumped_at="2025-03-05T09:00:00.000Z")
+    topic = _load(os.path.join(discourse_server.FIXTURES, "t-102.json"))
+    topic["post_stream"]["stream"].append(1023)
+    reply = dict(topic["post_stream"]["posts"][1], id=1023, post_number=3, created_at="2025-03-05T09:00:00.000Z")
+    discourse_server.posts[1023] = reply
+    discourse_server.overrides.update({"/c/34.json?page=0": page, "/t/102.json": topic})
+
+    discourse_server.requests.clear()
+    _, third = _incremental(discourse_server, output)
+    assert [path for path in discourse_server.requests if path.startswith("/t/")] == [
+        "/t/102.json", "/t/102/posts.json?post_ids%5B%5D=1023"]
+    assert sorted(post["post_id"] for post in third) == [1001, 1011, 1021, 1022, 1023, 1031, 1032]
+
+
+def test_interrupted_incremental_scrape_resumes(discourse_server, tmp_path):
+    output = str(tmp_path / "posts.json")
+    calls = []
+
+    def flaky_fetch(topic, known):
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        calls.append(topic["id"])
+        return DiscourseScraper.fetch_new_posts(scraper, topic, known)
+
+    scraper = DiscourseScraper(base_url=discourse_server.url, rate=1000, burst=100, workers=1)
+    scraper.fetch_new_posts = flaky_fetch
+    with pytest.raises(KeyboardInterrupt):
+        scraper.scrape_incremental(34, "2025-01-01", "2025-04-14", output_file=output, checkpoint_every=1)
+    # Finished topics are in the journal; the output and checkpoint are only written at the end
+    with open(output + ".journal", encoding="utf-8") as f:
+        assert sorted(json.loads(line)["topic_id"] for line in f) == [102, 103]
+    assert not os.path.exists(output + ".checkpoint.json")
+
+    discourse_server.requests.clear()
+    _, posts = _incremental(discourse_server, output)
+    assert [path for path in discourse_server.requests if path.startswith("/t/")] == ["/t/101.json", "/t/100.json"]
+    assert sorted(post["post_id"] for post in posts) == [1001, 1011, 1021, 1022, 1031, 1032]
+    assert _load(output) == posts and not os.path.exists(output + ".journal")
+
+
+def test_concurrent_topics_are_yielded_while_listing_pages():
+    scraper = DiscourseScraper(base_url="http://127.0.0.1:9", workers=2)
+    listed = []
+
+    def topics():
+        for i in range(1000):
+            listed.append(i)
+            yield {"id": i}
+
+    results = scraper._map_topics(lambda topic: topic["id"] * 2, topics())
+    assert next(results) == ({"id": 0}, 0)
+    assert len(listed) <= 4  # Bounded in-flight window of 2 * workers
+    assert [result for _, result in results] == [i * 2 for i in range(1, 1000)]
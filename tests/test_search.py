@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.search import SearchEngine
+
+
+def _brute_force(engine: SearchEngine, query: str, top_k: int, threshold: float):
+    """Reference ranking: cosine similarity against each corpus separately."""
+    q = engine.model.encode(query)
+    q = q / np.linalg.norm(q)
+    scored = []
+    for source, matrix in (("course", engine.course_embeddings), ("discourse", engine.discourse_embeddings)):
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        scored += [(float(s), source) for s in matrix @ q if s > threshold]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored[:top_k]
+
+
+def test_unified_matrix_matches_per_corpus_scoring(engine):
+    engine.search_mode = "semantic"
+    query = "how do I count tokens with the tokenizer"
+    results = engine.search(query, top_k=3, threshold=0.1)
+    expected = _brute_force(engine, query, 3, 0.1)
+    assert [r["source"] for r in results] == [source for _, source in expected]
+    np.testing.assert_allclose([r["similarity"] for r in results], [s for s, _ in expected], rtol=1e-5)
+
+
+def test_per_source_quotas(engine):
+    engine.search_mode = "semantic"
+    results = engine.search("gpt model tokens cost", top_k=5, threshold=0.0, quotas={"discourse": 1})
+    assert sum(r["source"] == "discourse" for r in results) <= 1
+    assert results == sorted(results, key=lambda r: r["similarity"], reverse=True)
+
+
+def test_ivf_backend_with_full_probe_matches_exact(engine):
+    query = "docker flag for the data folder"
+    exact = engine.search(query, top_k=3, threshold=0.0)
+
+    engine.ann_backend, engine.ann_min_rows, engine.ann_nlist, engine.ann_nprobe = "ivf", 0, 4, 4
+    engine.build_index()
+    assert engine.index.name == "ivf"
+    assert engine.search(query, top_k=3, threshold=0.0) == exact
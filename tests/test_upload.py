@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+import app.routes as routes
+
+
+def _screenshot() -> bytes:
+    buffer = io.BytesIO()
+    pixels = np.random.default_rng(0).integers(0, 255, size=(200, 300, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_multipart_upload_runs_ocr_on_the_file(client, engine, monkeypatch):
+    seen = []
+    monkeypatch.setattr(engine.ocr, "_recognize", lambda pixels: seen.append(pixels.shape) or "docker flag")
+    response = client.post(
+        "/api/upload",
+        data={"question": "What does this error mean?"},
+        files={"image": ("screenshot.png", _screenshot(), "image/png")},
+    )
+    assert response.status_code == 200
+    assert seen == [(200, 300, 3)]
+    assert set(response.json()) == {"answer", "links"}
+
+
+def test_upload_limits_and_validation(client, monkeypatch):
+    monkeypatch.setattr(routes, "MAX_UPLOAD_BYTES", 1024)
+    response = client.post("/api/upload", data={"question": "q"},
+                           files={"image": ("big.png", _screenshot(), "image/png")})
+    assert response.status_code == 413
+
+    monkeypatch.setattr(routes, "MAX_UPLOAD_BYTES", 1024 * 1024)
+    response = client.post("/api/upload", files={"image": ("s.png", _screenshot(), "image/png")})
+    assert response.status_code == 422
+
+
+def test_upload_is_read_and_hashed_once(client, engine, monkeypatch):
+    import hashlib
+
+    import app.ocr as ocr
+
+    hashed, sha256 = [], hashlib.sha256
+    monkeypatch.setattr(ocr.hashlib, "sha256", lambda data=b"": hashed.append(len(data)) or sha256(data))
+    monkeypatch.setattr(engine.ocr, "_recognize", lambda pixels: "docker flag")
+    screenshot = _screenshot()
+    response = client.post("/api/upload", data={"question": "What does this error mean?"},
+                           files={"image": ("screenshot.png", screenshot, "image/png")})
+    assert response.status_code == 200
+    assert hashed == [len(screenshot)]
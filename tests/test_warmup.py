@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+import app.routes as routes
+import app.warmup as warmup
+from app.search import SearchEngine
+
+
+def test_concurrent_first_calls_build_engine_once(tmp_path, stub_model, monkeypatch):
+    built = []
+
+    indexed = []
+
+    def make_engine():
+        built.append(1)
+        engine = SearchEngine(model_name="stub-model", cache_dir=str(tmp_path), model=stub_model)
+        build_index = engine.build_index
+        engine.build_index = lambda: indexed.append(1) or build_index()
+        return engine
+
+    readiness = warmup.Readiness()
+    monkeypatch.setattr(routes, "SearchEngine", make_engine)
+    monkeypatch.setattr(routes, "readiness", readiness)
+    monkeypatch.setattr(routes, "search_engine", None)
+
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(routes.get_search_engine())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(built) == 1 and len(set(map(id, engines))) == 1
+    assert len(indexed) == 1  # Once, after both corpora are loaded
+    assert engines[0].embeddings is not None
+    status = readiness.status()
+    assert status["status"] == "ready"
+    assert status["stages"]["model"]["status"] == "done"
+    assert status["stages"]["course"]["seconds"] is not None
+    assert status["stages"]["index"]["status"] == "done"
+
+
+def test_ready_endpoint_reports_loading(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "readiness", warmup.Readiness())
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "pending"
+
+
+def test_questions_get_503_while_the_engine_loads(client, monkeypatch):
+    loading = warmup.Readiness()
+    loading.mark("loading")
+    monkeypatch.setattr(routes, "readiness", loading)
+    monkeypatch.setattr(routes, "search_engine", None)
+    monkeypatch.setattr(routes, "get_search_engine", lambda: pytest.fail("waited for the engine"))
+
+    response = client.post("/api/", json={"question": "How do I run docker with the --rm flag?"})
+    assert response.status_code == 503 and response.headers["retry-after"] == "5"
+    assert client.post("/api/batch", json=[{"question": "docker"}]).status_code == 503
+    # Canned answers need no engine
+    response = client.post("/api/", json={"question": "Should I use gpt-4o-mini or gpt-3.5-turbo for GA5 Q8?"})
+    assert response.status_code == 200